@@ -5,8 +5,6 @@ from pstats import SortKey
 
 from pumpkin_py import flat_to_annotations, build_ic_graph_from_closures, search
 
-from pumpkin_py.sim.metric import jac_ic_geomean
-
 closures = Path(__file__).parent / 'resources' / 'upheno-closures.tsv.gz'
 annotations = Path(__file__).parent / 'resources' / 'all-annotations.tsv.gz'
 g2p = Path(__file__).parent / 'resources' / 'Mm_gene_phenotype.txt.gz'
@@ -42,9 +40,7 @@ pr.enable()
 
 search(profile_a, mouse_genes, graph, ns_filter='MP')
 
-print(f"geometric_mean cache info: {jac_ic_geomean.cache_info()}")
-#print(f"geometric_mean inner fx cache info: {jaccard_ic_geometric_mean.cache_info()}")
-#print(f"graph cache info: {graph._get_int_encoded_mica.cache_info()}")
+print(f"graph score cache stats: {graph.score_cache.stats()}")
 
 pr.disable()
 s = io.StringIO()
@@ -0,0 +1,283 @@
+"""
+Benchmark suite on the HPO files shipped in data/hpo
+
+Times graph build, information content, every search method (cold, with an
+empty score cache, and warm) and ranking, and measures peak memory.
+Results are written as JSON and can be compared against a stored baseline:
+
+python benchmarks/suite.py --output results.json
+python benchmarks/suite.py --output results.json --baseline baseline.json --threshold 0.2
+
+The exit code is 1 if any benchmark is slower than the baseline by more
+than the threshold
+"""
+import argparse
+import gc
+import gzip
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from pumpkin_py import (
+    build_graph_from_closure_file,
+    build_ic_graph_from_closures,
+    flat_to_annotations,
+    get_methods,
+    search,
+)
+from pumpkin_py.models.result import SearchResult, SimMatch
+from pumpkin_py.utils.ic_utils import make_ic_map
+from pumpkin_py.utils.ranker import rank_results
+
+data_dir = Path(__file__).parents[1] / 'data' / 'hpo'
+closures = data_dir / 'hp-closures.tsv.gz'
+annotations = data_dir / 'phenotype-annotations.tsv.gz'
+
+root = "HP:0000118"
+
+
+def measure(fx: Callable, runs: int, setup: Optional[Callable] = None) -> List[float]:
+    """
+    :param fx: Function to time
+    :param runs: Number of timed runs
+    :param setup: Optional function called, untimed, before each run
+    :return: list of run times in seconds
+    """
+    times = []
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        fx()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def peak_memory(fx: Callable) -> int:
+    """
+    :return: peak memory allocated by Python while running fx, in bytes
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fx()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(times: List[float], entities: Optional[int] = None) -> Dict:
+    """
+    :param times: run times in seconds
+    :param entities: entities processed per run, for throughput
+    :return: dictionary of statistics in seconds and entities per second
+    """
+    ordered = sorted(times)
+    median = float(np.median(ordered))
+    summary = {
+        'runs': len(ordered),
+        'median_s': median,
+        'p95_s': ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)],
+        'min_s': ordered[0],
+    }
+    if entities is not None:
+        summary['entities'] = entities
+        summary['throughput_per_s'] = entities / median if median else None
+    return summary
+
+
+def get_metadata(args: argparse.Namespace) -> Dict:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'repeat': args.repeat,
+        'profiles': args.profiles,
+        'seed': args.seed,
+    }
+
+
+def run_suite(args: argparse.Namespace) -> Dict:
+    benchmarks = {}
+
+    def log(name: str):
+        summary = benchmarks[name]
+        print(f"{name:<32} median {summary['median_s']:.4f}s  p95 {summary['p95_s']:.4f}s")
+
+    with gzip.open(annotations, 'rt') as annot_file:
+        annot_map = flat_to_annotations(annot_file)
+
+    def build_graph():
+        with gzip.open(closures, 'rt') as closure_file:
+            return build_graph_from_closure_file(closure_file, root)
+
+    graph = build_graph()
+    benchmarks['build/graph'] = summarize(measure(build_graph, args.build_repeat))
+    log('build/graph')
+
+    # Annotations to classes outside the root (eg modes of inheritance) are dropped,
+    # as are annotations to the root, whose information content is 0
+    dataset = {}
+    for entity, profile in annot_map.items():
+        profile = {
+            pheno
+            for pheno in profile
+            if pheno.lstrip('-') in graph.id_map and pheno.lstrip('-') != root
+        }
+        if any(not pheno.startswith('-') for pheno in profile):
+            dataset[entity] = profile
+
+    benchmarks['build/ic'] = summarize(
+        measure(lambda: make_ic_map(graph, dataset), args.build_repeat), len(dataset)
+    )
+    log('build/ic')
+
+    def build_ic_graph():
+        with gzip.open(closures, 'rt') as closure_file:
+            return build_ic_graph_from_closures(closure_file, root, dataset)
+
+    ic_graph = build_ic_graph()
+    benchmarks['build/ic_graph'] = summarize(measure(build_ic_graph, args.build_repeat))
+    log('build/ic_graph')
+
+    rng = random.Random(args.seed)
+    query_entities = rng.sample(sorted(dataset.keys()), args.profiles)
+    profiles = [
+        sorted(pheno for pheno in dataset[entity] if not pheno.startswith('-'))
+        for entity in query_entities
+    ]
+
+    for method in get_methods():
+        cold_times, warm_times = [], []
+        for profile in profiles:
+            cold_times.extend(
+                measure(
+                    lambda: search(profile, dataset, ic_graph, method),
+                    1,
+                    setup=ic_graph.score_cache.clear,
+                )
+            )
+            warm_times.extend(
+                measure(lambda: search(profile, dataset, ic_graph, method), args.repeat)
+            )
+        benchmarks[f'search/{method}/cold'] = summarize(cold_times, len(dataset))
+        log(f'search/{method}/cold')
+        benchmarks[f'search/{method}/warm'] = summarize(warm_times, len(dataset))
+        log(f'search/{method}/warm')
+
+    # Ranking with ties, scores rounded as for a coarse method
+    scores = np.round(np.random.default_rng(args.seed).random(len(dataset)), 2).tolist()
+
+    def rank():
+        search_result = SearchResult(
+            results=[
+                SimMatch(id=entity, rank=0, score=score) for entity, score in zip(dataset, scores)
+            ]
+        )
+        rank_results(search_result)
+
+    benchmarks['rank'] = summarize(measure(rank, args.repeat * len(profiles)), len(dataset))
+    log('rank')
+
+    memory = {}
+    if not args.no_memory:
+        memory['build/ic_graph'] = peak_memory(build_ic_graph)
+        for method in get_methods():
+            ic_graph.score_cache.clear()
+            memory[f'search/{method}/cold'] = peak_memory(
+                lambda: search(profiles[0], dataset, ic_graph, method)
+            )
+        for name, peak in memory.items():
+            print(f"{name:<32} peak memory {peak / 1024 / 1024:.1f} MiB")
+
+    return {
+        'metadata': get_metadata(args),
+        'dataset': {'entities': len(dataset), 'classes': len(ic_graph.id_map)},
+        'benchmarks': benchmarks,
+        'peak_memory_bytes': memory,
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Compare median times against a baseline
+
+    :param results: output of run_suite
+    :param baseline: output of run_suite, eg loaded from a stored file
+    :param threshold: allowed relative slowdown, eg 0.2 for 20%
+    :return: names of benchmarks that regressed
+    """
+    regressions = []
+    print(f"\n{'benchmark':<32} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, summary in results['benchmarks'].items():
+        if name not in baseline.get('benchmarks', {}):
+            continue
+        base_median = baseline['benchmarks'][name]['median_s']
+        median = summary['median_s']
+        change = (median - base_median) / base_median if base_median else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<32} {base_median:>9.4f}s {median:>9.4f}s {change:>+7.1%}{flag}")
+
+    for name, peak in results.get('peak_memory_bytes', {}).items():
+        base_peak = baseline.get('peak_memory_bytes', {}).get(name)
+        if base_peak and (peak - base_peak) / base_peak > threshold:
+            regressions.append(f'{name} (memory)')
+            print(f"{name:<32} peak memory {base_peak} -> {peak} bytes  REGRESSION")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--output', help="JSON file to write results to")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument(
+        '--threshold', type=float, default=0.2, help="allowed relative slowdown (default 0.2)"
+    )
+    parser.add_argument('--repeat', type=int, default=3, help="warm runs per profile")
+    parser.add_argument('--build-repeat', type=int, default=3, help="runs of build benchmarks")
+    parser.add_argument('--profiles', type=int, default=2, help="query profiles per method")
+    parser.add_argument('--seed', type=int, default=42, help="seed for sampling query profiles")
+    parser.add_argument('--no-memory', action='store_true', help="skip peak memory runs")
+    args = parser.parse_args()
+
+    results = run_suite(args)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,15 +4,31 @@ Top level package
 
 from .builder.annotation_builder import flat_to_annotations
 from .builder.graph_builder import (
+    build_corpus,
     build_graph_from_closure_file,
+    build_graph_from_edge_file,
+    build_graph_from_obo,
     build_graph_from_rdflib,
     build_ic_graph_from_closures,
+    build_ic_graph_from_edge_file,
     build_ic_graph_from_iri,
+    build_ic_graph_from_obo,
+    build_ic_model_from_closures,
 )
+from .builder.mica_builder import build_mica_table
 from .graph.graph import Graph
 from .graph.ic_graph import ICGraph
+from .graph.ic_model import ICModel
+from .models.methods import MatrixScore
+from .models.result import ColumnarResult, MetricResult, SearchStats
+from .sim.async_search import AsyncSearcher, async_search
+from .sim.closure_matrix import ClosureMatrix
 from .sim.graph_semsim import GraphSemSim
 from .sim.ic_semsim import ICSemSim, MatrixMetric, PairwiseSim
-from .sim.search import get_methods, search
+from .sim.search import SearchPool, get_methods, search, search_many, search_metrics
 from .sim.semantic_dist import SemanticDist
-from .utils.ranker import RankMethod, rerank_ties
+from .sim.vector_semsim import VectorSemSim
+from .store.annotation_store import AnnotationStore, CompiledDataset
+from .store.mica_table import MicaTable
+from .utils.instrumentation import instrument
+from .utils.ranker import RankMethod, rank_scores, rerank_ties
@@ -1,20 +1,25 @@
 import csv
+from array import array
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Dict, Optional, Set, TextIO, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple, Union
 
+import numpy as np
 from bidict import bidict
-from pyroaring import FrozenBitMap
+from pyroaring import BitMap, FrozenBitMap
 from rdflib import OWL, RDFS, BNode
 from rdflib import Graph as RDFLibGraph
 from rdflib import Literal, URIRef, util
 
 from ..graph.graph import Graph
 from ..graph.ic_graph import ICGraph
-from ..models.namespace import Namespace
+from ..graph.ic_model import ICModel
+from ..models.namespace import NAMESPACE_PREFIXES, Namespace, get_namespace
 from ..store.ic_store import ICStore
 from ..utils.ic_utils import make_ic_map
 
+OBO_PREFIX = "http://purl.obolibrary.org/obo/"
+
 
 @dataclass
 class FamilyTree:
@@ -24,41 +29,56 @@ class FamilyTree:
 
 
 def get_family_from_rdflib(iri: str, root: str) -> FamilyTree:
-    ancestors = {}
-    descendants = {}
-    graph = RDFLibGraph()
-    graph.load(iri, format=util.guess_format(iri))
-    id_map = bidict()
-    id = 0
-    descendants[root] = get_descendants(root, graph)
-    for node in descendants[root]:
-        id_map[node] = id
-        id += 1
-        ancestors[node] = get_ancestors(node, graph, root)
-        descendants[node] = get_descendants(node, graph)
+    """
+    Reflexive ancestors and descendants, as sets of curies, of the root
+    and its descendants, see _rdflib_closures
 
+    :param iri: URL or local file path to iri, see build_graph_from_rdflib
+    :param root: root ontology term for semantic sim, eg HP:0000118 for HPO
+    :return: FamilyTree
+    """
+    closure_graph = _rdflib_closures(iri, root)
+    curies = closure_graph.id_map.inverse
+    id_map = bidict()
+    for node in closure_graph.get_descendants(root):
+        id_map[curies[node]] = len(id_map)
+
+    ancestors = {
+        curie: {curies[node] for node in bitmap}
+        for curie, bitmap in closure_graph.ancestors.items()
+    }
+    descendants = {
+        curie: {curies[node] for node in bitmap}
+        for curie, bitmap in closure_graph.descendants.items()
+    }
     return FamilyTree(ancestors, descendants, id_map)
 
 
-def build_graph_from_rdflib(iri: str, root: str):
+def build_graph_from_rdflib(
+    iri: str, root: str, namespace_prefixes: Optional[Dict[str, Iterable[str]]] = None
+):
     """
     Build graph using RDFLib
 
-    Easier for testing small ontologies and datasets without robot
+    Builds a graph from an OWL file without robot, closures are computed
+    in one pass over the subClassOf and equivalentClass axioms, see
+    _rdflib_closures, so parsing the file with rdflib is the slowest step
     :param iri: URL or local file path to iri, local files should be
                 prefixed with file:///, see the utility function
                 https://docs.python.org/3/library/pathlib.html#pathlib.PurePath.as_uri
     :param root: root ontology term for semantic sim, eg HP:0000118 for HPO
+    :param namespace_prefixes: Namespaces and the curie prefixes of their classes,
+                               defaults to NAMESPACE_PREFIXES, see _make_namespaces
     :return: Graph object
     """
-    family_graph = get_family_from_rdflib(iri, root)
-    ancestors, descendants, namespaces = _make_bitmaps(family_graph)
-
-    return Graph(root, family_graph.id_map, ancestors, descendants, namespaces)
+    return _compact_graph(_rdflib_closures(iri, root), root, namespace_prefixes)
 
 
 def build_graph_from_closures(
-    ancestors: Dict[str, Set[str]], descendants: Dict[str, Set[str]], root: str
+    ancestors: Dict[str, Set[str]],
+    descendants: Dict[str, Set[str]],
+    root: str,
+    namespace_prefixes: Optional[Dict[str, Iterable[str]]] = None,
 ) -> Graph:
     id_map = bidict()
     id = 0
@@ -66,18 +86,49 @@ def build_graph_from_closures(
         id_map[node] = id
         id += 1
 
-    ancestors, descendants, namespaces = _make_bitmaps(FamilyTree(ancestors, descendants, id_map))
+    ancestors, descendants, namespaces = _make_bitmaps(
+        FamilyTree(ancestors, descendants, id_map), namespace_prefixes
+    )
 
     return Graph(root, id_map, ancestors, descendants, namespaces)
 
 
-def build_graph_from_closure_file(closure_file: TextIO, root: str) -> Graph:
-    ancestors, descendants = _get_closures(closure_file, root)
-    return build_graph_from_closures(ancestors, descendants, root)
+def build_graph_from_closure_file(
+    closure_file: TextIO, root: str, namespace_prefixes: Optional[Dict[str, Iterable[str]]] = None
+) -> Graph:
+    return _compact_graph(_stream_closures(closure_file, root), root, namespace_prefixes)
+
+
+def _compact_graph(
+    closure_graph: Graph, root: str, namespace_prefixes: Optional[Dict[str, Iterable[str]]] = None
+) -> Graph:
+    """
+    Graph with ids compacted to the root and its descendants
+
+    :param closure_graph: Graph with interned ids, see _stream_closures
+    :param root: root class as curie formatted string
+    :param namespace_prefixes: Namespaces and the curie prefixes of their classes,
+                               defaults to NAMESPACE_PREFIXES, see _make_namespaces
+    :return: Graph
+    """
+    # Compact the ids of the root and its descendants, in file order
+    id_map = bidict()
+    remap = np.zeros(len(closure_graph.id_map), dtype=np.uint32)
+    for node in closure_graph.get_descendants(root):
+        remap[node] = len(id_map)
+        id_map[closure_graph.id_map.inverse[node]] = len(id_map)
+
+    ancestors, descendants = _remap_closures(closure_graph, remap)
+    namespaces = _make_namespaces(id_map, namespace_prefixes)
+    return Graph(root, id_map, ancestors, descendants, namespaces)
 
 
 def build_ic_graph_from_closures(
-    closure_file: TextIO, root: str, annotations: Optional[Dict[str, Set[str]]] = None
+    closure_file: TextIO,
+    root: str,
+    annotations: Optional[Dict[str, Set[str]]] = None,
+    corpora: Optional[Dict[str, Dict[str, Set[str]]]] = None,
+    namespace_prefixes: Optional[Dict[str, Iterable[str]]] = None,
 ) -> ICGraph:
     """
     There's an awkward two-way dependency on an ic graph
@@ -90,11 +141,35 @@ def build_ic_graph_from_closures(
       parent-child class relationships with transitive relationships enumerated
     :param root: root class as  curie formatted string
     :param annotations: Annotation map, eg output from builder.annotation_builder.flat_to_annotations
+    :param corpora: Annotation maps of other corpora by name, see build_corpus
+    :param namespace_prefixes: Namespaces and the curie prefixes of their classes,
+                               defaults to NAMESPACE_PREFIXES, see _make_namespaces
 
     :return: CacheGraph object with is_ordered=True
     """
-    ancestors, descendants = _get_closures(closure_file, root)
-    tmp_graph = build_graph_from_closures(ancestors, descendants, root)
+    return _make_ic_graph(
+        _stream_closures(closure_file, root), root, annotations, corpora, namespace_prefixes
+    )
+
+
+def _make_ic_graph(
+    tmp_graph: Graph,
+    root: str,
+    annotations: Optional[Dict[str, Set[str]]] = None,
+    corpora: Optional[Dict[str, Dict[str, Set[str]]]] = None,
+    namespace_prefixes: Optional[Dict[str, Iterable[str]]] = None,
+) -> ICGraph:
+    """
+    ICGraph with ids encoded in ascending order of information content
+
+    :param tmp_graph: Graph with interned ids, see _stream_closures
+    :param root: root class as curie formatted string
+    :param annotations: Annotation map, eg output from builder.annotation_builder.flat_to_annotations
+    :param corpora: Annotation maps of other corpora by name, see build_corpus
+    :param namespace_prefixes: Namespaces and the curie prefixes of their classes,
+                               defaults to NAMESPACE_PREFIXES, see _make_namespaces
+    :return: ICGraph
+    """
     unsorted_ic = make_ic_map(tmp_graph, annotations)
 
     sorted_ic_twotuple = sorted([(cls, ic) for cls, ic in unsorted_ic.items()], key=lambda x: x[1])
@@ -102,19 +177,74 @@ def build_ic_graph_from_closures(
     id = 0
     ic_map = {}
     id_map = bidict()
+    remap = np.zeros(len(tmp_graph.id_map), dtype=np.uint32)
     for node, ic in sorted_ic_twotuple:
         id_map[tmp_graph.id_map.inverse[node]] = id
         ic_map[id] = ic
+        remap[node] = id
         id += 1
 
-    ancestors, descendants, namespaces = _make_bitmaps(FamilyTree(ancestors, descendants, id_map))
+    ancestors, descendants = _remap_closures(tmp_graph, remap)
+    namespaces = _make_namespaces(id_map, namespace_prefixes)
     ic_store = ICStore(ic_map=ic_map, id_map=id_map)
 
-    return ICGraph(root, id_map, ancestors, descendants, ic_store, namespaces)
+    graph = ICGraph(root, id_map, ancestors, descendants, ic_store, namespaces)
+    for name, corpus in (corpora or {}).items():
+        # Information content of the unsorted graph, as for a graph built from the corpus
+        graph.add_corpus(name, _make_corpus(tmp_graph, corpus, remap, id_map))
+    return graph
+
+
+def build_corpus(
+    graph: ICGraph, annotations: Dict[str, Set[str]], name: Optional[str] = None
+) -> ICStore:
+    """
+    Information content of another annotation corpus of a graph,
+    added to the graph when a name is given, see ICGraph.add_corpus
+
+    Laplacian smoothing visits classes in id order, so the information
+    content can differ slightly from a graph built from the corpus,
+    pass corpora to the graph builders for the same information content
+
+    :param graph: ICGraph
+    :param annotations: Annotation map, eg output from builder.annotation_builder.flat_to_annotations
+    :param name: Optional corpus name to add the corpus to the graph with, see ICGraph.with_corpus
+    :return: ICStore using the id_map of graph
+    """
+    remap = np.arange(len(graph.id_map), dtype=np.uint32)
+    ic_store = _make_corpus(graph, annotations, remap, graph.id_map)
+    if name is not None:
+        graph.add_corpus(name, ic_store)
+    return ic_store
+
+
+def _make_corpus(
+    graph: Graph, annotations: Dict[str, Set[str]], remap: np.ndarray, id_map: bidict
+) -> ICStore:
+    """
+    :param graph: Graph the information content is computed with
+    :param annotations: Annotation map
+    :param remap: numpy array indexed by the ids in graph, containing the ids in id_map
+    :param id_map: id_map of the ICGraph the corpus is added to
+    :return: ICStore ordered by the information content of the corpus
+    """
+    unsorted_ic = make_ic_map(graph, annotations)
+    ic = np.zeros(len(id_map), dtype=np.float64)
+    ic[remap[list(unsorted_ic.keys())]] = list(unsorted_ic.values())
+    # Stable, so classes with equal information content keep the order of graph
+    order = remap[sorted(unsorted_ic, key=unsorted_ic.get)]
+    if np.array_equal(order, np.arange(len(order))):
+        # Ids are already in ascending order, MICAs are bitmap maximums
+        order = None
+    return ICStore(ic, id_map, order=order)
 
 
 def build_ic_graph_from_iri(
-    iri: str, root: str, annotations: Optional[Dict[str, Set[str]]] = None
+    iri: str,
+    root: str,
+    annotations: Optional[Dict[str, Set[str]]] = None,
+    corpora: Optional[Dict[str, Dict[str, Set[str]]]] = None,
+    namespace_prefixes: Optional[Dict[str, Iterable[str]]] = None,
 ) -> ICGraph:
     """
     There's an awkward two-way dependency on an ic graph
@@ -127,29 +257,126 @@ def build_ic_graph_from_iri(
       parent-child class relationships with transitive relationships enumerated
     :param root: root class as  curie formatted string
     :param annotations: Annotation map, eg output from builder.annotation_builder.flat_to_annotations
+    :param corpora: Annotation maps of other corpora by name, see build_corpus
+    :param namespace_prefixes: Namespaces and the curie prefixes of their classes,
+                               defaults to NAMESPACE_PREFIXES, see _make_namespaces
 
     :return: CacheGraph object with is_ordered=True
     """
-    family_tree = get_family_from_rdflib(iri, root)
-    bit_ancestors, bit_descendants, namespaces = _make_bitmaps(family_tree)
-    tmp_graph = Graph(root, family_tree.id_map, bit_ancestors, bit_descendants, namespaces)
-    unsorted_ic = make_ic_map(tmp_graph, annotations)
+    return _make_ic_graph(
+        _rdflib_closures(iri, root), root, annotations, corpora, namespace_prefixes
+    )
+
+
+def build_ic_model_from_closures(
+    closure_file: TextIO,
+    root: str,
+    annotations: Dict[str, Set[str]],
+    tolerance: float = 0.0,
+    namespace_prefixes: Optional[Dict[str, Iterable[str]]] = None,
+) -> ICModel:
+    """
+    ICGraph, as returned by build_ic_graph_from_closures, together with the
+    annotation counts needed to update its information content, see ICModel
 
-    sorted_ic_twotuple = sorted([(cls, ic) for cls, ic in unsorted_ic.items()], key=lambda x: x[1])
-    # Int encode in ascending order
-    id = 0
-    ic_map = {}
-    id_map = bidict()
-    for node, ic in sorted_ic_twotuple:
-        id_map[tmp_graph.id_map.inverse[node]] = id
-        ic_map[id] = ic
-        id += 1
+    :param closure_file: two column closure file, see build_ic_graph_from_closures
+    :param root: root class as curie formatted string
+    :param annotations: Annotation map, eg output from builder.annotation_builder.flat_to_annotations
+    :param tolerance: Information content inversion allowed before classes are re-sorted
+    :param namespace_prefixes: Namespaces and the curie prefixes of their classes,
+                               defaults to NAMESPACE_PREFIXES, see _make_namespaces
+    :return: ICModel, the graph is available as ICModel.graph
+    """
+    tmp_graph = _stream_closures(closure_file, root)
+    graph = _make_ic_graph(tmp_graph, root, annotations, namespace_prefixes=namespace_prefixes)
+    # make_ic_map smooths classes in the id order of the unsorted graph
+    smoothing_order = [tmp_graph.id_map.inverse[node] for node in tmp_graph.get_descendants(root)]
+    return ICModel(graph, annotations, smoothing_order, tolerance)
 
-    new_graph = FamilyTree(family_tree.ancestors, family_tree.descendants, id_map)
-    ancestors, descendants, namespaces = _make_bitmaps(new_graph)
-    ic_store = ICStore(ic_map=ic_map, id_map=id_map)
 
-    return ICGraph(root, id_map, ancestors, descendants, ic_store, namespaces)
+def build_graph_from_edge_file(
+    edge_file: TextIO, root: str, namespace_prefixes: Optional[Dict[str, Iterable[str]]] = None
+) -> Graph:
+    """
+    Build graph from direct parent-child edges, closures are computed
+    with bitmaps rather than read from a closure file, see _edges_to_closures
+
+    :param edge_file:
+      text I/O stream such as returned by open(), containing a two column file with
+      child-parent class relationships, transitive relationships are not required
+    :param root: root class as curie formatted string
+    :param namespace_prefixes: Namespaces and the curie prefixes of their classes,
+                               defaults to NAMESPACE_PREFIXES, see _make_namespaces
+    :return: Graph object
+    """
+    closure_graph = _edges_to_closures(_read_edge_file(edge_file), root)
+    return _compact_graph(closure_graph, root, namespace_prefixes)
+
+
+def build_ic_graph_from_edge_file(
+    edge_file: TextIO,
+    root: str,
+    annotations: Optional[Dict[str, Set[str]]] = None,
+    corpora: Optional[Dict[str, Dict[str, Set[str]]]] = None,
+    namespace_prefixes: Optional[Dict[str, Iterable[str]]] = None,
+) -> ICGraph:
+    """
+    :param edge_file: two column child-parent file, see build_graph_from_edge_file
+    :param root: root class as curie formatted string
+    :param annotations: Annotation map, eg output from builder.annotation_builder.flat_to_annotations
+    :param corpora: Annotation maps of other corpora by name, see build_corpus
+    :param namespace_prefixes: Namespaces and the curie prefixes of their classes,
+                               defaults to NAMESPACE_PREFIXES, see _make_namespaces
+    :return: ICGraph, as returned by build_ic_graph_from_closures for the closures of the edges
+    """
+    return _make_ic_graph(
+        _edges_to_closures(_read_edge_file(edge_file), root),
+        root,
+        annotations,
+        corpora,
+        namespace_prefixes,
+    )
+
+
+def build_graph_from_obo(
+    obo_file: TextIO, root: str, namespace_prefixes: Optional[Dict[str, Iterable[str]]] = None
+) -> Graph:
+    """
+    Build graph from the is_a and equivalent_to tags of an OBO file, see _read_obo
+
+    :param obo_file: OBO format text I/O stream such as returned by open()
+    :param root: root class as curie formatted string
+    :param namespace_prefixes: Namespaces and the curie prefixes of their classes,
+                               defaults to NAMESPACE_PREFIXES, see _make_namespaces
+    :return: Graph object
+    """
+    closure_graph = _edges_to_closures(_read_obo(obo_file), root)
+    return _compact_graph(closure_graph, root, namespace_prefixes)
+
+
+def build_ic_graph_from_obo(
+    obo_file: TextIO,
+    root: str,
+    annotations: Optional[Dict[str, Set[str]]] = None,
+    corpora: Optional[Dict[str, Dict[str, Set[str]]]] = None,
+    namespace_prefixes: Optional[Dict[str, Iterable[str]]] = None,
+) -> ICGraph:
+    """
+    :param obo_file: OBO format text I/O stream such as returned by open()
+    :param root: root class as curie formatted string
+    :param annotations: Annotation map, eg output from builder.annotation_builder.flat_to_annotations
+    :param corpora: Annotation maps of other corpora by name, see build_corpus
+    :param namespace_prefixes: Namespaces and the curie prefixes of their classes,
+                               defaults to NAMESPACE_PREFIXES, see _make_namespaces
+    :return: ICGraph, as returned by build_ic_graph_from_closures for the closures of the file
+    """
+    return _make_ic_graph(
+        _edges_to_closures(_read_obo(obo_file), root),
+        root,
+        annotations,
+        corpora,
+        namespace_prefixes,
+    )
 
 
 def _get_closures(
@@ -184,33 +411,379 @@ def _get_closures(
     return ancestors, descendants
 
 
+def _stream_closures(closure_file: TextIO, root: str) -> Graph:
+    """
+    Read a two column closure file into a graph without building
+    sets of curies, see _get_closures for the equivalent dictionaries
+
+    Curies are interned to integers, in the order they are first read, as
+    the file is streamed into two integer arrays of subject and object ids.
+    The arrays are then grouped into ancestor and descendant bitmaps, and
+    ancestors above the root are removed with a bitmap intersection
+
+    :param closure_file:
+      text I/O stream such as returned by open(), containing a two column file with
+      parent-child class relationships with transitive relationships enumerated
+    :param root: root class as  curie formatted string
+
+    :return: Graph where ids are the interned ids, including classes outside
+             of the root (eg owl:Class, HP:0000001) which are only in id_map
+    """
+    curie_ids: Dict[str, int] = {}
+    subjects = array('I')
+    objects = array('I')
+    reader = csv.reader(closure_file, delimiter='\t', quotechar='\"')
+    for row in reader:
+        if row[0].startswith('#'):
+            continue
+        (node_a, node_b) = row[0:2]
+
+        subjects.append(curie_ids.setdefault(node_a, len(curie_ids)))
+        objects.append(curie_ids.setdefault(node_b, len(curie_ids)))
+
+    curies = list(curie_ids.keys())
+    subjects = np.frombuffer(subjects, dtype=np.uint32)
+    objects = np.frombuffer(objects, dtype=np.uint32)
+
+    descendants = _group_bitmaps(objects, subjects)
+    root_descendants = descendants.get(curie_ids.get(root), FrozenBitMap())
+    ancestors = {
+        curies[node]: bitmap.intersection(root_descendants)
+        for node, bitmap in _group_bitmaps(subjects, objects).items()
+    }
+    descendants = {
+        curies[node]: bitmap.intersection(root_descendants) for node, bitmap in descendants.items()
+    }
+
+    return Graph(root, bidict(curie_ids), ancestors, descendants)
+
+
+def _rdflib_closures(iri: str, root: str) -> Graph:
+    """
+    Compute reflexive closures from the subClassOf and equivalentClass
+    axioms of an ontology loaded with rdflib
+
+    Direct edges between named classes are read once, equivalentClass as
+    an edge in both directions, see _edges_to_closures
+
+    :param iri: URL or local file path to iri, see build_graph_from_rdflib
+    :param root: root class as curie formatted string
+    :return: Graph where ids are the interned ids, keyed by the root and its descendants
+    """
+    graph = RDFLibGraph()
+    graph.load(iri, format=util.guess_format(iri))
+
+    def get_edges() -> Iterator[Tuple[str, str]]:
+        for subject, obj in graph.subject_objects(RDFS['subClassOf']):
+            if isinstance(subject, URIRef) and isinstance(obj, URIRef):
+                yield _iri_to_curie(subject), _iri_to_curie(obj)
+        for subject, obj in graph.subject_objects(OWL['equivalentClass']):
+            if isinstance(subject, URIRef) and isinstance(obj, URIRef):
+                yield _iri_to_curie(subject), _iri_to_curie(obj)
+                yield _iri_to_curie(obj), _iri_to_curie(subject)
+
+    return _edges_to_closures(get_edges(), root)
+
+
+def _read_edge_file(edge_file: TextIO) -> Iterator[Tuple[str, str]]:
+    """
+    :param edge_file: two column child-parent file, lines starting with # are skipped
+    :return: Iterator of child, parent tuples
+    """
+    reader = csv.reader(edge_file, delimiter='\t', quotechar='\"')
+    for row in reader:
+        if not row or row[0].startswith('#'):
+            continue
+        yield row[0], row[1]
+
+
+def _read_obo(obo_file: TextIO) -> Iterator[Tuple[str, str]]:
+    """
+    Read the direct edges of an OBO file, is_a tags as given and
+    equivalent_to tags as an edge in both directions
+
+    Only [Term] stanzas are read, obsolete terms are skipped, and
+    relationship and intersection_of tags are ignored
+
+    :param obo_file: OBO format text I/O stream
+    :return: Iterator of child, parent tuples
+    """
+    term_id = None
+    is_term = False
+    is_obsolete = False
+    edges: List[Tuple[str, str]] = []
+
+    def flush() -> List[Tuple[str, str]]:
+        if is_term and term_id is not None and not is_obsolete:
+            return [(child or term_id, parent or term_id) for child, parent in edges]
+        return []
+
+    for line in obo_file:
+        line = line.strip()
+        if not line or line.startswith('!'):
+            continue
+        if line.startswith('['):
+            yield from flush()
+            is_term = line == '[Term]'
+            term_id, is_obsolete, edges = None, False, []
+            continue
+        if not is_term or ':' not in line:
+            continue
+
+        tag, value = line.split(':', 1)
+        # Drop trailing comments and qualifiers, eg is_a: HP:0000118 ! Phenotypic abnormality
+        value = value.split('!', 1)[0].split('{', 1)[0].strip()
+        if tag == 'id':
+            term_id = value
+        elif tag == 'is_obsolete':
+            is_obsolete = value == 'true'
+        elif tag == 'is_a':
+            edges.append((None, value))
+        elif tag == 'equivalent_to':
+            edges.append((None, value))
+            edges.append((value, None))
+
+    yield from flush()
+
+
+def _edges_to_closures(edges: Iterable[Tuple[str, str]], root: str) -> Graph:
+    """
+    Compute reflexive closures from direct child-parent edges
+
+    Curies are interned to integers as edges are read, closures are
+    propagated along the edges, see _propagate_closures, so cycles
+    (eg equivalent classes) and mixed paths (eg subClassOf - equivalentClass -
+    subClassOf) are part of the closures.  Closures are then restricted to
+    the root and its descendants
+
+    :param edges: Iterable of child, parent curie tuples
+    :param root: root class as curie formatted string
+    :return: Graph where ids are the interned ids, keyed by the root and its descendants
+    """
+    curie_ids: Dict[str, int] = {root: 0}
+    children = array('I')
+    parents = array('I')
+    for child, parent in edges:
+        children.append(curie_ids.setdefault(child, len(curie_ids)))
+        parents.append(curie_ids.setdefault(parent, len(curie_ids)))
+
+    ancestors, descendants = _propagate_closures(
+        len(curie_ids),
+        np.frombuffer(children, dtype=np.uint32),
+        np.frombuffer(parents, dtype=np.uint32),
+    )
+
+    curies = list(curie_ids.keys())
+    root_descendants = descendants[curie_ids[root]]
+    return Graph(
+        root,
+        bidict(curie_ids),
+        {curies[node]: ancestors[node].intersection(root_descendants) for node in root_descendants},
+        {curies[node]: descendants[node] for node in root_descendants},
+    )
+
+
+def _propagate_closures(
+    node_count: int, children: np.ndarray, parents: np.ndarray
+) -> Tuple[List[FrozenBitMap], List[FrozenBitMap]]:
+    """
+    Reflexive ancestor and descendant closures of a directed graph
+
+    Cycles (eg equivalent classes) are collapsed into their strongly connected
+    components, whose members share their closures.  Ancestor closures are the
+    union of a component and the closures of its parent components, computed
+    parents first, and descendant closures the same in the reverse order
+
+    :param node_count: number of nodes, ids are 0 to node_count - 1
+    :param children: child id of each edge
+    :param parents: parent id of each edge
+    :return: Tuple of ancestors and descendants, lists indexed by id
+    """
+    parent_lists: List[List[int]] = [[] for _ in range(node_count)]
+    child_lists: List[List[int]] = [[] for _ in range(node_count)]
+    for child, parent in zip(children.tolist(), parents.tolist()):
+        parent_lists[child].append(parent)
+        child_lists[parent].append(child)
+
+    components, component_of = _get_components(parent_lists)
+
+    def propagate(order: Iterable[int], neighbours: List[List[int]]) -> List[FrozenBitMap]:
+        closures: List[Optional[FrozenBitMap]] = [None] * len(components)
+        for component in order:
+            members = components[component]
+            bitmaps = [
+                closures[component_of[neighbour]]
+                for member in members
+                for neighbour in neighbours[member]
+                if component_of[neighbour] != component
+            ]
+            closures[component] = FrozenBitMap(BitMap(members).union(*bitmaps))
+        return [closures[component_of[node]] for node in range(node_count)]
+
+    ancestors = propagate(range(len(components)), parent_lists)
+    descendants = propagate(reversed(range(len(components))), child_lists)
+    return ancestors, descendants
+
+
+def _get_components(successors: List[List[int]]) -> Tuple[List[List[int]], List[int]]:
+    """
+    Strongly connected components with an iterative version of Tarjan's algorithm
+
+    :param successors: successor ids of each node
+    :return: components, ordered so each component comes after every
+             component it has an edge to, and the component index of each node
+    """
+    node_count = len(successors)
+    index = [-1] * node_count
+    lowlink = [0] * node_count
+    on_stack = [False] * node_count
+    component_of = [-1] * node_count
+    components: List[List[int]] = []
+    stack: List[int] = []
+    counter = 0
+
+    for start in range(node_count):
+        if index[start] != -1:
+            continue
+        index[start] = lowlink[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack[start] = True
+        # nodes being visited and the position of the next successor to visit
+        work = [(start, 0)]
+        while work:
+            node, position = work[-1]
+            if position < len(successors[node]):
+                work[-1] = (node, position + 1)
+                successor = successors[node][position]
+                if index[successor] == -1:
+                    index[successor] = lowlink[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack[successor] = True
+                    work.append((successor, 0))
+                elif on_stack[successor]:
+                    lowlink[node] = min(lowlink[node], index[successor])
+                continue
+
+            work.pop()
+            if work:
+                caller = work[-1][0]
+                lowlink[caller] = min(lowlink[caller], lowlink[node])
+            if lowlink[node] == index[node]:
+                members = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component_of[member] = len(components)
+                    members.append(member)
+                    if member == node:
+                        break
+                components.append(members)
+
+    return components, component_of
+
+
+def _iri_to_curie(iri: URIRef) -> str:
+    return str(iri).replace(OBO_PREFIX, "").replace("_", ":")
+
+
+def _group_bitmaps(keys: np.ndarray, values: np.ndarray) -> Dict[int, FrozenBitMap]:
+    """
+    Group the values of an edge list by key
+
+    :return: Dictionary of key (integer) and a bitmap of its values
+    """
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    values = values[order]
+    starts = np.flatnonzero(np.diff(keys)) + 1
+    bitmaps = {}
+    for key, group in zip(keys[np.r_[0, starts]].tolist(), np.split(values, starts)):
+        bitmaps[key] = _to_bitmap(group)
+    return bitmaps
+
+
+def _remap_closures(
+    graph: Graph, remap: np.ndarray
+) -> Tuple[Dict[str, FrozenBitMap], Dict[str, FrozenBitMap]]:
+    """
+    Re-encode the ancestor and descendant bitmaps of a graph
+
+    :param graph: Graph whose bitmaps are re-encoded
+    :param remap: numpy array indexed by the ids in graph, containing the new ids
+    :return: Tuple of ancestors, descendants
+    """
+    ancestors = {
+        node: _to_bitmap(remap[np.frombuffer(bitmap.to_array(), dtype=np.uint32)])
+        for node, bitmap in graph.ancestors.items()
+    }
+    descendants = {
+        node: _to_bitmap(remap[np.frombuffer(bitmap.to_array(), dtype=np.uint32)])
+        for node, bitmap in graph.descendants.items()
+    }
+    return ancestors, descendants
+
+
+def _to_bitmap(values: np.ndarray) -> FrozenBitMap:
+    # pyroaring builds bitmaps from uint32 arrays much faster than from numpy arrays
+    return FrozenBitMap(array('I', values.astype(np.uint32).tobytes()))
+
+
+def _make_namespaces(
+    id_map: bidict, namespace_prefixes: Optional[Dict[str, Iterable[str]]] = None
+) -> Dict[Union[Namespace, str], FrozenBitMap]:
+    """
+    Create a namespace:bitmap dictionary in one pass over the id_map
+
+    Every curie prefix is a namespace of its own (eg MONDO), and each namespace
+    in namespace_prefixes is the union of its prefixes, replacing a prefix
+    namespace of the same name.  By default these are the namespaces defined in
+    models.Namespace, each including UPHENO classes, see NAMESPACE_PREFIXES
+
+    :param id_map: dictionary of curie id (key) to integer encoded id (value)
+    :param namespace_prefixes: Namespaces and the curie prefixes of their classes
+    :return: Dictionary of namespace, a Namespace member where defined, and bitmap
+    """
+    if namespace_prefixes is None:
+        namespace_prefixes = NAMESPACE_PREFIXES
+
+    prefix_ids: Dict[str, array] = {}
+    for node, node_id in id_map.items():
+        prefix = node.split(':', 1)[0]
+        ids = prefix_ids.get(prefix)
+        if ids is None:
+            ids = prefix_ids[prefix] = array('I')
+        ids.append(node_id)
+    prefix_bitmaps = {prefix: FrozenBitMap(ids) for prefix, ids in prefix_ids.items()}
+
+    namespaces = {get_namespace(prefix): bitmap for prefix, bitmap in prefix_bitmaps.items()}
+    for namespace, prefixes in namespace_prefixes.items():
+        namespaces[get_namespace(namespace)] = FrozenBitMap.union(
+            FrozenBitMap(),
+            *[prefix_bitmaps[prefix] for prefix in prefixes if prefix in prefix_bitmaps]
+        )
+    return namespaces
+
+
 def _make_bitmaps(
-    family_graph: FamilyTree,
+    family_graph: FamilyTree, namespace_prefixes: Optional[Dict[str, Iterable[str]]] = None
 ) -> Tuple[Dict[str, FrozenBitMap], Dict[str, FrozenBitMap], Dict[str, FrozenBitMap]]:
     """
     Convert ancestor and descendent str:Set dicts to str:bitmap dicts and create
-    a namespace str:bitmap dictionary using the namespaces defined
-    in models.Namespace
+    a namespace str:bitmap dictionary, see _make_namespaces
 
     :param id_map:
     :param ancestors:
     :param descendants:
+    :param namespace_prefixes: Namespaces and the curie prefixes of their classes
 
     :return: Tuple of ancestors, descendants, namespace
     """
-    namespaces = {}
+    namespaces = _make_namespaces(family_graph.id_map, namespace_prefixes)
     ancestor_bmap = {}
     descendant_bmap = {}
 
-    for ns in Namespace:
-        namespaces[ns] = FrozenBitMap(
-            [
-                family_graph.id_map[node]
-                for node in family_graph.id_map.keys()
-                if node.startswith(ns.value + ':') or node.startswith('UPHENO:')
-            ]
-        )
-
     for node in family_graph.ancestors.keys():
         ancestor_bmap[node] = FrozenBitMap(
             [family_graph.id_map[node] for node in family_graph.ancestors[node]]
@@ -226,7 +799,8 @@ def _make_bitmaps(
 
 def get_ancestors(node: str, graph: RDFLibGraph, root: str) -> Set[str]:
     """
-    Reflexive get_ancestors from an rdflib graph
+    Reflexive get_ancestors of a single class from an rdflib graph,
+    builders compute every closure at once, see _edges_to_closures
 
     Currently traverses subClassOf, equivalentClass outgoing,
     equivalentClass incoming
@@ -271,7 +845,7 @@ def get_ancestors(node: str, graph: RDFLibGraph, root: str) -> Set[str]:
 
 def get_descendants(node: str, graph: RDFLibGraph) -> Set[str]:
     """
-    Reflexive get_descendants from an rdflib graph
+    Reflexive get_descendants of a single class from an rdflib graph
 
     :param node: node as a curie
     :param graph: RDFLib graph object
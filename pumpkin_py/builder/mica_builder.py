@@ -0,0 +1,61 @@
+from collections import defaultdict
+from typing import Iterable, Optional, Union
+
+import numpy as np
+
+from ..graph.ic_graph import ICGraph
+from ..models.namespace import Namespace
+from ..store.mica_table import MicaTable
+
+
+def build_mica_table(
+    graph: ICGraph,
+    terms: Iterable[str],
+    ns_filter: Optional[Union[str, Namespace]] = None,
+) -> MicaTable:
+    """
+    Compute the MICA of every pair of terms, eg every term used to annotate
+    a dataset, the table can be added to a graph with ICStore.add_mica_table
+    and saved with MicaTable.save
+
+    Each row is filled by visiting the ancestors of a term in ascending IC
+    order (ascending id, see ICStore.get_ascending_ids) and assigning each ancestor to the terms it subsumes,
+    leaving the most informative common ancestor in place, as in
+    VectorSemSim.get_mica_vector
+
+    :param graph: ICGraph
+    :param terms: Iterable of curies, terms that are not in the graph are skipped
+    :param ns_filter: restrict MICAs to a namespace
+    :return: MicaTable
+    """
+    ids = np.array(
+        sorted({graph.id_map[term] for term in terms if term in graph.id_map}), dtype=np.int32
+    )
+    namespace = graph.namespaces[ns_filter] if ns_filter else None
+
+    closures = []
+    subsumed = defaultdict(list)
+    for position, node in enumerate(ids.tolist()):
+        closure = graph.get_ancestors(graph.id_map.inverse[node])
+        if namespace is not None:
+            closure = closure.intersection(namespace)
+        closures.append(closure)
+        for ancestor in closure:
+            subsumed[ancestor].append(position)
+    subsumed = {node: np.array(positions, dtype=np.intp) for node, positions in subsumed.items()}
+
+    size = len(ids)
+    micas = np.zeros(size * (size + 1) // 2, dtype=np.int32)
+    row = np.zeros(size, dtype=np.int32)
+    offset = 0
+    for position, closure in enumerate(closures):
+        # Pairs without a common ancestor are assigned to the integer encoded id 0
+        row[position:] = 0
+        for ancestor in graph.ic_store.get_ascending_ids(closure):
+            positions = subsumed[ancestor]
+            # Only the upper triangle is stored
+            row[positions[np.searchsorted(positions, position) :]] = ancestor
+        micas[offset : offset + size - position] = row[position:]
+        offset += size - position
+
+    return MicaTable(ids, micas, len(graph.id_map), ns_filter)
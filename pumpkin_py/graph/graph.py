@@ -1,4 +1,4 @@
-from typing import Dict, Iterable, Optional
+from typing import Dict, Iterable, Optional, Union
 
 from bidict import bidict
 from pyroaring import BitMap, FrozenBitMap
@@ -19,7 +19,7 @@ class Graph:
         id_map: bidict,  # Dict[str, int]
         ancestors: Dict[str, FrozenBitMap],
         descendants: Dict[str, FrozenBitMap],
-        namespaces: Dict[Namespace, FrozenBitMap] = None,
+        namespaces: Dict[Union[Namespace, str], FrozenBitMap] = None,
     ):
         """
 
@@ -33,13 +33,16 @@ class Graph:
                             (self included)
         :param namespaces: dictionary of namespace (key) and frozen bitmap,
                            created from an array of integers of all ids in
-                           the namespace
+                           the namespace, a Namespace member or a name such as
+                           a curie prefix, eg MONDO
         """
         self.root = root
         self.id_map = id_map
         self.ancestors = ancestors
         self.descendants = descendants
         self.namespaces = namespaces
+        # Ancestors intersected with a namespace, per namespace, see get_namespace_ancestors
+        self._namespace_ancestors: Dict[Union[Namespace, str], Dict[str, FrozenBitMap]] = {}
 
     def get_ancestors(self, node: str) -> FrozenBitMap:
         """
@@ -61,6 +64,40 @@ class Graph:
             nodes = FrozenBitMap()
         return nodes
 
+    def get_namespace_ancestors(self, node: str, ns_filter: Union[Namespace, str]) -> FrozenBitMap:
+        """
+        Ancestors of a node in a namespace, the intersection of its ancestors
+        and the namespace bitmap, computed on first use and cached on the graph
+
+        :param node: Curie formatted string
+        :param ns_filter: Namespace, eg Namespace.MP or MONDO
+        :return: List of integer encoded ids as a FrozenBitMap
+        """
+        projection = self._namespace_ancestors.get(ns_filter)
+        if projection is None:
+            projection = self._namespace_ancestors.setdefault(ns_filter, {})
+        nodes = projection.get(node)
+        if nodes is None:
+            nodes = self.get_ancestors(node).intersection(self.namespaces[ns_filter])
+            # Unknown nodes are not cached
+            if node in self.ancestors:
+                projection[node] = nodes
+        return nodes
+
+    def project_namespace(self, ns_filter: Union[Namespace, str]) -> None:
+        """
+        Compute the ancestors in a namespace of every node up front,
+        rather than on first use, see get_namespace_ancestors
+
+        :param ns_filter: Namespace, eg Namespace.MP or MONDO
+        :return: None
+        """
+        namespace = self.namespaces[ns_filter]
+        projection = self._namespace_ancestors.setdefault(ns_filter, {})
+        for node, ancestors in self.ancestors.items():
+            if node not in projection:
+                projection[node] = ancestors.intersection(namespace)
+
     def get_descendants(self, node: str) -> FrozenBitMap:
         """
 
@@ -1,19 +1,38 @@
-from functools import lru_cache
-from typing import Dict, Optional
+import json
+import mmap as mmap_module
+import struct
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Union
 
+import numpy as np
 from bidict import bidict
 from pyroaring import FrozenBitMap
 
-from ..models.namespace import Namespace
+from ..models.namespace import Namespace, get_namespace
 from ..store.ic_store import ICStore
+from ..store.score_cache import DEFAULT_CACHE_BYTES, ScoreCache
 from .graph import Graph
 
+SNAPSHOT_MAGIC = b'PUMPKIN\x00'
+# Version 2 added corpus sections
+SNAPSHOT_VERSION = 2
+SUPPORTED_SNAPSHOT_VERSIONS = (1, 2)
+# Sections are aligned so numpy arrays can be read in place from a memory map
+SNAPSHOT_ALIGNMENT = 8
+
 
 class ICGraph(Graph):
     """
     A graph implementation that caches ancestors and descendants
     as BitMaps using pyroaring
     (previously done with sets of ints)
+
+    Ids are encoded in ascending order of the information content of the
+    annotations the graph was built with.  The information content of other
+    annotation corpora (eg gene rather than disease annotations) can be added
+    with add_corpus, and with_corpus returns a graph scoring with a corpus that
+    shares the bitmaps of this graph
     """
 
     def __init__(
@@ -23,7 +42,8 @@ class ICGraph(Graph):
         ancestors: Dict[str, FrozenBitMap],
         descendants: Dict[str, FrozenBitMap],
         ic_store: ICStore,
-        namespaces: Dict[Namespace, FrozenBitMap],
+        namespaces: Dict[Union[Namespace, str], FrozenBitMap],
+        cache_bytes: int = DEFAULT_CACHE_BYTES,
     ):
         """
 
@@ -33,14 +53,16 @@ class ICGraph(Graph):
         :param descendants:
         :param ic_store:
         :param namespace_map:
+        :param cache_bytes: Memory budget of the pairwise score cache, see ScoreCache
         """
         super(ICGraph, self).__init__(root, id_map, ancestors, descendants, namespaces)
         self.ic_store = ic_store
+        self.score_cache = ScoreCache(cache_bytes)
+        self.corpora: Dict[str, ICStore] = {}
 
         if ic_store.id_map is not self.id_map:
             raise ValueError("Must use same id_map for graph and ic_store")
 
-    @lru_cache(maxsize=100000)
     def _get_int_encoded_mica(
         self, pheno_a: str, pheno_b: str, ns_filter: Optional[Namespace] = None
     ) -> int:
@@ -54,20 +76,59 @@ class ICGraph(Graph):
         "what is the mica in mouse between p1 and p2"
         :return: integer encoded id for the MICA
         """
-        try:
-            p1_closure = self.ancestors[pheno_a]
-            p2_closure = self.ancestors[pheno_b]
-        except KeyError:
-            return 0
+        node_a = self.id_map.get(pheno_a)
+        node_b = self.id_map.get(pheno_b)
+        if node_a is None or node_b is None:
+            # Unknown curies are not cached, see _compute_int_encoded_mica
+            return self._compute_int_encoded_mica(pheno_a, pheno_b, ns_filter)
+        return self.get_cached_mica_fx(ns_filter)(node_a, [node_b])[0]
+
+    def get_cached_mica_fx(
+        self, ns_filter: Optional[Namespace] = None
+    ) -> Callable[[int, Sequence[int]], List[int]]:
+        """
+        MICAs cached in the score cache of the graph, see ScoreCache.get_cached_fx
+
+        :param ns_filter: Namespace filter
+        :return: function of an integer encoded id and a sequence of ids
+                 that returns the integer encoded id of the MICA of each pair
+        """
+        # Ids are decoded when a score is computed, an ICModel update may replace the id_map
+        return self.score_cache.get_cached_fx(
+            ('mica', ns_filter),
+            lambda node_a, node_b: self._compute_int_encoded_mica(
+                self.id_map.inverse[node_a], self.id_map.inverse[node_b], ns_filter
+            ),
+        )
+
+    def _compute_int_encoded_mica(
+        self, pheno_a: str, pheno_b: str, ns_filter: Optional[Namespace] = None
+    ) -> int:
+        mica_table = self.ic_store.get_mica_table(ns_filter)
+        if mica_table is not None:
+            node_a = self.id_map.get(pheno_a)
+            node_b = self.id_map.get(pheno_b)
+            if node_a is not None and node_b is not None:
+                mica_id = mica_table.get_mica(node_a, node_b)
+                if mica_id >= 0:
+                    return mica_id
 
         if ns_filter:
-            mica_id = (
-                p1_closure.intersection(p2_closure).intersection(self.namespaces[ns_filter]).max()
+            if pheno_a not in self.ancestors or pheno_b not in self.ancestors:
+                return 0
+            # Same as intersecting both closures with the namespace
+            common_ancestors = self.get_namespace_ancestors(pheno_a, ns_filter).intersection(
+                self.get_namespace_ancestors(pheno_b, ns_filter)
             )
         else:
-            mica_id = p1_closure.intersection(p2_closure).max()
+            try:
+                p1_closure = self.ancestors[pheno_a]
+                p2_closure = self.ancestors[pheno_b]
+            except KeyError:
+                return 0
+            common_ancestors = p1_closure.intersection(p2_closure)
 
-        return mica_id
+        return self.ic_store.get_mica(common_ancestors)
 
     def get_mica_ic(
         self, pheno_a: str, pheno_b: str, ns_filter: Optional[Namespace] = None
@@ -93,3 +154,238 @@ class ICGraph(Graph):
         Currently does not handle ambiguity (>1 equal MICAs)
         """
         return self.id_map.inverse[self._get_int_encoded_mica(pheno_a, pheno_b, ns_filter)]
+
+    def add_corpus(self, name: str, ic_store: ICStore) -> None:
+        """
+        Add the information content of another annotation corpus,
+        see builder.graph_builder.build_corpus
+
+        :param name: Corpus name, eg genes
+        :param ic_store: ICStore using the id_map of this graph, with the order
+                         of its ids if they are not in ascending information content
+        :return: None
+        """
+        if ic_store.id_map is not self.id_map:
+            raise ValueError("Must use same id_map for graph and ic_store")
+        self.corpora[name] = ic_store
+
+    def with_corpus(self, name: str) -> 'ICGraph':
+        """
+        Graph that scores with the information content of a corpus
+
+        The graph shares the id_map, bitmaps and corpora of this graph, and
+        has its own score cache.  Ids are not in ascending information content
+        of the corpus, so MICAs are found by the rank of each id in the corpus
+        rather than as the maximum of a bitmap, see ICStore.get_mica.
+        The graph is a view of this graph as it is now, recreate it after
+        an ICModel update re-sorts the classes of this graph
+
+        :param name: Corpus name, see add_corpus
+        :return: ICGraph
+        """
+        try:
+            ic_store = self.corpora[name]
+        except KeyError:
+            raise ValueError(f"Unknown corpus {name}, expected one of {list(self.corpora)}")
+        graph = ICGraph(
+            self.root,
+            self.id_map,
+            self.ancestors,
+            self.descendants,
+            ic_store,
+            self.namespaces,
+            self.score_cache.max_bytes,
+        )
+        graph.corpora = self.corpora
+        graph._namespace_ancestors = self._namespace_ancestors
+        return graph
+
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        Save the graph as a binary snapshot, see ICGraph.load
+
+        The snapshot holds the curie string table, the information content
+        of each class as a float64 array, and pyroaring serialized ancestor,
+        descendant and namespace bitmaps, each with an index of
+        (key, offset, length) rows into a single bitmap section, followed by
+        the information content and order of each corpus
+
+        :param path: File path to write
+        :return: None
+        """
+        if self.ic_store.order is not None:
+            raise ValueError("Save the graph the corpus was added to rather than a corpus graph")
+        curies = [self.id_map.inverse[index] for index in range(len(self.id_map))]
+        curie_index = {curie: index for index, curie in enumerate(curies)}
+        # Closures can include classes outside of the root (eg HP:0000001)
+        for closure in (self.ancestors, self.descendants):
+            for curie in closure.keys():
+                if curie not in curie_index:
+                    curie_index[curie] = len(curies)
+                    curies.append(curie)
+
+        namespaces = [str(getattr(ns, 'value', ns)) for ns in self.namespaces.keys()]
+
+        bitmaps = bytearray()
+        indices = {}
+        for name, closure, keys in (
+            ('ancestors', self.ancestors, [curie_index[curie] for curie in self.ancestors]),
+            ('descendants', self.descendants, [curie_index[curie] for curie in self.descendants]),
+            ('namespaces', self.namespaces, range(len(namespaces))),
+        ):
+            index = np.zeros((len(closure), 3), dtype=np.uint64)
+            for row, (key, bitmap) in enumerate(zip(keys, closure.values())):
+                serialized = bitmap.serialize()
+                index[row] = (key, len(bitmaps), len(serialized))
+                bitmaps.extend(serialized)
+            indices[name] = index
+
+        ic = np.asarray(self.ic_store.ic, dtype=np.float64)
+        sections = [
+            ('curies', '\n'.join(curies).encode('utf-8')),
+            ('ic', ic.tobytes()),
+            ('ancestors_index', indices['ancestors'].tobytes()),
+            ('descendants_index', indices['descendants'].tobytes()),
+            ('namespaces_index', indices['namespaces'].tobytes()),
+            ('bitmaps', bytes(bitmaps)),
+        ]
+        for name, ic_store in self.corpora.items():
+            sections.append((f'corpus_ic:{name}', np.asarray(ic_store.ic, np.float64).tobytes()))
+            if ic_store.order is not None:
+                sections.append((f'corpus_order:{name}', ic_store.order.tobytes()))
+
+        header = {
+            'version': SNAPSHOT_VERSION,
+            'root': self.root,
+            'id_count': len(self.id_map),
+            'curie_count': len(curies),
+            'namespaces': namespaces,
+            'corpora': list(self.corpora),
+            'sections': {},
+        }
+        # Section offsets depend on the header length, reserve room for them
+        # by writing the header twice
+        offset = 0
+        for _ in range(2):
+            header_bytes = json.dumps(header).encode('utf-8')
+            offset = _align(len(SNAPSHOT_MAGIC) + 8 + len(header_bytes))
+            for name, data in sections:
+                header['sections'][name] = [offset, len(data)]
+                offset = _align(offset + len(data))
+        header_bytes = json.dumps(header).encode('utf-8')
+
+        with open(path, 'wb') as snapshot:
+            snapshot.write(SNAPSHOT_MAGIC)
+            snapshot.write(struct.pack('<Q', len(header_bytes)))
+            snapshot.write(header_bytes)
+            for name, data in sections:
+                snapshot.write(b'\x00' * (header['sections'][name][0] - snapshot.tell()))
+                snapshot.write(data)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], mmap: Optional[bool] = True) -> 'ICGraph':
+        """
+        Load a graph saved with ICGraph.save
+
+        With mmap=True the file is memory mapped and bitmaps are deserialized
+        the first time they are accessed, so loading is independent of the size
+        of the ontology and processes loading the same file share its pages
+
+        :param path: File path of the snapshot
+        :param mmap: Memory map the snapshot, otherwise read it into memory
+                     and deserialize all bitmaps
+        :return: ICGraph
+        """
+        with open(path, 'rb') as snapshot:
+            if mmap:
+                buffer = mmap_module.mmap(snapshot.fileno(), 0, access=mmap_module.ACCESS_READ)
+            else:
+                buffer = snapshot.read()
+
+        if buffer[: len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not an ICGraph snapshot")
+        header_start = len(SNAPSHOT_MAGIC) + 8
+        (header_length,) = struct.unpack('<Q', buffer[len(SNAPSHOT_MAGIC) : header_start])
+        header = json.loads(bytes(buffer[header_start : header_start + header_length]))
+        if header.get('version') not in SUPPORTED_SNAPSHOT_VERSIONS:
+            raise ValueError(f"Unsupported snapshot version {header.get('version')}")
+
+        view = memoryview(buffer)
+
+        def get_section(name: str) -> memoryview:
+            offset, length = header['sections'][name]
+            return view[offset : offset + length]
+
+        curies = bytes(get_section('curies')).decode('utf-8').split('\n')
+        id_count = header['id_count']
+        id_map = bidict(zip(curies[:id_count], range(id_count)))
+        # Zero copy when memory mapped, the array is read only
+        ic = np.frombuffer(get_section('ic'), dtype=np.float64)
+        ic_store = ICStore(ic_map=ic, id_map=id_map)
+
+        bitmaps = get_section('bitmaps')
+        closures = []
+        for name, keys in (
+            ('ancestors', curies),
+            ('descendants', curies),
+            ('namespaces', [get_namespace(ns) for ns in header['namespaces']]),
+        ):
+            index = np.frombuffer(get_section(f'{name}_index'), dtype=np.uint64).reshape(-1, 3)
+            closure = BitMapView(
+                {keys[key]: (offset, length) for key, offset, length in index.tolist()}, bitmaps
+            )
+            closures.append(closure if mmap else dict(closure.items()))
+
+        ancestors, descendants, namespaces = closures
+        graph = cls(header['root'], id_map, ancestors, descendants, ic_store, namespaces)
+        # Version 1 snapshots have no corpora
+        corpora = header['corpora'] if header['version'] >= 2 else []
+        for name in corpora:
+            order = None
+            if f'corpus_order:{name}' in header['sections']:
+                order = np.frombuffer(get_section(f'corpus_order:{name}'), dtype=np.uint32)
+            corpus_ic = np.frombuffer(get_section(f'corpus_ic:{name}'), dtype=np.float64)
+            graph.add_corpus(name, ICStore(corpus_ic, id_map, order=order))
+        return graph
+
+
+class BitMapView(Mapping):
+    """
+    Read only mapping of keys to FrozenBitMaps serialized in a buffer,
+    bitmaps are deserialized on first access and cached
+    """
+
+    def __init__(self, offsets: Dict, buffer: memoryview):
+        """
+        :param offsets: dictionary of key to (offset, length) in the buffer
+        :param buffer: buffer of pyroaring serialized bitmaps
+        """
+        self._offsets = offsets
+        self._buffer = buffer
+        self._bitmaps: Dict = {}
+
+    def __getitem__(self, key) -> FrozenBitMap:
+        try:
+            return self._bitmaps[key]
+        except KeyError:
+            offset, length = self._offsets[key]
+            bitmap = FrozenBitMap.deserialize(self._buffer[offset : offset + length])
+            self._bitmaps[key] = bitmap
+            return bitmap
+
+    def __contains__(self, key) -> bool:
+        return key in self._offsets
+
+    def __iter__(self) -> Iterator:
+        return iter(self._offsets)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __reduce__(self):
+        # memory maps cannot be pickled, eg when passing a graph to a process pool
+        return dict, (dict(self.items()),)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
@@ -0,0 +1,228 @@
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from bidict import bidict
+from pyroaring import BitMap
+
+from ..store.ic_store import ICStore
+from ..utils.math_utils import information_content
+from .ic_graph import ICGraph
+
+
+class ICModel:
+    """
+    Annotation counts behind the information content of an ICGraph,
+    updated with annotation deltas rather than rebuilding the graph
+
+    Keeps, per class, the number of annotations to the class or its
+    descendants, and the number of annotations to classes in the graph,
+    as in utils.ic_utils.make_ic_map.  add_annotations and remove_annotations
+    update the counts through ancestor bitmaps.  Laplacian smoothing is
+    recomputed when the set of unannotated classes changes, each unannotated
+    class is smoothed unless a class smoothed before it (in smoothing order)
+    is one of its descendants, which is the order dependent bookkeeping of
+    make_ic_map.
+
+    The information content of the graph is replaced after each update.
+    Classes are only re-sorted (and the bitmaps of the graph re-encoded)
+    when the information content of a class is lower than that of a class
+    with a smaller id by more than the tolerance, MICAs are exact while ids
+    are sorted, and the information content of a MICA is at most tolerance
+    below the true MICA otherwise.  With tolerance=0 the graph gives the same
+    information content and scores as a fresh build from all annotations,
+    and after a re-sort the same ids.
+
+    The graph is updated in place, its score cache is cleared, and objects
+    built from it (eg CompiledDataset, VectorSemSim, ClosureMatrix)
+    should be rebuilt after an update.  Graphs from ICGraph.with_corpus
+    are not updated, after a re-sort they keep the ids, bitmaps and
+    corpora from before it, so recreate them with with_corpus
+    """
+
+    def __init__(
+        self,
+        graph: ICGraph,
+        annotations: Dict[str, Iterable[str]],
+        smoothing_order: Optional[Iterable[str]] = None,
+        tolerance: float = 0.0,
+    ):
+        """
+        :param graph: ICGraph
+        :param annotations: Annotation map the graph was built with,
+                            eg output from builder.annotation_builder.flat_to_annotations
+        :param smoothing_order: curies in the order make_ic_map visited them when the
+                                graph was built, see build_ic_model_from_closures,
+                                defaults to ascending id order
+        :param tolerance: Information content inversion allowed before classes are re-sorted
+        """
+        self.graph = graph
+        self.tolerance = tolerance
+        self.annotations: Dict[str, Set[str]] = {}
+        self.counts = np.zeros(len(graph.id_map), dtype=np.int64)
+        self.explicit_annotations = 0
+
+        if smoothing_order is None:
+            self._smoothing_order = np.arange(len(graph.id_map), dtype=np.int64)
+        else:
+            self._smoothing_order = np.array(
+                [graph.id_map[node] for node in smoothing_order], dtype=np.int64
+            )
+        self._smoothed: List[int] = []
+        self._smoothed_counts = np.zeros(len(graph.id_map), dtype=np.int64)
+        self._unannotated: Optional[np.ndarray] = None
+
+        self._count(annotations, 1)
+        self._smooth()
+        ic = self.get_ic()
+        if not np.array_equal(ic, graph.ic_store.ic):
+            self._apply(ic)
+
+    def add_annotations(self, annotations: Dict[str, Iterable[str]]) -> bool:
+        """
+        :param annotations: Annotations to add, classes already annotated
+                            to an entity are ignored
+        :return: True if classes were re-sorted, and so given new ids
+        """
+        self._count(annotations, 1)
+        return self._update()
+
+    def remove_annotations(self, annotations: Dict[str, Iterable[str]]) -> bool:
+        """
+        :param annotations: Annotations to remove, classes not annotated
+                            to an entity are ignored
+        :return: True if classes were re-sorted, and so given new ids
+        """
+        self._count(annotations, -1)
+        return self._update()
+
+    def get_ic(self) -> np.ndarray:
+        """
+        :return: information content per integer encoded id, from the current counts
+        """
+        total = self.explicit_annotations + len(self._smoothed)
+        counts = (self.counts + self._smoothed_counts).tolist()
+        # information_content rather than numpy, so values match make_ic_map
+        return np.array([information_content(count / total) for count in counts], dtype=np.float64)
+
+    def _count(self, annotations: Dict[str, Iterable[str]], sign: int) -> None:
+        ancestors = []
+        for entity, profile in annotations.items():
+            current = self.annotations.setdefault(entity, set())
+            for node in set(profile):
+                if (node in current) == (sign > 0):
+                    continue
+                if sign > 0:
+                    current.add(node)
+                else:
+                    current.remove(node)
+                closure = self.graph.get_ancestors(node)
+                if len(closure) > 0:
+                    ancestors.append(np.frombuffer(closure.to_array(), dtype=np.uint32))
+            if not current:
+                del self.annotations[entity]
+
+        if ancestors:
+            self.explicit_annotations += sign * len(ancestors)
+            self.counts += sign * np.bincount(
+                np.concatenate(ancestors), minlength=len(self.counts)
+            ).astype(np.int64)
+
+    def _smooth(self) -> None:
+        """
+        Laplacian smoothing of unannotated classes, recomputed only
+        when the set of unannotated classes has changed
+        """
+        unannotated = self.counts == 0
+        if self._unannotated is not None and np.array_equal(unannotated, self._unannotated):
+            return
+        self._unannotated = unannotated
+
+        inverse = self.graph.id_map.inverse
+        smoothed = []
+        ancestors = []
+        # Classes whose count is no longer 0 after smoothing the classes before them
+        marked = BitMap()
+        for node in self._smoothing_order[unannotated[self._smoothing_order]].tolist():
+            if node in marked:
+                continue
+            closure = self.graph.get_ancestors(inverse[node])
+            marked |= closure
+            smoothed.append(node)
+            ancestors.append(np.frombuffer(closure.to_array(), dtype=np.uint32))
+
+        self._smoothed = smoothed
+        self._smoothed_counts = np.zeros(len(self.counts), dtype=np.int64)
+        if ancestors:
+            self._smoothed_counts += np.bincount(
+                np.concatenate(ancestors), minlength=len(self.counts)
+            )
+
+    def _update(self) -> bool:
+        self._smooth()
+        return self._apply(self.get_ic())
+
+    def _apply(self, ic: np.ndarray) -> bool:
+        """
+        Set the information content of the graph, re-sorting classes if needed
+
+        :return: True if classes were re-sorted
+        """
+        graph = self.graph
+        # Drops cached scores and the cached functions bound to the old ids
+        graph.score_cache.clear()
+        inversion = np.maximum.accumulate(ic) - ic
+        if len(ic) == 0 or inversion.max() <= self.tolerance:
+            ic_store = ICStore(ic, graph.id_map, graph.ic_store.ic.dtype)
+            # MICAs are unchanged while classes keep their order
+            ic_store.mica_tables = graph.ic_store.mica_tables
+            graph.ic_store = ic_store
+            return False
+
+        self._resort(ic)
+        return True
+
+    def _resort(self, ic: np.ndarray) -> None:
+        """
+        Re-encode ids in ascending order of information content, ties in
+        smoothing order as when a graph is built, and remap the graph bitmaps and corpora
+        """
+        # Import here, the builders depend on the graph package
+        from ..builder.graph_builder import _remap_closures, _to_bitmap
+
+        graph = self.graph
+        smoothing_rank = np.empty(len(ic), dtype=np.int64)
+        smoothing_rank[self._smoothing_order] = np.arange(len(self._smoothing_order))
+        order = np.lexsort((smoothing_rank, ic))  # new id -> old id
+        remap = np.empty(len(ic), dtype=np.uint32)  # old id -> new id
+        remap[order] = np.arange(len(ic), dtype=np.uint32)
+
+        id_map = bidict({node: int(remap[old_id]) for node, old_id in graph.id_map.items()})
+        ancestors, descendants = _remap_closures(graph, remap)
+        namespaces = None
+        if graph.namespaces is not None:
+            namespaces = {
+                namespace: _to_bitmap(remap[np.frombuffer(bitmap.to_array(), dtype=np.uint32)])
+                for namespace, bitmap in graph.namespaces.items()
+            }
+
+        graph.id_map = id_map
+        graph.ancestors = ancestors
+        graph.descendants = descendants
+        graph.namespaces = namespaces
+        graph._namespace_ancestors = {}
+        # MICA tables hold the old ids
+        graph.ic_store = ICStore(ic[order], id_map, graph.ic_store.ic.dtype)
+        # A new dict, graphs from with_corpus share the old one and keep the old ids
+        corpora = {}
+        for name, ic_store in graph.corpora.items():
+            corpus_order = np.arange(len(ic)) if ic_store.order is None else ic_store.order
+            corpora[name] = ICStore(
+                ic_store.ic[order], id_map, ic_store.ic.dtype, remap[corpus_order]
+            )
+        graph.corpora = corpora
+
+        self.counts = self.counts[order]
+        self._smoothed_counts = self._smoothed_counts[order]
+        self._unannotated = self._unannotated[order]
+        self._smoothed = remap[self._smoothed].tolist() if self._smoothed else []
+        self._smoothing_order = remap[self._smoothing_order].astype(np.int64)
@@ -17,3 +17,30 @@ class ICMethod(str, Enum):
 class SetMethod(str, Enum):
     jaccard = 'jaccard'
     cosine = 'cosine'
+
+
+class MatrixScore(str, Enum):
+    """
+    Scores derived from the pairwise score matrices of two profiles,
+    several can be computed from one set of matrices, see sim.search.search_metrics
+
+    resnik scores are best match averages unless suffixed with max or avg,
+    euclidean and jin_conrath are distances, lower is more similar
+    """
+
+    phenodigm = 'phenodigm'
+    symmetric_phenodigm = 'symmetric_phenodigm'
+    resnik = 'resnik'
+    resnik_max = 'resnik_max'
+    resnik_avg = 'resnik_avg'
+    symmetric_resnik = 'symmetric_resnik'
+    symmetric_resnik_max = 'symmetric_resnik_max'
+    symmetric_resnik_avg = 'symmetric_resnik_avg'
+    normalized_resnik = 'normalized_resnik'
+    normalized_resnik_max = 'normalized_resnik_max'
+    normalized_resnik_avg = 'normalized_resnik_avg'
+    symmetric_normalized_resnik = 'symmetric_normalized_resnik'
+    symmetric_normalized_resnik_max = 'symmetric_normalized_resnik_max'
+    symmetric_normalized_resnik_avg = 'symmetric_normalized_resnik_avg'
+    euclidean = 'euclidean'
+    jin_conrath = 'jin_conrath'
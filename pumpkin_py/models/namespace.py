@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Dict, Tuple, Union
 
 
 class Namespace(str, Enum):
@@ -7,3 +8,21 @@ class Namespace(str, Enum):
     ZP = 'ZP'
     FBcv = 'FBcv'
     WBPhenotype = 'WBPhenotype'
+
+
+# Curie prefixes of the classes in each namespace, cross species
+# UPHENO classes are in every namespace defined in Namespace
+NAMESPACE_PREFIXES: Dict[str, Tuple[str, ...]] = {
+    ns.value: (ns.value, 'UPHENO') for ns in Namespace
+}
+
+
+def get_namespace(name: str) -> Union[Namespace, str]:
+    """
+    :param name: Namespace name, eg MP or MONDO
+    :return: Namespace member, or name for namespaces not defined in Namespace
+    """
+    try:
+        return Namespace(name)
+    except ValueError:
+        return name
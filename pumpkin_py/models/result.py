@@ -1,5 +1,9 @@
-from dataclasses import dataclass
-from typing import List, Union
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
 
 
 @dataclass
@@ -44,10 +48,245 @@ class SimMatch:
     score: Union[float, int]
 
 
+@dataclass
+class SearchStats:
+    """
+    Data class of search instrumentation, see utils.instrumentation
+
+    timings: wall time per stage in seconds, eg score, rank
+    counts: counters, eg entities_scored, cache_hits
+    """
+
+    timings: Dict[str, float] = field(default_factory=dict)
+    counts: Dict[str, int] = field(default_factory=dict)
+
+
 @dataclass
 class SearchResult:
     """
     Data class a list of similarity matches
+
+    pruned: number of entities that were skipped without
+    being scored, eg in a top k search
+    stats: stage timings and counters, only set for
+    searches run in an instrument() block
     """
 
     results: List[SimMatch]
+    pruned: int = 0
+    stats: Optional[SearchStats] = None
+
+
+class ColumnarResult:
+    """
+    Similarity matches stored as numpy arrays of ids, scores and ranks
+
+    Holds the same data as a SearchResult without a SimMatch object per
+    entity, SimMatch objects are created when matches are accessed by
+    index or iteration.  Slicing and pagination return ColumnarResults
+    that share the arrays of the original result, so results should be
+    treated as read only
+
+    pruned: number of entities that were skipped without
+    being scored, eg in a top k search
+    stats: stage timings and counters, only set for
+    searches run in an instrument() block
+    """
+
+    def __init__(
+        self,
+        ids: Union[Sequence[str], np.ndarray],
+        scores: Union[Sequence[Union[float, int]], np.ndarray],
+        ranks: Optional[Union[Sequence[int], np.ndarray]] = None,
+        pruned: int = 0,
+        stats: Optional[SearchStats] = None,
+    ):
+        """
+        :param ids: entity ids
+        :param scores: score of each entity
+        :param ranks: rank of each entity, defaults to 0 (unranked)
+        :param pruned: number of entities that were not scored
+        :param stats: stage timings and counters
+        """
+        if isinstance(ids, np.ndarray) and ids.dtype == object:
+            self.ids = ids
+        else:
+            self.ids = np.empty(len(ids), dtype=object)
+            self.ids[:] = list(ids)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        if ranks is None:
+            self.ranks = np.zeros(len(self.ids), dtype=np.int64)
+        else:
+            self.ranks = np.asarray(ranks, dtype=np.int64)
+        if not len(self.ids) == len(self.scores) == len(self.ranks):
+            raise ValueError("ids, scores and ranks must have the same length")
+        self.pruned = pruned
+        self.stats = stats
+
+    @classmethod
+    def from_search_result(cls, search_result: SearchResult) -> 'ColumnarResult':
+        matches = search_result.results
+        return cls(
+            [match.id for match in matches],
+            np.fromiter((match.score for match in matches), np.float64, count=len(matches)),
+            np.fromiter((match.rank for match in matches), np.int64, count=len(matches)),
+            search_result.pruned,
+            search_result.stats,
+        )
+
+    @classmethod
+    def concatenate(cls, results: Iterable['ColumnarResult']) -> 'ColumnarResult':
+        """
+        :param results: ColumnarResults, eg scored chunks of a dataset
+        :return: ColumnarResult with the matches of each result in order
+        """
+        results = list(results)
+        if not results:
+            return cls([], [])
+        return cls(
+            np.concatenate([result.ids for result in results]),
+            np.concatenate([result.scores for result in results]),
+            np.concatenate([result.ranks for result in results]),
+            sum(result.pruned for result in results),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, key: Union[int, slice, np.ndarray]) -> Union[SimMatch, 'ColumnarResult']:
+        """
+        :param key: index, or a slice or array of indices
+        :return: SimMatch for an index, otherwise a ColumnarResult
+        """
+        if isinstance(key, (int, np.integer)):
+            return SimMatch(
+                id=self.ids[key], rank=int(self.ranks[key]), score=float(self.scores[key])
+            )
+        return ColumnarResult(
+            self.ids[key], self.scores[key], self.ranks[key], self.pruned, self.stats
+        )
+
+    def __iter__(self) -> Iterator[SimMatch]:
+        for entity, rank, score in zip(self.ids, self.ranks.tolist(), self.scores.tolist()):
+            yield SimMatch(id=entity, rank=rank, score=score)
+
+    @property
+    def results(self) -> List[SimMatch]:
+        """
+        :return: list of SimMatch, as in SearchResult.results
+        """
+        return list(self)
+
+    def page(self, page: int, page_size: int) -> 'ColumnarResult':
+        """
+        :param page: page number, starting at 0
+        :param page_size: matches per page
+        :return: ColumnarResult with the matches of the page
+        """
+        return self[page * page_size : (page + 1) * page_size]
+
+    def to_search_result(self) -> SearchResult:
+        return SearchResult(results=self.results, pruned=self.pruned, stats=self.stats)
+
+    def to_dicts(self) -> List[Dict[str, Union[str, int, float]]]:
+        """
+        :return: list of {id, rank, score} dictionaries, eg for a JSON response
+        """
+        return [
+            {'id': entity, 'rank': rank, 'score': score}
+            for entity, rank, score in zip(self.ids, self.ranks.tolist(), self.scores.tolist())
+        ]
+
+    def to_jsonl(self, file: IO[str]) -> None:
+        """
+        Write one {"id", "rank", "score"} JSON object per line
+
+        :param file: text file object to write to
+        :return: None
+        """
+        for entity, rank, score in zip(self.ids, self.ranks.tolist(), self.scores.tolist()):
+            file.write(f'{{"id": {json.dumps(entity)}, "rank": {rank}, "score": {score!r}}}\n')
+
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        Save ids, scores and ranks as .npy arrays in an uncompressed .npz archive,
+        ids are saved as a fixed width unicode array so they load without pickle
+
+        :param path: .npz file path to write
+        :return: None
+        """
+        np.savez(
+            path,
+            ids=self.ids.astype(str) if len(self.ids) else np.array([], dtype=str),
+            scores=self.scores,
+            ranks=self.ranks,
+            pruned=np.array(self.pruned),
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'ColumnarResult':
+        """
+        :param path: .npz file written by ColumnarResult.save
+        :return: ColumnarResult
+        """
+        with np.load(path) as data:
+            return cls(data['ids'].tolist(), data['scores'], data['ranks'], int(data['pruned']))
+
+
+class MetricResult:
+    """
+    Several scores per entity, eg from sim.search.search_metrics
+
+    scores is an entity by metric array, scores of each metric
+    are in the column of the metric, see get_scores
+
+    stats: stage timings and counters, only set for
+    searches run in an instrument() block
+    """
+
+    def __init__(
+        self,
+        ids: Sequence[str],
+        metrics: Sequence[str],
+        scores: Union[Sequence[Sequence[float]], np.ndarray],
+        stats: Optional[SearchStats] = None,
+    ):
+        """
+        :param ids: entity ids
+        :param metrics: name of each score, eg a MatrixScore
+        :param scores: score vector of each entity, in metric order
+        :param stats: stage timings and counters
+        """
+        self.ids = list(ids)
+        self.metrics = list(metrics)
+        self.scores = np.asarray(scores, dtype=np.float64).reshape(len(self.ids), len(self.metrics))
+        self.stats = stats
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def get_scores(self, metric: str) -> np.ndarray:
+        """
+        :param metric: one of metrics
+        :return: score of each entity for the metric
+        """
+        if metric not in self.metrics:
+            raise ValueError(f"{metric} not in {self.metrics}")
+        return self.scores[:, self.metrics.index(metric)]
+
+    def to_columnar(self, metric: str) -> ColumnarResult:
+        """
+        :param metric: one of metrics
+        :return: unranked ColumnarResult of the metric, see utils.ranker.rank_columns
+        """
+        return ColumnarResult(self.ids, self.get_scores(metric), stats=self.stats)
+
+    def to_dicts(self) -> List[Dict[str, Union[str, float]]]:
+        """
+        :return: list of {id, metric: score, ...} dictionaries, eg for a JSON response
+        """
+        metrics = [str(getattr(metric, 'value', metric)) for metric in self.metrics]
+        return [
+            {'id': entity, **dict(zip(metrics, scores))}
+            for entity, scores in zip(self.ids, self.scores.tolist())
+        ]
@@ -0,0 +1 @@
+from .server import SearchService, make_server
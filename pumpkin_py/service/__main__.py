@@ -0,0 +1,74 @@
+"""
+Run the search service, for example with the HPO files in data/hpo:
+
+python -m pumpkin_py.service \
+    --closures data/hpo/hp-closures.tsv.gz --root HP:0000118 \
+    --dataset disease=data/hpo/phenotype-annotations.tsv.gz --port 8000
+"""
+import argparse
+import gzip
+import logging
+from typing import Dict, Set
+
+from ..builder.annotation_builder import flat_to_annotations
+from ..builder.graph_builder import build_ic_graph_from_closures
+from ..graph.ic_graph import ICGraph
+from .server import SearchService, make_server
+
+
+def _read_annotations(path: str) -> Dict[str, Set[str]]:
+    open_fx = gzip.open if path.endswith('.gz') else open
+    with open_fx(path, 'rt') as annot_file:
+        return flat_to_annotations(annot_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pumpkin_py search service")
+    graph_group = parser.add_mutually_exclusive_group(required=True)
+    graph_group.add_argument('--snapshot', help="ICGraph snapshot, see ICGraph.save")
+    graph_group.add_argument('--closures', help="closure file, requires --root")
+    parser.add_argument('--root', help="root class, eg HP:0000118")
+    parser.add_argument(
+        '--dataset',
+        action='append',
+        required=True,
+        metavar='NAME=PATH',
+        help="two column annotation file, repeatable, "
+        "information content is computed from the first dataset when using --closures",
+    )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1, help="scoring processes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    datasets = {}
+    for dataset in args.dataset:
+        name, _, path = dataset.partition('=')
+        datasets[name] = _read_annotations(path)
+
+    if args.snapshot:
+        graph = ICGraph.load(args.snapshot)
+    else:
+        if not args.root:
+            parser.error("--closures requires --root")
+        open_fx = gzip.open if args.closures.endswith('.gz') else open
+        with open_fx(args.closures, 'rt') as closure_file:
+            graph = build_ic_graph_from_closures(
+                closure_file, args.root, next(iter(datasets.values()))
+            )
+
+    service = SearchService(graph, datasets, workers=args.workers)
+    server = make_server(service, args.host, args.port)
+    logging.info("serving on http://%s:%s", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+"""
+Local HTTP search service built on the standard library
+
+Endpoints, request and response bodies are JSON:
+ GET /methods -> {"methods": [...]}, see get_methods()
+ GET /datasets -> {"datasets": [...]}, names of the loaded datasets
+ GET /stats -> per endpoint request counts and latency in milliseconds
+ POST /search {"profile": [...], "dataset": name, "method": "phenodigm",
+               "rank_method": "avg", "top_k": null, "kwargs": {}}
+      -> {"results": [{"id", "rank", "score"}, ...], "pruned": 0}, see search()
+ POST /compare {"profile_a": [...], "profile_b": [...], "method": "phenodigm", "kwargs": {}}
+      -> {"score": float}, the pairwise ICSemSim / GraphSemSim method
+kwargs are limited to the scoring options in REQUEST_KWARGS, others are rejected
+"""
+import json
+import logging
+import math
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, Iterable, Optional, Tuple, Union
+
+from ..graph.graph import Graph
+from ..graph.ic_graph import ICGraph
+from ..sim.search import _get_sim_fx, get_methods, search
+from ..store.annotation_store import CompiledDataset
+
+logger = logging.getLogger(__name__)
+
+# Latencies kept per endpoint for percentiles
+LATENCY_WINDOW = 1000
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 1024 * 1024
+
+# Scoring options a request may pass in kwargs, anything else (eg workers,
+# executor) is reserved to the service
+REQUEST_KWARGS = frozenset(
+    (
+        'ns_filter',
+        'sim_measure',
+        'is_symmetric',
+        'is_normalized',
+        'matrix_metric',
+        'negative_weight',
+    )
+)
+
+# Graph and datasets set in each process by the pool initializer
+_worker_state: Optional[Tuple] = None
+
+
+class EndpointStats:
+    """
+    Request count, error count and latency of one endpoint,
+    percentiles are over the most recent LATENCY_WINDOW requests
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float, is_error: bool = False) -> None:
+        with self._lock:
+            self.count += 1
+            self.errors += int(is_error)
+            self.total_ms += latency_ms
+            self.max_ms = max(self.max_ms, latency_ms)
+            self._latencies.append(latency_ms)
+
+    def to_dict(self) -> Dict[str, Union[int, float]]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            count, errors, total_ms, max_ms = self.count, self.errors, self.total_ms, self.max_ms
+
+        def percentile(fraction: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, math.ceil(fraction * len(latencies)) - 1)]
+
+        return {
+            'count': count,
+            'errors': errors,
+            'mean_ms': total_ms / count if count else 0.0,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'max_ms': max_ms,
+        }
+
+
+class SearchService:
+    """
+    Graph and named datasets loaded once, and the pool that scores requests
+
+    With workers > 0 scoring runs in a process pool whose processes get the
+    graph and datasets once, through the pool initializer (inherited when
+    processes are forked), so requests only ship profiles and results.
+    With workers=0 requests are scored in the thread that handles them
+    """
+
+    def __init__(
+        self,
+        graph: Union[ICGraph, Graph],
+        datasets: Dict[str, Union[Dict[str, Iterable[str]], CompiledDataset]],
+        workers: int = 1,
+    ):
+        """
+        :param graph: A graph object that supports the semantic sim calculation
+        :param datasets: Dataset name (key) and annotations, dictionaries are
+                         compiled against the graph at startup, see CompiledDataset
+        :param workers: Number of scoring processes, 0 to score in request threads
+        """
+        self.graph = graph
+        self.datasets: Dict[str, CompiledDataset] = {
+            name: (
+                dataset
+                if isinstance(dataset, CompiledDataset)
+                else CompiledDataset.compile(dataset, graph)
+            )
+            for name, dataset in datasets.items()
+        }
+        self.stats: Dict[str, EndpointStats] = {
+            endpoint: EndpointStats()
+            for endpoint in ('/search', '/compare', '/methods', '/datasets', '/stats')
+        }
+        self._executor = None
+        if workers > 0:
+            if 'fork' in multiprocessing.get_all_start_methods():
+                mp_context = multiprocessing.get_context('fork')
+            else:
+                mp_context = None
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=mp_context,
+                initializer=_init_worker,
+                initargs=(self.graph, self.datasets),
+            )
+
+    def search(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        :param request: JSON request body, see module docstring
+        :return: JSON serializable SearchResult
+        """
+        profile = _get_profile(request, 'profile')
+        dataset = request.get('dataset')
+        if dataset not in self.datasets:
+            raise ValueError(f"unknown dataset {dataset}, see /datasets")
+        method = request.get('method', 'phenodigm')
+        if method not in get_methods():
+            raise ValueError(f"{method} not supported, see /methods")
+        kwargs = _get_kwargs(request)
+        for arg in ('rank_method', 'top_k', 'vectorized', 'min_ic'):
+            if request.get(arg) is not None:
+                kwargs[arg] = request[arg]
+
+        return self._run(_search, profile, dataset, method, kwargs)
+
+    def compare(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        :param request: JSON request body, see module docstring
+        :return: JSON serializable score
+        """
+        profile_a = _get_profile(request, 'profile_a')
+        profile_b = _get_profile(request, 'profile_b')
+        method = request.get('method', 'phenodigm')
+        if method not in get_methods():
+            raise ValueError(f"{method} not supported, see /methods")
+        kwargs = _get_kwargs(request)
+
+        return self._run(_compare, profile_a, profile_b, method, kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {endpoint: stats.to_dict() for endpoint, stats in self.stats.items()}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def _run(self, fx, *args) -> Dict[str, Any]:
+        if self._executor is None:
+            return fx(self.graph, self.datasets, *args)
+        return self._executor.submit(_run_in_worker, fx, *args).result()
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    """
+    Maps HTTP requests onto the SearchService of the server
+    """
+
+    server: 'SearchServer'
+
+    def do_GET(self):
+        service = self.server.service
+        routes = {
+            '/methods': lambda: {'methods': get_methods()},
+            '/datasets': lambda: {'datasets': list(service.datasets.keys())},
+            '/stats': service.get_stats,
+        }
+        self._handle(routes)
+
+    def do_POST(self):
+        service = self.server.service
+        routes = {
+            '/search': lambda: service.search(self._read_json()),
+            '/compare': lambda: service.compare(self._read_json()),
+        }
+        self._handle(routes)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def _handle(self, routes: Dict[str, Any]) -> None:
+        path = self.path.split('?')[0]
+        if path not in routes:
+            self._send(404, {'error': f'{path} not found'})
+            return
+
+        start = time.perf_counter()
+        try:
+            status, body = 200, routes[path]()
+        except (ValueError, KeyError, TypeError) as error:
+            # Malformed requests, unknown datasets, methods or terms
+            status, body = 400, {'error': str(error)}
+        except Exception as error:
+            logger.exception("error handling %s", path)
+            status, body = 500, {'error': str(error)}
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        self.server.service.stats[path].record(latency_ms, status != 200)
+        self._send(status, body, latency_ms)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError(f"request body is larger than {MAX_BODY_BYTES} bytes")
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError as error:
+            raise ValueError(f"invalid JSON: {error}")
+        if not isinstance(body, dict):
+            raise ValueError("request body must be a JSON object")
+        return body
+
+    def _send(self, status: int, body: Dict[str, Any], latency_ms: Optional[float] = None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        if latency_ms is not None:
+            self.send_header('X-Response-Time-Ms', f'{latency_ms:.3f}')
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class SearchServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], service: SearchService):
+        super().__init__(address, SearchRequestHandler)
+        self.service = service
+
+
+def make_server(service: SearchService, host: str = '127.0.0.1', port: int = 8000) -> SearchServer:
+    """
+    :param service: SearchService
+    :param host: Interface to bind, defaults to localhost only
+    :param port: Port to bind, 0 picks a free port (see server.server_address)
+    :return: SearchServer, call serve_forever() to start serving
+    """
+    return SearchServer((host, port), service)
+
+
+def _get_profile(request: Dict[str, Any], field: str) -> list:
+    profile = request.get(field)
+    if isinstance(profile, str):
+        profile = profile.split(',')
+    if not isinstance(profile, list) or not profile:
+        raise ValueError(f"{field} must be a non empty list of ids")
+    return [str(pheno).strip() for pheno in profile]
+
+
+def _get_kwargs(request: Dict[str, Any]) -> Dict[str, Any]:
+    kwargs = request.get('kwargs') or {}
+    if not isinstance(kwargs, dict):
+        raise ValueError("kwargs must be an object")
+    unsupported = sorted(set(kwargs) - REQUEST_KWARGS)
+    if unsupported:
+        raise ValueError(
+            f"unsupported kwargs {', '.join(unsupported)}, use {', '.join(sorted(REQUEST_KWARGS))}"
+        )
+    return dict(kwargs)
+
+
+def _search(
+    graph: Union[ICGraph, Graph],
+    datasets: Dict[str, CompiledDataset],
+    profile: list,
+    dataset: str,
+    method: str,
+    kwargs: Dict[str, Any],
+) -> Dict[str, Any]:
+    search_result = search(profile, datasets[dataset], graph, method, columnar=True, **kwargs)
+    return {'results': search_result.to_dicts(), 'pruned': search_result.pruned}
+
+
+def _compare(
+    graph: Union[ICGraph, Graph],
+    datasets: Dict[str, CompiledDataset],
+    profile_a: list,
+    profile_b: list,
+    method: str,
+    kwargs: Dict[str, Any],
+) -> Dict[str, Any]:
+    return {'score': float(_get_sim_fx(graph, method)(profile_a, profile_b, **kwargs))}
+
+
+def _init_worker(graph: Union[ICGraph, Graph], datasets: Dict[str, CompiledDataset]):
+    global _worker_state
+    _worker_state = (graph, datasets)
+
+
+def _run_in_worker(fx, *args):
+    graph, datasets = _worker_state
+    return fx(graph, datasets, *args)
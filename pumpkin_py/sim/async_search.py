@@ -0,0 +1,145 @@
+"""
+asyncio interface to search, for serving searches from an event loop
+"""
+import asyncio
+import dataclasses
+import functools
+from concurrent.futures import Executor
+from typing import Dict, Hashable, Iterable, Optional, Tuple, Union
+
+from pumpkin_py.graph.graph import Graph
+from pumpkin_py.graph.ic_graph import ICGraph
+from pumpkin_py.models.methods import ICMethod, SetMethod
+from pumpkin_py.models.result import ColumnarResult, SearchResult
+from pumpkin_py.sim.search import search
+from pumpkin_py.store.annotation_store import CompiledDataset
+from pumpkin_py.utils.ranker import RankMethod
+
+Dataset = Union[Dict[str, Iterable[str]], CompiledDataset]
+
+
+async def async_search(
+    profile: Iterable[str],
+    dataset: Dataset,
+    graph: Union[ICGraph, Graph],
+    method: Union[ICMethod, SetMethod, str] = ICMethod.phenodigm,
+    rank_method: Union[RankMethod, str] = RankMethod.AVG,
+    executor: Optional[Executor] = None,
+    **kwargs,
+) -> Union[SearchResult, ColumnarResult]:
+    """
+    Run search() in an executor so the event loop is not blocked
+
+    Cancelling the returned coroutine stops waiting for the search, a search
+    that has already started in a thread runs to completion in the background
+
+    :param executor: Executor that runs the search, defaults to the
+                     default executor of the event loop (a thread pool),
+                     arguments are pickled if it is a process pool
+    :param kwargs: see search()
+    :return: SearchResult, or ColumnarResult with columnar=True
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor,
+        functools.partial(search, profile, dataset, graph, method, rank_method, **kwargs),
+    )
+
+
+class AsyncSearcher:
+    """
+    Runs searches against one graph in an executor, coalescing
+    concurrent identical searches into a single computation
+
+    Searches are identical if they have the same profile (order and
+    duplicate terms are ignored), dataset object, method, rank method
+    and keyword args.  A search that is requested while an identical one is
+    running waits for the running search, so a burst of identical requests
+    is computed once.  Every waiter gets its own SearchResult (or ColumnarResult)
+    whose matches are shared, matches should not be modified
+
+    Cancelling a waiter does not affect the other waiters of the search,
+    the search is cancelled once all of its waiters are cancelled (a search
+    that has started in a thread runs to completion, its result is dropped)
+    """
+
+    def __init__(self, graph: Union[ICGraph, Graph], executor: Optional[Executor] = None):
+        """
+        :param graph: A graph object that supports the semantic sim calculation
+        :param executor: Executor that runs searches, defaults to the
+                         default executor of the event loop (a thread pool)
+        """
+        self.graph = graph
+        self.executor = executor
+        # Running searches (key) and their future and number of waiters
+        self._pending: Dict[Hashable, Tuple[asyncio.Future, int]] = {}
+
+    async def search(
+        self,
+        profile: Iterable[str],
+        dataset: Dataset,
+        method: Union[ICMethod, SetMethod, str] = ICMethod.phenodigm,
+        rank_method: Union[RankMethod, str] = RankMethod.AVG,
+        **kwargs,
+    ) -> Union[SearchResult, ColumnarResult]:
+        """
+        :param profile: An iterable of ontology identifiers
+        :param dataset: A dictionary of entity to ontology ids, or a CompiledDataset,
+                        searches are only coalesced for the same dataset object
+        :param method: Semantic sim method, see output from get_methods()
+        :param rank_method: Method for ranking, either avg, min, max
+        :param kwargs: see search(), searches with unhashable keyword args
+                       (eg lists) are not coalesced
+        :return: SearchResult, or ColumnarResult with columnar=True
+        """
+        profile = tuple(sorted(set(profile)))
+        run_search = functools.partial(
+            search, profile, dataset, self.graph, method, rank_method, **kwargs
+        )
+
+        try:
+            key = (profile, id(dataset), method, rank_method, frozenset(kwargs.items()))
+            hash(key)
+        except TypeError:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, run_search)
+
+        if key in self._pending:
+            future, waiters = self._pending[key]
+        else:
+            loop = asyncio.get_running_loop()
+            future, waiters = loop.run_in_executor(self.executor, run_search), 0
+            future.add_done_callback(functools.partial(self._remove, key))
+        self._pending[key] = (future, waiters + 1)
+
+        try:
+            search_result = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            self._leave(key, future)
+            raise
+        if isinstance(search_result, ColumnarResult):
+            return search_result[:]
+        return dataclasses.replace(search_result, results=list(search_result.results))
+
+    def __len__(self) -> int:
+        """
+        :return: Number of running searches
+        """
+        return len(self._pending)
+
+    def _leave(self, key: Hashable, future: asyncio.Future) -> None:
+        """
+        Remove a cancelled waiter, cancelling the search if it was the last one
+        """
+        if key not in self._pending or self._pending[key][0] is not future:
+            return
+        waiters = self._pending[key][1] - 1
+        if waiters == 0:
+            del self._pending[key]
+            future.cancel()
+        else:
+            self._pending[key] = (future, waiters)
+
+    def _remove(self, key: Hashable, future: asyncio.Future) -> None:
+        if key in self._pending and self._pending[key][0] is future:
+            del self._pending[key]
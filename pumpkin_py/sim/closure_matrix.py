@@ -0,0 +1,218 @@
+from typing import Iterable, List, Optional, Union
+
+import numpy as np
+from pyroaring import BitMap
+
+from ..graph.graph import Graph
+from ..graph.ic_graph import ICGraph
+from ..store.annotation_store import CompiledDataset, closures_to_csr
+from .graph_semsim import GraphSemSim
+
+# Union types
+Num = Union[int, float]
+
+
+class ClosureMatrix:
+    """
+    Set based similarity between one profile and every entity in a dataset
+
+    The closures of the entities in a compiled dataset form a sparse
+    (entity, term) matrix in CSR layout, see CompiledDataset.closure_csr.
+    Multiplying it by a vector over terms that is non zero for the terms in
+    the query closure gives the size (or summed information content) of the
+    intersection with every entity closure at once, and unions follow from
+    per entity totals that are computed once
+
+    Implemented methods, matching the pairwise methods of GraphSemSim
+    and ICSemSim:
+     1. jaccard
+     2. cosine
+     3. sim_gic (ICGraph only)
+     4. IC weighted cosine (ICGraph only)
+    """
+
+    def __init__(self, dataset: CompiledDataset, graph: Optional[Union[ICGraph, Graph]] = None):
+        """
+        :param dataset: CompiledDataset, entity closures are taken from it
+        :param graph: Graph used to compute query closures and information content,
+                      defaults to the graph the dataset was compiled against.
+                      Must share its integer encoded ids, see CompiledDataset.check_graph
+        """
+        graph = dataset.graph if graph is None else graph
+        dataset.check_graph(graph)
+        self.graph: Union[ICGraph, Graph] = graph
+        self.entities: List[str] = dataset.entities
+        self.indptr, self.indices = dataset.closure_csr
+        self.sizes = np.diff(self.indptr)
+
+        self._dataset = dataset
+        self._node_count = len(self.graph.id_map)
+        self._ic: Optional[np.ndarray] = None
+        self._ic_sums: Optional[np.ndarray] = None
+        self._ic_squares: Optional[np.ndarray] = None
+        self._negative_csr = None
+        self._negative_ic_squares: Optional[np.ndarray] = None
+
+    def jaccard(self, profile: Iterable[str]) -> np.ndarray:
+        """
+        :param profile: Iterable of curies, negative phenotypes are ignored
+        :return: jaccard index with each entity, in dataset order,
+                 nan where both closures are empty
+        """
+        closure = self._get_closure(profile)
+        intersection = self._dot(self.indptr, self.indices, closure)
+        union = len(closure) + self.sizes - intersection
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return intersection / union
+
+    def sim_gic(self, profile: Iterable[str]) -> np.ndarray:
+        """
+        :param profile: Iterable of curies, negative phenotypes are ignored
+        :return: sim_gic with each entity, in dataset order,
+                 nan where the union of the closures has no information content
+        """
+        closure = self._get_closure(profile)
+        ic = self._get_ic()
+        intersection = self._dot(self.indptr, self.indices, closure, ic)
+        union = self.graph.ic_store.get_ic_sum(closure) + self._get_ic_sums() - intersection
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return intersection / union
+
+    def cosine(self, profile: Iterable[str], negative_weight: Optional[Num] = 0.1) -> np.ndarray:
+        """
+        :param profile: Iterable of curies, negative phenotypes prefixed with a '-'
+        :param negative_weight: Vector weight for negative phenotypes
+        :return: cosine similarity with each entity, in dataset order
+        """
+        return self._cosine(profile, negative_weight, None)
+
+    def ic_cosine(self, profile: Iterable[str], negative_weight: Optional[Num] = 0.1) -> np.ndarray:
+        """
+        :param profile: Iterable of curies, negative phenotypes prefixed with a '-'
+        :param negative_weight: Vector weight for negative phenotypes (weight * ic)
+        :return: IC weighted cosine similarity with each entity, in dataset order
+        """
+        return self._cosine(profile, negative_weight, self._get_ic() ** 2)
+
+    def _cosine(
+        self, profile: Iterable[str], negative_weight: Num, squares: Optional[np.ndarray]
+    ) -> np.ndarray:
+        """
+        Cosine similarity where the squared value of each term is either 1
+        or taken from squares, see GraphSemSim.cosine_from_closures
+        """
+        pos_closure, neg_closure = GraphSemSim(self.graph).get_cosine_closures(profile)
+        neg_indptr, neg_indices = self._get_negative_csr()
+        weight = negative_weight * negative_weight
+
+        numerator = self._dot(self.indptr, self.indices, pos_closure, squares) + weight * self._dot(
+            neg_indptr, neg_indices, neg_closure, squares
+        )
+        if squares is None:
+            profile_norm = len(pos_closure) + weight * len(neg_closure)
+            entity_norms = self.sizes + weight * np.diff(neg_indptr)
+        else:
+            profile_norm = squares[self._to_ids(pos_closure)].sum() + weight * (
+                squares[self._to_ids(neg_closure)].sum()
+            )
+            entity_norms = self._get_ic_squares() + weight * self._get_negative_ic_squares()
+
+        denominator = np.sqrt(profile_norm) * np.sqrt(entity_norms)
+        scores = np.zeros(len(self.entities), dtype=np.float64)
+        np.divide(numerator, denominator, out=scores, where=denominator != 0)
+        return scores
+
+    def _dot(
+        self,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        closure: BitMap,
+        weights: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Sparse matrix vector product of a CSR closure matrix and the
+        (optionally weighted) indicator vector of a closure
+        """
+        vector = np.zeros(self._node_count, dtype=np.float64)
+        ids = self._to_ids(closure)
+        vector[ids] = 1 if weights is None else weights[ids]
+        return _row_sums(indptr, vector[indices])
+
+    def _get_closure(self, profile: Iterable[str]) -> BitMap:
+        return self.graph.get_profile_closure({pheno for pheno in profile if not pheno[0] == "-"})
+
+    def _get_ic(self) -> np.ndarray:
+        if not isinstance(self.graph, ICGraph):
+            raise ValueError("information content based methods require an ICGraph")
+        if self._ic is None:
+            self._ic = np.asarray(self.graph.ic_store.ic, dtype=np.float64)
+        return self._ic
+
+    def _get_ic_sums(self) -> np.ndarray:
+        if self._ic_sums is None:
+            self._ic_sums = self._dataset.get_ic_sums(self.graph.ic_store)
+        return self._ic_sums
+
+    def _get_ic_squares(self) -> np.ndarray:
+        if self._ic_squares is None:
+            ic = self._get_ic()[self.indices]
+            self._ic_squares = _row_sums(self.indptr, ic * ic)
+        return self._ic_squares
+
+    def _get_negative_csr(self):
+        """
+        Closures of negated phenotypes (child classes), only used by cosine
+        """
+        if self._negative_csr is None:
+            empty = BitMap()
+            closures = [
+                self.graph.get_profile_closure({pheno[1:] for pheno in negated}, negative=True)
+                if negated
+                else empty
+                for negated in (self._dataset.negated[entity] for entity in self.entities)
+            ]
+            self._negative_csr = closures_to_csr(closures)
+        return self._negative_csr
+
+    def _get_negative_ic_squares(self) -> np.ndarray:
+        if self._negative_ic_squares is None:
+            neg_indptr, neg_indices = self._get_negative_csr()
+            ic = self._get_ic()[neg_indices]
+            self._negative_ic_squares = _row_sums(neg_indptr, ic * ic)
+        return self._negative_ic_squares
+
+    @staticmethod
+    def _to_ids(closure: BitMap) -> np.ndarray:
+        return np.frombuffer(closure.to_array(), dtype=np.uint32)
+
+
+def _row_sums(indptr: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Sum the values in each row of a CSR matrix, empty rows sum to 0
+
+    :param indptr: row offsets into values, len(rows) + 1
+    :param values: values of the non zero entries
+    :return: numpy array, one sum per row
+    """
+    sums = np.zeros(len(indptr) - 1, dtype=np.float64)
+    non_empty = indptr[:-1] < indptr[1:]
+    if non_empty.any():
+        # reduceat sums from each offset to the next, so empty rows are skipped
+        sums[non_empty] = np.add.reduceat(values, indptr[:-1][non_empty])
+    return sums
+
+
+def _row_maxes(indptr: np.ndarray, values: np.ndarray, empty: float) -> np.ndarray:
+    """
+    Max of the values in each row of a CSR matrix
+
+    :param indptr: row offsets into values, len(rows) + 1
+    :param values: values of the non zero entries
+    :param empty: value of empty rows
+    :return: numpy array, one max per row
+    """
+    maxes = np.full(len(indptr) - 1, empty, dtype=np.float64)
+    non_empty = indptr[:-1] < indptr[1:]
+    if non_empty.any():
+        maxes[non_empty] = np.maximum.reduceat(values, indptr[:-1][non_empty])
+    return maxes
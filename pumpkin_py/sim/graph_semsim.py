@@ -1,5 +1,5 @@
 import math
-from typing import Callable, Collection, Iterable, Optional, Union
+from typing import Callable, Collection, Iterable, Optional, Tuple, Union
 
 from pyroaring import BitMap, FrozenBitMap
 
@@ -48,33 +48,52 @@ class GraphSemSim:
         TODO optimize with numpy
         """
 
-        positive_a_profile = {item for item in profile_a if not item[0] == '-'}
-        negative_a_profile = {item[1:] for item in profile_a if item[0] == '-'}
+        pos_a_closure, neg_a_closure = self.get_cosine_closures(profile_a)
+        pos_b_closure, neg_b_closure = self.get_cosine_closures(profile_b)
 
-        positive_b_profile = {item for item in profile_b if not item[0] == '-'}
-        negative_b_profile = {item[1:] for item in profile_b if item[0] == '-'}
+        return self.cosine_from_closures(
+            pos_a_closure,
+            neg_a_closure,
+            pos_b_closure,
+            neg_b_closure,
+            negative_weight,
+            score_lambda,
+        )
 
-        pos_a_closure = self.graph.get_profile_closure(positive_a_profile)
-        pos_b_closure = self.graph.get_profile_closure(positive_b_profile)
+    def get_cosine_closures(self, profile: Iterable[str]) -> Tuple[BitMap, BitMap]:
+        """
+        Inferred phenotypes for cosine similarity, parent classes for positive
+        phenotypes and child classes for negative phenotypes
 
-        neg_a_closure = (
-            {
-                "-{}".format(item)
-                for item in self.graph.get_profile_closure(negative_a_profile, negative=True)
-            }
-            if negative_a_profile
-            else set()
-        )
+        :param profile: Iterable of curies, negative phenotypes prefixed with a '-'
+        :return: Tuple of the positive closure and the negative closure,
+                 the closures are only compared with closures of the same sign
+        """
+        positive_profile = {item for item in profile if not item[0] == '-'}
+        negative_profile = {item[1:] for item in profile if item[0] == '-'}
+
+        pos_closure = self.graph.get_profile_closure(positive_profile)
 
-        neg_b_closure = (
-            {
-                "-{}".format(item)
-                for item in self.graph.get_profile_closure(negative_b_profile, negative=True)
-            }
-            if negative_b_profile
-            else set()
+        neg_closure = (
+            self.graph.get_profile_closure(negative_profile, negative=True)
+            if negative_profile
+            else BitMap()
         )
 
+        return pos_closure, neg_closure
+
+    @staticmethod
+    def cosine_from_closures(
+        pos_a_closure: BitMap,
+        neg_a_closure: BitMap,
+        pos_b_closure: BitMap,
+        neg_b_closure: BitMap,
+        negative_weight: Optional[Num] = 0.1,
+        score_lambda: Optional[Callable] = lambda term: 1,
+    ) -> float:
+        """
+        Cosine similarity given the closures of two profiles, see get_cosine_closures
+        """
         pos_intersect_dot_product = sum(
             [math.pow(score_lambda(item), 2) for item in pos_a_closure.intersection(pos_b_closure)]
         )
@@ -1,14 +1,18 @@
+import math
 from enum import Enum
 from statistics import geometric_mean
-from typing import Iterable, List, Optional, Union
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
 from pyroaring import BitMap
 
 from ..graph.ic_graph import ICGraph
+from ..models.methods import MatrixScore
 from ..models.namespace import Namespace
+from ..utils.instrumentation import count, is_instrumented
 from . import matrix, metric
 from .graph_semsim import GraphSemSim
+from .semantic_dist import PairwiseDist
 
 # Union types
 Num = Union[int, float]
@@ -73,30 +77,8 @@ class ICSemSim:
         profile_a = {pheno for pheno in profile_a if not pheno[0] == "-"}
         profile_b = {pheno for pheno in profile_b if not pheno[0] == "-"}
 
-        sim_measure = PairwiseSim.IC
-
-        query_matrix = self._get_score_matrix(profile_a, profile_b, sim_measure)
-
-        if is_normalized:
-            optimal_matrix = self._get_self_vs_self(profile_a, sim_measure=sim_measure)
-        else:
-            optimal_matrix = None
-
-        resnik_score = 0
-        if is_symmetric:
-            b2a_matrix = matrix.flip_matrix(query_matrix)
-            optimal_b_matrix = self._get_self_vs_self(profile_b, sim_measure=sim_measure)
-            resnik_score = np.mean(
-                [
-                    self._compute_resnik_score(query_matrix, optimal_matrix, matrix_metric),
-                    self._compute_resnik_score(b2a_matrix, optimal_b_matrix, matrix_metric),
-                ],
-                dtype=np.float64,
-            )
-        else:
-            resnik_score = self._compute_resnik_score(query_matrix, optimal_matrix, matrix_metric)
-
-        return resnik_score
+        score_matrices = ScoreMatrices(self, profile_a, profile_b)
+        return score_matrices.resnik(matrix_metric, is_symmetric, is_normalized)
 
     @staticmethod
     def _compute_resnik_score(
@@ -150,31 +132,8 @@ class ICSemSim:
         profile_a = {pheno for pheno in profile_a if not pheno[0] == "-"}
         profile_b = {pheno for pheno in profile_b if not pheno[0] == "-"}
 
-        query_matrix = self._get_score_matrix(profile_a, profile_b, sim_measure)
-
-        if ns_filter:
-            optimal_matrix = self._get_score_matrix(profile_a, profile_a, sim_measure, ns_filter)
-        else:
-            optimal_matrix = self._get_self_vs_self(profile_a, sim_measure)
-
-        score = self.compute_phenodigm_score(query_matrix, optimal_matrix)
-
-        if is_symmetric:
-            score = np.mean(
-                [
-                    score,
-                    self.phenodigm_compare(
-                        profile_b,
-                        profile_a,
-                        ns_filter=ns_filter,
-                        is_symmetric=False,
-                        sim_measure=sim_measure,
-                    ),
-                ],
-                dtype=np.float64,
-            )
-
-        return score
+        score_matrices = ScoreMatrices(self, profile_a, profile_b, ns_filter)
+        return score_matrices.phenodigm(sim_measure, is_symmetric)
 
     @staticmethod
     def compute_phenodigm_score(
@@ -206,12 +165,28 @@ class ICSemSim:
         a_closure = self.graph.get_profile_closure(profile_a)
         b_closure = self.graph.get_profile_closure(profile_b)
 
-        numerator = sum(
-            [self.graph.ic_store.ic_map[pheno] for pheno in a_closure.intersection(b_closure)]
-        )
-        denominator = sum(
-            [self.graph.ic_store.ic_map[pheno] for pheno in a_closure.union(b_closure)]
-        )
+        return self.sim_gic_from_closures(a_closure, b_closure)
+
+    def sim_gic_from_closures(
+        self,
+        a_closure: BitMap,
+        b_closure: BitMap,
+        a_ic: Optional[float] = None,
+        b_ic: Optional[float] = None,
+    ) -> float:
+        """
+        sim_gic given the closures of two profiles, see get_profile_closure
+
+        :param a_ic: Optional summed information content of a_closure
+        :param b_ic: Optional summed information content of b_closure,
+                     if both are set the union of the closures is not summed
+        """
+        ic_store = self.graph.ic_store
+        numerator = ic_store.get_ic_sum(a_closure.intersection(b_closure))
+        if a_ic is not None and b_ic is not None:
+            denominator = a_ic + b_ic - numerator
+        else:
+            denominator = ic_store.get_ic_sum(a_closure.union(b_closure))
 
         return numerator / denominator
 
@@ -223,27 +198,62 @@ class ICSemSim:
         ns_filter: Optional[Union[str, Namespace]] = None,
     ) -> List[float]:
 
+        return self._compute_score_matrix([pheno_a], profile_b, sim_measure, ns_filter)[0]
+
+    def _get_score_matrix(
+        self,
+        profile_a: Iterable[str],
+        profile_b: Iterable[str],
+        sim_measure: PairwiseSim = PairwiseSim.IC,
+        ns_filter: Optional[Union[str, Namespace]] = None,
+    ) -> List[List[float]]:
+
+        score_matrix = self._compute_score_matrix(profile_a, profile_b, sim_measure, ns_filter)
+        if is_instrumented():
+            count('pairwise_scores', sum(len(row) for row in score_matrix))
+        return score_matrix
+
+    def _compute_score_matrix(
+        self,
+        profile_a: Iterable[str],
+        profile_b: Iterable[str],
+        sim_measure: PairwiseSim = PairwiseSim.IC,
+        ns_filter: Optional[Union[str, Namespace]] = None,
+    ) -> List[List[float]]:
         if sim_measure == PairwiseSim.GEOMETRIC:
-            row = [
-                metric.jac_ic_geomean(pheno_a, pheno_b, self.graph, ns_filter)
-                for pheno_b in profile_b
-            ]
+            return metric.jac_ic_geomean_matrix(profile_a, profile_b, self.graph, ns_filter)
         elif sim_measure == PairwiseSim.IC:
-            row = [metric.mica_ic(pheno_a, pheno_b, self.graph, ns_filter) for pheno_b in profile_b]
+            return metric.mica_ic_matrix(profile_a, profile_b, self.graph, ns_filter)
         else:
             raise NotImplementedError
 
-        return row
-
-    def _get_score_matrix(
+    def score_metrics(
         self,
         profile_a: Iterable[str],
         profile_b: Iterable[str],
-        sim_measure: PairwiseSim = PairwiseSim.IC,
+        metrics: Iterable[Union[MatrixScore, str]],
         ns_filter: Optional[Union[str, Namespace]] = None,
-    ) -> List[List[float]]:
+        sim_measure: Union[PairwiseSim, str, None] = PairwiseSim.GEOMETRIC,
+    ) -> np.ndarray:
+        """
+        Several matrix based scores of two profiles, each score matrix
+        is computed once and shared by the metrics that use it
+
+        :param profile_a: Sequence of phenotypes
+        :param profile_b: Sequence of phenotypes
+        :param metrics: Scores to compute, see MatrixScore
+        :param ns_filter: Namespace filter of the phenodigm optimal matrices
+        :param sim_measure: Pairwise similarity of phenodigm scores, GEOMETRIC or IC
+        :return: numpy array, one score per metric
+        """
+        # Filter out negative phenotypes
+        profile_a = {pheno for pheno in profile_a if not pheno[0] == "-"}
+        profile_b = {pheno for pheno in profile_b if not pheno[0] == "-"}
 
-        return [self._make_row(pheno_a, profile_b, sim_measure, ns_filter) for pheno_a in profile_a]
+        score_matrices = ScoreMatrices(self, profile_a, profile_b, ns_filter)
+        return np.array(
+            [score_matrices.score(metric, sim_measure) for metric in metrics], dtype=np.float64
+        )
 
     def symmetric_resnik_bma(self, profile_a: Iterable[str], profile_b: Iterable[str]) -> float:
         return self.resnik_sim(profile_a, profile_b, is_symmetric=True)
@@ -264,10 +274,44 @@ class ICSemSim:
         :return: cosine similarity score as a float between 0-1
         """
         graph_sim = GraphSemSim(self.graph)
-        return graph_sim.cosine_sim(
-            profile_a, profile_b, negative_weight, lambda term: self.graph.ic_store.ic_map[term]
+        pos_a_closure, neg_a_closure = graph_sim.get_cosine_closures(profile_a)
+        pos_b_closure, neg_b_closure = graph_sim.get_cosine_closures(profile_b)
+
+        return self.cosine_ic_from_closures(
+            pos_a_closure, neg_a_closure, pos_b_closure, neg_b_closure, negative_weight
         )
 
+    def cosine_ic_from_closures(
+        self,
+        pos_a_closure: BitMap,
+        neg_a_closure: BitMap,
+        pos_b_closure: BitMap,
+        neg_b_closure: BitMap,
+        negative_weight: Optional[Num] = 0.1,
+    ) -> float:
+        """
+        cosine_ic_sim given the closures of two profiles, see
+        GraphSemSim.get_cosine_closures
+
+        Equivalent to GraphSemSim.cosine_from_closures with information
+        content as the score_lambda, with the dot products computed on
+        vectors gathered from the information content array
+        """
+
+        def sum_of_squares(closure: BitMap) -> float:
+            ic_vector = self.graph.ic_store.get_ic_vector(closure).astype(np.float64)
+            return float(np.dot(ic_vector, ic_vector))
+
+        weight = math.pow(negative_weight, 2)
+        numerator = sum_of_squares(
+            pos_a_closure.intersection(pos_b_closure)
+        ) + weight * sum_of_squares(neg_a_closure.intersection(neg_b_closure))
+        denominator = math.sqrt(
+            sum_of_squares(pos_a_closure) + weight * sum_of_squares(neg_a_closure)
+        ) * math.sqrt(sum_of_squares(pos_b_closure) + weight * sum_of_squares(neg_b_closure))
+
+        return numerator / denominator if denominator else 0
+
     def symmetric_phenodigm(
         self,
         profile_a: Iterable[str],
@@ -296,8 +340,8 @@ class ICSemSim:
             *[self.graph.get_profile_closure(profile) for profile in profiles]
         )
 
-        numerator = sum([self.graph.ic_store.ic_map[pheno] for pheno in profile_intersection])
-        denominator = sum([self.graph.ic_store.ic_map[pheno] for pheno in profile_union])
+        numerator = self.graph.ic_store.get_ic_sum(profile_intersection)
+        denominator = self.graph.ic_store.get_ic_sum(profile_union)
 
         return numerator / denominator
 
@@ -319,3 +363,199 @@ class ICSemSim:
                 raise NotImplementedError
 
         return score_matrix
+
+
+# Matrix metric, is_symmetric and is_normalized of each resnik score
+RESNIK_SCORES: Dict[MatrixScore, Tuple[MatrixMetric, bool, bool]] = {
+    MatrixScore.resnik: (MatrixMetric.BMA, False, False),
+    MatrixScore.resnik_max: (MatrixMetric.MAX, False, False),
+    MatrixScore.resnik_avg: (MatrixMetric.AVG, False, False),
+    MatrixScore.symmetric_resnik: (MatrixMetric.BMA, True, False),
+    MatrixScore.symmetric_resnik_max: (MatrixMetric.MAX, True, False),
+    MatrixScore.symmetric_resnik_avg: (MatrixMetric.AVG, True, False),
+    MatrixScore.normalized_resnik: (MatrixMetric.BMA, False, True),
+    MatrixScore.normalized_resnik_max: (MatrixMetric.MAX, False, True),
+    MatrixScore.normalized_resnik_avg: (MatrixMetric.AVG, False, True),
+    MatrixScore.symmetric_normalized_resnik: (MatrixMetric.BMA, True, True),
+    MatrixScore.symmetric_normalized_resnik_max: (MatrixMetric.MAX, True, True),
+    MatrixScore.symmetric_normalized_resnik_avg: (MatrixMetric.AVG, True, True),
+}
+
+
+class ScoreMatrices:
+    """
+    Score matrices of two profiles, each computed on first use and
+    shared by the scores derived from it
+
+    Pairwise scores are symmetric, so the matrix of profile b against
+    profile a is the transpose of the matrix of profile a against profile b
+    """
+
+    def __init__(
+        self,
+        semsim: ICSemSim,
+        profile_a: Iterable[str],
+        profile_b: Iterable[str],
+        ns_filter: Optional[Union[str, Namespace]] = None,
+    ):
+        """
+        :param semsim: ICSemSim used to compute the matrices
+        :param profile_a: Sequence of phenotypes, without negative phenotypes
+        :param profile_b: Sequence of phenotypes, without negative phenotypes
+        :param ns_filter: Namespace filter of the phenodigm optimal matrices
+        """
+        self.semsim = semsim
+        self.profile_a = profile_a
+        self.profile_b = profile_b
+        self.ns_filter = ns_filter
+        self._matrices: Dict[Tuple, List[List[float]]] = {}
+
+    def get_query_matrix(
+        self, sim_measure: PairwiseSim, is_flipped: bool = False
+    ) -> List[List[float]]:
+        """
+        :param sim_measure: Pairwise similarity, GEOMETRIC or IC
+        :param is_flipped: Profile b against profile a
+        :return: score matrix
+        """
+        key = ('query', sim_measure, is_flipped)
+        if key not in self._matrices:
+            if is_flipped:
+                score_matrix = [
+                    list(row) for row in matrix.flip_matrix(self.get_query_matrix(sim_measure))
+                ]
+            else:
+                score_matrix = self.semsim._get_score_matrix(
+                    self.profile_a, self.profile_b, sim_measure
+                )
+            self._matrices[key] = score_matrix
+        return self._matrices[key]
+
+    def get_optimal_matrix(
+        self,
+        sim_measure: PairwiseSim,
+        is_flipped: bool = False,
+        ns_filter: Optional[Union[str, Namespace]] = None,
+    ) -> List[List[float]]:
+        """
+        :param sim_measure: Pairwise similarity, GEOMETRIC or IC
+        :param is_flipped: Optimal matrix of profile b rather than profile a
+        :param ns_filter: Namespace filter, the profile against itself
+                          rather than a column of the information content of each term
+        :return: score matrix
+        """
+        key = ('optimal', sim_measure, is_flipped, ns_filter)
+        if key not in self._matrices:
+            profile = self.profile_b if is_flipped else self.profile_a
+            if ns_filter:
+                score_matrix = self.semsim._get_score_matrix(
+                    profile, profile, sim_measure, ns_filter
+                )
+            else:
+                score_matrix = self.semsim._get_self_vs_self(profile, sim_measure)
+            self._matrices[key] = score_matrix
+        return self._matrices[key]
+
+    def phenodigm(
+        self,
+        sim_measure: Union[PairwiseSim, str, None] = PairwiseSim.GEOMETRIC,
+        is_symmetric: Optional[bool] = False,
+    ) -> float:
+        """
+        See ICSemSim.phenodigm_compare
+        """
+        score = ICSemSim.compute_phenodigm_score(
+            self.get_query_matrix(sim_measure),
+            self.get_optimal_matrix(sim_measure, ns_filter=self.ns_filter),
+        )
+        if is_symmetric:
+            flipped_score = ICSemSim.compute_phenodigm_score(
+                self.get_query_matrix(sim_measure, is_flipped=True),
+                self.get_optimal_matrix(sim_measure, is_flipped=True, ns_filter=self.ns_filter),
+            )
+            score = np.mean([score, flipped_score], dtype=np.float64)
+
+        return score
+
+    def resnik(
+        self,
+        matrix_metric: Union[MatrixMetric, str, None] = MatrixMetric.BMA,
+        is_symmetric: Optional[bool] = False,
+        is_normalized: Optional[bool] = False,
+    ) -> float:
+        """
+        See ICSemSim.resnik_sim
+        """
+        sim_measure = PairwiseSim.IC
+        query_matrix = self.get_query_matrix(sim_measure)
+        optimal_matrix = self.get_optimal_matrix(sim_measure) if is_normalized else None
+
+        if is_symmetric:
+            # As in previous releases, the b to a score is always normalized
+            return np.mean(
+                [
+                    ICSemSim._compute_resnik_score(query_matrix, optimal_matrix, matrix_metric),
+                    ICSemSim._compute_resnik_score(
+                        self.get_query_matrix(sim_measure, is_flipped=True),
+                        self.get_optimal_matrix(sim_measure, is_flipped=True),
+                        matrix_metric,
+                    ),
+                ],
+                dtype=np.float64,
+            )
+
+        return ICSemSim._compute_resnik_score(query_matrix, optimal_matrix, matrix_metric)
+
+    def distance(self, distance_measure: Union[PairwiseDist, str]) -> float:
+        """
+        See SemanticDist.euclidean_matrix, distances are computed from
+        the information content of the MICAs in the IC query matrix
+
+        :param distance_measure: EUCLIDEAN or JIN_CONRATH
+        :return: mean of the best (minimum) average distance in both directions
+        """
+        graph = self.semsim.graph
+        ic_a = [graph.get_ic(pheno) for pheno in self.profile_a]
+        ic_b = [graph.get_ic(pheno) for pheno in self.profile_b]
+        distance_measure = PairwiseDist(distance_measure)
+        if distance_measure == PairwiseDist.EUCLIDEAN:
+            # metric.pairwise_euclidean
+            def distance_fx(a: float, b: float, mica: float) -> float:
+                return math.sqrt(math.pow(a - mica, 2) + math.pow(b - mica, 2))
+
+        else:
+            # metric.jin_conrath_distance
+            def distance_fx(a: float, b: float, mica: float) -> float:
+                return a + b - 2 * mica
+
+        ab_matrix = [
+            [distance_fx(pheno_a, pheno_b, mica) for pheno_b, mica in zip(ic_b, row)]
+            for pheno_a, row in zip(ic_a, self.get_query_matrix(PairwiseSim.IC))
+        ]
+        ba_matrix = list(matrix.flip_matrix(ab_matrix))
+        return np.mean(
+            [matrix.best_min_avg(ab_matrix), matrix.best_min_avg(ba_matrix)], dtype=np.float64
+        )
+
+    def score(
+        self,
+        metric: Union[MatrixScore, str],
+        sim_measure: Union[PairwiseSim, str, None] = PairwiseSim.GEOMETRIC,
+    ) -> float:
+        """
+        :param metric: Score to compute, see MatrixScore
+        :param sim_measure: Pairwise similarity of phenodigm scores
+        :return: score
+        """
+        metric = MatrixScore(metric)
+        if metric == MatrixScore.phenodigm:
+            return self.phenodigm(sim_measure)
+        elif metric == MatrixScore.symmetric_phenodigm:
+            return self.phenodigm(sim_measure, is_symmetric=True)
+        elif metric in RESNIK_SCORES:
+            return self.resnik(*RESNIK_SCORES[metric])
+        elif metric == MatrixScore.euclidean:
+            return self.distance(PairwiseDist.EUCLIDEAN)
+        elif metric == MatrixScore.jin_conrath:
+            return self.distance(PairwiseDist.JIN_CONRATH)
+        raise NotImplementedError
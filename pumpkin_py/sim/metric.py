@@ -1,7 +1,6 @@
 import math
-from functools import lru_cache
 from statistics import geometric_mean
-from typing import Optional, Union
+from typing import Iterable, List, Optional, Union
 
 from pyroaring import FrozenBitMap
 
@@ -16,13 +15,40 @@ def jaccard(set1: FrozenBitMap, set2: FrozenBitMap) -> float:
     return set1.jaccard_index(set2)
 
 
-@lru_cache(maxsize=100000)
 def mica_ic(
     pheno_a: str, pheno_b: str, graph: ICGraph, ns_filter: Optional[Namespace] = None
 ) -> float:
     return graph.get_mica_ic(pheno_a, pheno_b, ns_filter)
 
 
+def mica_ic_matrix(
+    profile_a: Iterable[str],
+    profile_b: Iterable[str],
+    graph: ICGraph,
+    ns_filter: Optional[Namespace] = None,
+) -> List[List[float]]:
+    """
+    mica_ic of each pair of phenotypes from two profiles, the MICA of each
+    pair is cached in the score cache of the graph, see ICGraph.get_cached_mica_fx
+
+    :return: score matrix, one row per phenotype in profile a
+    """
+    profile_b = list(profile_b)
+    nodes_b = _get_nodes(profile_b, graph)
+    mica_fx = graph.get_cached_mica_fx(ns_filter)
+    ic_list = graph.ic_store.get_ic_list()
+    score_matrix = []
+    for pheno_a in profile_a:
+        node_a = graph.id_map.get(pheno_a)
+        if node_a is None or nodes_b is None:
+            score_matrix.append(
+                [graph.get_mica_ic(pheno_a, pheno_b, ns_filter) for pheno_b in profile_b]
+            )
+        else:
+            score_matrix.append(list(map(ic_list.__getitem__, mica_fx(node_a, nodes_b))))
+    return score_matrix
+
+
 # @lru_cache(maxsize=None)
 def pairwise_jaccard(
     pheno_a: str, pheno_b: str, graph: ICGraph, ns_filter: Optional[Namespace] = None
@@ -66,9 +92,58 @@ def jin_conrath_distance(pheno_a: str, pheno_b: str, graph: ICGraph) -> float:
     return ic_a + ic_b - 2 * max_ic
 
 
-@lru_cache(maxsize=200000)
 def jac_ic_geomean(
     pheno_a: str, pheno_b: str, graph: ICGraph, ns_filter: Optional[Namespace] = None
+) -> float:
+    return jac_ic_geomean_matrix([pheno_a], [pheno_b], graph, ns_filter)[0][0]
+
+
+def jac_ic_geomean_matrix(
+    profile_a: Iterable[str],
+    profile_b: Iterable[str],
+    graph: ICGraph,
+    ns_filter: Optional[Namespace] = None,
+) -> List[List[float]]:
+    """
+    jac_ic_geomean of each pair of phenotypes from two profiles,
+    cached in the score cache of the graph, see mica_ic_matrix
+
+    The namespace filter applies to pheno_b only (see pairwise_jaccard),
+    so filtered scores are cached per ordered pair
+
+    :return: score matrix, one row per phenotype in profile a
+    """
+    profile_b = list(profile_b)
+    nodes_b = _get_nodes(profile_b, graph)
+    score_fx = graph.score_cache.get_cached_fx(
+        ('jac_ic_geomean', ns_filter),
+        lambda node_a, node_b: _jac_ic_geomean(
+            graph.id_map.inverse[node_a], graph.id_map.inverse[node_b], graph, ns_filter
+        ),
+        is_symmetric=not ns_filter,
+    )
+    score_matrix = []
+    for pheno_a in profile_a:
+        node_a = graph.id_map.get(pheno_a)
+        if node_a is None or nodes_b is None:
+            score_matrix.append(
+                [_jac_ic_geomean(pheno_a, pheno_b, graph, ns_filter) for pheno_b in profile_b]
+            )
+        else:
+            score_matrix.append(score_fx(node_a, nodes_b))
+    return score_matrix
+
+
+def _get_nodes(profile: List[str], graph: ICGraph) -> Optional[List[int]]:
+    """
+    Integer encoded ids of a profile, None if any phenotype is not in the graph
+    """
+    nodes = [graph.id_map.get(pheno) for pheno in profile]
+    return None if None in nodes else nodes
+
+
+def _jac_ic_geomean(
+    pheno_a: str, pheno_b: str, graph: ICGraph, ns_filter: Optional[Namespace] = None
 ) -> float:
     jaccard_sim = pairwise_jaccard(pheno_a, pheno_b, graph, ns_filter)
     mica = graph.get_mica_ic(pheno_a, pheno_b, ns_filter)
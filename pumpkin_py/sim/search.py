@@ -1,119 +1,803 @@
 """
-Search interface intended to be aligned with some REST API call
+Search interface intended to be aligned with some REST API call,
+see pumpkin_py.service for an HTTP service
 """
+import heapq
 import inspect
-from typing import Dict, Iterable, List, Union
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import numpy as np
+from pyroaring import BitMap
 
 from pumpkin_py.graph.graph import Graph
 from pumpkin_py.graph.ic_graph import ICGraph
-from pumpkin_py.models.methods import ICMethod, SetMethod
-from pumpkin_py.models.result import SearchResult, SimMatch
+from pumpkin_py.models.methods import ICMethod, MatrixScore, SetMethod
+from pumpkin_py.models.namespace import Namespace
+from pumpkin_py.models.result import ColumnarResult, MetricResult, SearchResult
+from pumpkin_py.sim.closure_matrix import ClosureMatrix
 from pumpkin_py.sim.graph_semsim import GraphSemSim
-from pumpkin_py.sim.ic_semsim import ICSemSim
-from pumpkin_py.utils.ranker import RankMethod, rank_results
+from pumpkin_py.sim.ic_semsim import ICSemSim, PairwiseSim
+from pumpkin_py.sim.upper_bound import ScoreBound
+from pumpkin_py.sim.vector_semsim import VectorSemSim
+from pumpkin_py.store.annotation_store import CompiledDataset
+from pumpkin_py.utils.instrumentation import count, instrument, is_instrumented, stage
+from pumpkin_py.utils.ranker import RankMethod, rank_columns
+
+VECTOR_METHODS = {
+    ICMethod.phenodigm,
+    ICMethod.symmetric_phenodigm,
+    ICMethod.resnik,
+    ICMethod.symmetric_resnik,
+}
+
+# Methods that score a compiled dataset at once, see ClosureMatrix
+CLOSURE_METHODS = {SetMethod.jaccard, SetMethod.cosine, ICMethod.sim_gic, ICMethod.ic_cosine}
+
+# Methods that support pruning in top k searches, mapped to the ScoreBound
+# method and the keyword args fixed by the search method
+BOUNDED_METHODS: Dict[ICMethod, Tuple[str, Dict]] = {
+    ICMethod.phenodigm: ('phenodigm', {}),
+    ICMethod.symmetric_phenodigm: ('phenodigm', {'is_symmetric': True}),
+    ICMethod.resnik: ('resnik', {}),
+    ICMethod.symmetric_resnik: ('resnik', {'is_symmetric': True}),
+    ICMethod.sim_gic: ('sim_gic', {}),
+}
+
+# Relative tolerance added to upper bounds to absorb floating point
+# differences between bounds and scores
+BOUND_TOLERANCE = 1e-9
+
+# Chunks per worker for parallel search, more chunks even out
+# entities that are slower to score at the cost of more pickling
+CHUNKS_PER_WORKER = 4
+
+# Search arguments set in each process by the pool initializer
+_worker_state: Optional[Tuple] = None
+
+# Graph set in each process of a SearchPool
+_pool_graph: Optional[Union[ICGraph, Graph]] = None
+
+
+class SearchPool(ProcessPoolExecutor):
+    """
+    Process pool whose workers hold a graph, passed to search(executor=)
+    so that long running callers start processes and ship the graph once
+    rather than on each search.  Each task ships the query profile and a
+    chunk of the dataset
+    """
+
+    def __init__(self, graph: Union[ICGraph, Graph], workers: int):
+        """
+        :param graph: Graph searched with the pool, inherited by the workers
+                      on platforms that fork, otherwise pickled once per worker
+        :param workers: Number of processes
+        """
+        if 'fork' in multiprocessing.get_all_start_methods():
+            mp_context = multiprocessing.get_context('fork')
+        else:
+            mp_context = None
+        super().__init__(
+            max_workers=workers,
+            mp_context=mp_context,
+            initializer=_init_pool_worker,
+            initargs=(graph,),
+        )
+        self.graph = graph
+        self.workers = workers
 
 
 def search(
     profile: Iterable[str],
-    dataset: Dict[str, Iterable[str]],
+    dataset: Union[Dict[str, Iterable[str]], CompiledDataset],
     graph: Union[ICGraph, Graph],
     method: Union[ICMethod, SetMethod, str] = ICMethod.phenodigm,
     rank_method: Union[RankMethod, str] = RankMethod.AVG,
+    vectorized: bool = False,
+    workers: Optional[int] = None,
+    top_k: Optional[int] = None,
+    min_ic: Optional[float] = None,
+    columnar: bool = False,
+    executor: Optional[SearchPool] = None,
     **kwargs,
-) -> SearchResult:
+) -> Union[SearchResult, ColumnarResult]:
     """
 
     :param profile: An iterable of ontology identifiers
     :param dataset: A dictionary where the key is the entity and the value is an iterable of ontology
-                    ids (see output from builder.annotation_builder.flat_to_annotations)
+                    ids (see output from builder.annotation_builder.flat_to_annotations),
+                    or a CompiledDataset compiled against graph, or a graph that shares
+                    its integer encoded ids (eg ICGraph.with_corpus), jaccard, cosine,
+                    sim_gic and ic_cosine score a compiled dataset at once (see ClosureMatrix)
     :param graph: A graph object that supports the semantic sim calculation, either an ICGraph or Graph
     :param method: Semantic sim method, see output from get_methods()
     :param rank_method: Method for ranking, either avg, min, max
+    :param vectorized: Score each query term against every term in the dataset once,
+                       and gather per entity matrices from the resulting score vectors,
+                       supported for phenodigm, symmetric_phenodigm, resnik and
+                       symmetric_resnik, other methods ignore this option
+    :param workers: Number of processes used to score the dataset, the dataset is split
+                    into chunks that are scored in a process pool, the graph and dataset
+                    are shipped once per process (inherited on platforms that fork)
+    :param executor: SearchPool holding graph, used to score the dataset in place of
+                     starting a process pool for each search (see workers)
+    :param top_k: Only return the top k results, for phenodigm and resnik
+                  entities whose score cannot reach the top k are skipped, the
+                  number of skipped entities is reported in SearchResult.pruned
+    :param min_ic: Only score entities that share a common ancestor with information
+                   content above min_ic with the profile, found with the inverted index
+                   of the dataset (see CompiledDataset.inverted_index), other entities
+                   get a score of 0.  Their score matrices only hold MICAs at or below
+                   min_ic, so 0 is exact for min_ic=0 and a lower bound otherwise:
+                   candidates are scored and ranked exactly, the entities outside the
+                   candidates tie at 0, at or below every candidate, so their ranks are approximate.
+                   Supported for phenodigm, symmetric_phenodigm, resnik and
+                   symmetric_resnik, other methods ignore this option
+    :param columnar: Return a ColumnarResult, which holds ids, scores and ranks
+                     as arrays and creates SimMatch objects on access
     :param kwargs: Optional arguments specific to each algorithm,
                    TODO document and make it easier to inspect
-    :return: SearchResult
+    :return: SearchResult, or ColumnarResult if columnar, searches run in an
+             instrument() block record stage timings and counters in
+             SearchResult.stats (see utils.instrumentation)
     """
+    args = (
+        profile,
+        dataset,
+        graph,
+        method,
+        rank_method,
+        vectorized,
+        workers,
+        top_k,
+        min_ic,
+        executor,
+    )
+    if not is_instrumented():
+        search_result = _search(*args, **kwargs)
+        return search_result if columnar else search_result.to_search_result()
 
-    search_result = SearchResult(results=[])
+    score_cache = graph.score_cache if isinstance(graph, ICGraph) else None
+    cache_stats = score_cache.stats() if score_cache is not None else None
+    with instrument() as stats:
+        with stage('search'):
+            search_result = _search(*args, **kwargs)
+        if score_cache is not None:
+            # Includes lookups by other threads using the graph at the same time
+            new_cache_stats = score_cache.stats()
+            count('cache_hits', new_cache_stats.hits - cache_stats.hits)
+            count('cache_misses', new_cache_stats.misses - cache_stats.misses)
 
-    if method == 'phenodigm':
-        ic_sim = ICSemSim(graph)
-        # Get the subset of keyword args that are available for this fx
-        args = inspect.getfullargspec(ic_sim.phenodigm_compare)[0]
-        new_kwargs = {k: v for k, v in kwargs.items() if k in args}
-        for profile_id, profile_b in dataset.items():
-            score = ic_sim.phenodigm_compare(profile, profile_b, **new_kwargs)
-            result = SimMatch(id=profile_id, rank=0, score=score)
-            search_result.results.append(result)
+    search_result.stats = stats
+    return search_result if columnar else search_result.to_search_result()
 
-    elif method == 'symmetric_phenodigm':
-        ic_sim = ICSemSim(graph)
-        # Get the subset of keyword args that are available for this fx
-        args = inspect.getfullargspec(ic_sim.symmetric_phenodigm)[0]
-        new_kwargs = {k: v for k, v in kwargs.items() if k in args}
-        for profile_id, profile_b in dataset.items():
-            score = ic_sim.symmetric_phenodigm(profile, profile_b, **new_kwargs)
-            result = SimMatch(id=profile_id, rank=0, score=score)
-            search_result.results.append(result)
 
-    elif method == 'resnik':
-        ic_sim = ICSemSim(graph)
-        # Get the subset of keyword args that are available for this fx
-        args = inspect.getfullargspec(ic_sim.resnik_sim)[0]
-        new_kwargs = {k: v for k, v in kwargs.items() if k in args}
-        for profile_id, profile_b in dataset.items():
-            score = ic_sim.resnik_sim(profile, profile_b, **new_kwargs)
-            result = SimMatch(id=profile_id, rank=0, score=score)
-            search_result.results.append(result)
+def _search(
+    profile: Iterable[str],
+    dataset: Union[Dict[str, Iterable[str]], CompiledDataset],
+    graph: Union[ICGraph, Graph],
+    method: Union[ICMethod, SetMethod, str],
+    rank_method: Union[RankMethod, str],
+    vectorized: bool,
+    workers: Optional[int],
+    top_k: Optional[int],
+    min_ic: Optional[float],
+    executor: Optional[SearchPool],
+    **kwargs,
+) -> ColumnarResult:
+    """
+    search() without instrumentation, see search() for the parameters
+    """
+    if isinstance(dataset, CompiledDataset):
+        dataset.check_graph(graph)
 
-    elif method == 'symmetric_resnik':
-        ic_sim = ICSemSim(graph)
+    floor_entities = []
+    if min_ic is not None and method in VECTOR_METHODS:
+        with stage('candidates'):
+            all_entities = list(dataset.keys())
+            candidates = _get_candidates(profile, dataset, graph, min_ic)
+            floor_entities = [entity for entity in all_entities if entity not in candidates]
+            dataset = _subset(dataset, [entity for entity in all_entities if entity in candidates])
+        count('candidates', len(candidates))
 
-        for profile_id, profile_b in dataset.items():
-            score = ic_sim.symmetric_resnik_bma(profile, profile_b)
-            result = SimMatch(id=profile_id, rank=0, score=score)
-            search_result.results.append(result)
+    if top_k is not None and method in BOUNDED_METHODS:
+        search_result = _top_k_search(
+            profile, dataset, graph, method, top_k, vectorized=vectorized, **kwargs
+        )
+    elif executor is not None:
+        with stage('score'):
+            search_result = _pool_search(
+                profile, dataset, graph, method, executor, vectorized=vectorized, **kwargs
+            )
+    elif workers is not None and workers > 1:
+        with stage('score'):
+            search_result = _parallel_search(
+                profile, dataset, graph, method, workers, vectorized=vectorized, **kwargs
+            )
+    else:
+        with stage('score'):
+            search_result = _score_dataset(
+                profile, dataset, graph, method, vectorized=vectorized, **kwargs
+            )
+    count('entities_scored', len(search_result))
+    count('entities_pruned', search_result.pruned)
 
-    elif method == 'ic_cosine':
-        ic_sim = ICSemSim(graph)
-        # Get the subset of keyword args that are available for this fx
-        args = inspect.getfullargspec(ic_sim.cosine_ic_sim)[0]
-        new_kwargs = {k: v for k, v in kwargs.items() if k in args}
-        for profile_id, profile_b in dataset.items():
-            score = ic_sim.cosine_ic_sim(profile, profile_b, **new_kwargs)
-            result = SimMatch(id=profile_id, rank=0, score=score)
-            search_result.results.append(result)
+    if floor_entities:
+        # Merge floor scores in dataset order, so ties rank as in a full search
+        scores = dict(zip(search_result.ids.tolist(), search_result.scores.tolist()))
+        scores.update((entity, 0.0) for entity in floor_entities)
+        entities = [entity for entity in all_entities if entity in scores]
+        search_result = ColumnarResult(
+            entities, [scores[entity] for entity in entities], pruned=search_result.pruned
+        )
 
-    elif method == 'sim_gic':
-        ic_sim = ICSemSim(graph)
+    with stage('rank'):
+        search_result = rank_columns(search_result, rank_method, top_k)
+
+    return search_result
+
+
+def _get_candidates(
+    profile: Iterable[str],
+    dataset: Union[Dict[str, Iterable[str]], CompiledDataset],
+    graph: ICGraph,
+    min_ic: float,
+) -> Set[str]:
+    """
+    Entities that share a common ancestor with information content
+    above min_ic with the positive phenotypes of a profile
+
+    Compiled datasets are looked up in their inverted index, dictionaries
+    test the ancestors of each distinct phenotype once rather than being compiled
+    """
+    closure = graph.get_profile_closure({pheno for pheno in profile if not pheno[0] == "-"})
+    ids = np.frombuffer(closure.to_array(), dtype=np.uint32)
+    informative = ids[graph.ic_store.ic[ids] > min_ic]
+
+    if not isinstance(dataset, CompiledDataset):
+        informative = BitMap(informative)
+        hits: Dict[str, bool] = {}
+        candidates = set()
+        for entity, profile_b in dataset.items():
+            for pheno in profile_b:
+                if pheno[0] == "-" or pheno not in graph.ancestors:
+                    continue
+                if pheno not in hits:
+                    hits[pheno] = graph.ancestors[pheno].intersect(informative)
+                if hits[pheno]:
+                    candidates.add(entity)
+                    break
+        return candidates
+
+    positions = BitMap()
+    for node in informative.tolist():
+        if node in dataset.inverted_index:
+            positions |= dataset.inverted_index[node]
+
+    return {dataset.entities[position] for position in positions}
+
+
+def _score_dataset(
+    profile: Iterable[str],
+    dataset: Dict[str, Iterable[str]],
+    graph: Union[ICGraph, Graph],
+    method: Union[ICMethod, SetMethod, str] = ICMethod.phenodigm,
+    vectorized: bool = False,
+    **kwargs,
+) -> ColumnarResult:
+    """
+    Score every entity in a dataset, see search() for the parameters
+
+    :return: ColumnarResult with results in dataset order, unranked
+    """
+    return _collect_scores(
+        _iter_scores(profile, dataset, graph, method, vectorized=vectorized, **kwargs)
+    )
+
+
+def _collect_scores(scores: Iterable[Tuple[str, float]]) -> ColumnarResult:
+    """
+    :param scores: Iterable of entity, score tuples
+    :return: unranked ColumnarResult
+    """
+    ids, values = [], []
+    for profile_id, score in scores:
+        ids.append(profile_id)
+        values.append(score)
+    return ColumnarResult(ids, values)
+
+
+def _iter_scores(
+    profile: Iterable[str],
+    dataset: Dict[str, Iterable[str]],
+    graph: Union[ICGraph, Graph],
+    method: Union[ICMethod, SetMethod, str] = ICMethod.phenodigm,
+    vectorized: bool = False,
+    **kwargs,
+) -> Iterator[Tuple[str, float]]:
+    """
+    Lazily score the entities in a dataset, in dataset order
+
+    :return: Iterator of entity, score tuples
+    """
+    if vectorized and method in VECTOR_METHODS:
+        return _vector_search(profile, dataset, graph, method, **kwargs)
+
+    if isinstance(dataset, CompiledDataset) and _is_closure_search(method, **kwargs):
+        return _get_closure_score_fx(dataset, graph, method, **kwargs)(profile)
 
-        for profile_id, profile_b in dataset.items():
-            score = ic_sim.sim_gic(profile, profile_b)
-            result = SimMatch(id=profile_id, rank=0, score=score)
-            search_result.results.append(result)
+    sim_fx = _get_sim_fx(graph, method)
 
+    # Get the subset of keyword args that are available for this fx
+    args = inspect.getfullargspec(sim_fx)[0]
+    new_kwargs = {k: v for k, v in kwargs.items() if k in args}
+
+    return (
+        (profile_id, sim_fx(profile, profile_b, **new_kwargs))
+        for profile_id, profile_b in dataset.items()
+    )
+
+
+def _get_sim_fx(
+    graph: Union[ICGraph, Graph], method: Union[ICMethod, SetMethod, str]
+) -> Callable[..., float]:
+    """
+    Get the pairwise profile similarity function for a method
+    """
+    if method == 'phenodigm':
+        sim_fx = ICSemSim(graph).phenodigm_compare
+    elif method == 'symmetric_phenodigm':
+        sim_fx = ICSemSim(graph).symmetric_phenodigm
+    elif method == 'resnik':
+        sim_fx = ICSemSim(graph).resnik_sim
+    elif method == 'symmetric_resnik':
+        sim_fx = ICSemSim(graph).symmetric_resnik_bma
+    elif method == 'ic_cosine':
+        sim_fx = ICSemSim(graph).cosine_ic_sim
+    elif method == 'sim_gic':
+        sim_fx = ICSemSim(graph).sim_gic
     elif method == 'jaccard':
-        graph_sim = GraphSemSim(graph)
+        sim_fx = GraphSemSim(graph).jaccard_sim
+    elif method == 'cosine':
+        sim_fx = GraphSemSim(graph).cosine_sim
+    else:
+        raise ValueError(f'{method} not supported')
+
+    return sim_fx
+
+
+def _top_k_search(
+    profile: Iterable[str],
+    dataset: Dict[str, Iterable[str]],
+    graph: ICGraph,
+    method: Union[ICMethod, str],
+    top_k: int,
+    vectorized: bool = False,
+    **kwargs,
+) -> ColumnarResult:
+    """
+    Score the entities that can rank in the top k of a dataset
+
+    Entities are visited in descending order of an upper bound on their
+    score (see ScoreBound), scoring stops once the bound of the next entity
+    falls below the k-th best score seen so far.  Every entity tied with the
+    k-th best score is scored, so ranks for the top k are exact
+
+    Bounds for a CompiledDataset are computed for all entities at once from
+    its CSR closure matrix, see ScoreBound.phenodigm_bounds
+
+    :return: ColumnarResult with scored entities in dataset order, unranked,
+             and the number of entities that were not scored
+    """
+    score_bound = ScoreBound(graph, profile)
+    bound_method, fixed_kwargs = BOUNDED_METHODS[ICMethod(method)]
+    bound_fx = getattr(score_bound, bound_method)
+    dataset_bound_fx = getattr(score_bound, f'{bound_method}_bounds')
+
+    # Keyword args used by both the score and the bound, as in _iter_scores
+    args = set(inspect.getfullargspec(_get_sim_fx(graph, method))[0])
+    args &= set(inspect.getfullargspec(bound_fx)[0])
+    bound_kwargs = {k: v for k, v in kwargs.items() if k in args}
+    bound_kwargs.update(fixed_kwargs)
+    keys = list(dataset.keys())
+    with stage('bounds'):
+        if isinstance(dataset, CompiledDataset):
+            bounds = dataset_bound_fx(dataset, **bound_kwargs)
+        else:
+            bounds = np.array(
+                [bound_fx(profile_b, **bound_kwargs) for profile_b in dataset.values()],
+                dtype=np.float64,
+            )
+        order = [keys[index] for index in np.argsort(-bounds, kind='stable')]
+        bounds = np.sort(bounds)[::-1]
+
+    if isinstance(dataset, CompiledDataset) and _is_closure_search(method, **kwargs):
+        # Closure methods score a whole dataset at once, so score the entities
+        # with the k best bounds and then every entity whose bound reaches the
+        # k-th best of their scores
+        with stage('score'):
+            scores = dict(
+                _iter_scores(profile, _subset(dataset, order[:top_k]), graph, method, **kwargs)
+            )
+            if len(scores) == top_k:
+                threshold = heapq.nlargest(top_k, scores.values())[-1]
+                remaining = [
+                    profile_id
+                    for profile_id, bound in zip(order[top_k:], bounds[top_k:])
+                    if not bound * (1 + BOUND_TOLERANCE) < threshold
+                ]
+                if remaining:
+                    scores.update(
+                        _iter_scores(profile, _subset(dataset, remaining), graph, method, **kwargs)
+                    )
+    else:
+        scores = {}
+        top_scores = []  # min heap of the k best scores
+        with stage('score'):
+            for profile_id, score in _iter_scores(
+                profile, _subset(dataset, order), graph, method, vectorized=vectorized, **kwargs
+            ):
+                scores[profile_id] = score
+                if len(top_scores) < top_k:
+                    heapq.heappush(top_scores, score)
+                elif score > top_scores[0]:
+                    heapq.heapreplace(top_scores, score)
+
+                if len(scores) < len(order) and len(top_scores) == top_k:
+                    # Bounds are sorted, no remaining entity can beat the k-th best score
+                    if bounds[len(scores)] * (1 + BOUND_TOLERANCE) < top_scores[0]:
+                        break
+
+    search_result = _collect_scores(
+        (profile_id, scores[profile_id]) for profile_id in dataset.keys() if profile_id in scores
+    )
+    search_result.pruned = len(dataset) - len(scores)
+
+    return search_result
+
+
+def _parallel_search(
+    profile: Iterable[str],
+    dataset: Dict[str, Iterable[str]],
+    graph: Union[ICGraph, Graph],
+    method: Union[ICMethod, SetMethod, str],
+    workers: int,
+    **kwargs,
+) -> ColumnarResult:
+    """
+    Score a dataset in a process pool
+
+    The graph, profile and dataset are shipped once per worker through the
+    pool initializer (when processes are forked they are inherited rather
+    than pickled), and each task is a chunk of dataset keys.  Chunks are
+    merged in dataset order so ranking gives the same output as the
+    serial path
+    """
+    if method not in get_methods():
+        raise ValueError(f'{method} not supported')
+
+    keys = list(dataset.keys())
+    if not keys:
+        return ColumnarResult([], [])
+
+    chunk_size = math.ceil(len(keys) / (workers * CHUNKS_PER_WORKER))
+    chunks = [keys[index : index + chunk_size] for index in range(0, len(keys), chunk_size)]
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context('fork')
+    else:
+        mp_context = None
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp_context,
+        initializer=_init_worker,
+        initargs=(profile, dataset, graph, method, kwargs),
+    ) as executor:
+        return ColumnarResult.concatenate(executor.map(_score_chunk, chunks))
+
+
+def _pool_search(
+    profile: Iterable[str],
+    dataset: Dict[str, Iterable[str]],
+    graph: Union[ICGraph, Graph],
+    method: Union[ICMethod, SetMethod, str],
+    executor: SearchPool,
+    **kwargs,
+) -> ColumnarResult:
+    """
+    Score a dataset in a SearchPool, chunks of the dataset are shipped
+    as dictionaries and merged in dataset order, as in _parallel_search
+    """
+    if executor.graph is not graph:
+        raise ValueError("executor is a SearchPool of a different graph")
+    if method not in get_methods():
+        raise ValueError(f'{method} not supported')
+
+    keys = list(dataset.keys())
+    if not keys:
+        return ColumnarResult([], [])
+
+    chunk_size = math.ceil(len(keys) / (executor.workers * CHUNKS_PER_WORKER))
+    chunks = [
+        {key: dataset[key] for key in keys[index : index + chunk_size]}
+        for index in range(0, len(keys), chunk_size)
+    ]
+    return ColumnarResult.concatenate(
+        executor.map(_score_pool_chunk, repeat(profile), chunks, repeat(method), repeat(kwargs))
+    )
+
+
+def _init_pool_worker(graph: Union[ICGraph, Graph]):
+    global _pool_graph
+    _pool_graph = graph
+
+
+def _score_pool_chunk(
+    profile: Iterable[str],
+    dataset: Dict[str, Iterable[str]],
+    method: Union[ICMethod, SetMethod, str],
+    kwargs: Dict,
+) -> ColumnarResult:
+    return _score_dataset(profile, dataset, _pool_graph, method, **kwargs)
+
+
+def _init_worker(
+    profile: Iterable[str],
+    dataset: Dict[str, Iterable[str]],
+    graph: Union[ICGraph, Graph],
+    method: Union[ICMethod, SetMethod, str],
+    kwargs: Dict,
+):
+    global _worker_state
+    _worker_state = (profile, dataset, graph, method, kwargs)
+
+
+def _score_chunk(keys: List[str]) -> ColumnarResult:
+    profile, dataset, graph, method, kwargs = _worker_state
+    return _score_dataset(profile, _subset(dataset, keys), graph, method, **kwargs)
+
+
+def _subset(
+    dataset: Union[Dict[str, Iterable[str]], CompiledDataset], keys: Iterable[str]
+) -> Union[Dict[str, Iterable[str]], CompiledDataset]:
+    """
+    Select entities from a dataset in the order of keys
+    """
+    if isinstance(dataset, CompiledDataset):
+        return dataset.subset(keys)
+    return {key: dataset[key] for key in keys}
+
+
+def _vector_search(
+    profile: Iterable[str],
+    dataset: Dict[str, Iterable[str]],
+    graph: ICGraph,
+    method: Union[ICMethod, str],
+    **kwargs,
+) -> Iterator[Tuple[str, float]]:
+    """
+    Search using query term score vectors, see VectorSemSim
+    """
+    with stage('encode'):
+        vector_sim = _get_vector_sim(dataset, graph)
+        if isinstance(dataset, CompiledDataset):
+            dataset = vector_sim.encode_dataset(dataset)
+    search_fx, new_kwargs = _get_vector_search_fx(vector_sim, method, **kwargs)
+    return search_fx(profile, dataset, **new_kwargs)
+
+
+def _get_vector_sim(
+    dataset: Union[Dict[str, Iterable[str]], CompiledDataset], graph: ICGraph
+) -> VectorSemSim:
+    """
+    VectorSemSim with the positive phenotypes of a dataset as its vocabulary,
+    cached on compiled datasets so repeated searches share the vocabulary,
+    ancestor index and optimal matrices
+    """
+    if isinstance(dataset, CompiledDataset):
+        return dataset.get_derived('vector_sim', graph, lambda: VectorSemSim(graph, dataset.terms))
+    return VectorSemSim(
+        graph,
+        (pheno for profile_b in dataset.values() for pheno in profile_b if not pheno[0] == "-"),
+    )
+
+
+def _get_vector_search_fx(
+    vector_sim: VectorSemSim, method: Union[ICMethod, str], **kwargs
+) -> Tuple[Callable[..., Iterator[Tuple[str, float]]], Dict]:
+    """
+    Get the VectorSemSim search function for a method and the
+    subset of keyword args that are available for it
+    """
+    if method in ('phenodigm', 'symmetric_phenodigm'):
+        search_fx = vector_sim.phenodigm_search
+        if method == 'symmetric_phenodigm':
+            kwargs['is_symmetric'] = True
+    else:
+        search_fx = vector_sim.resnik_search
+        if method == 'symmetric_resnik':
+            # Mirrors ICSemSim.symmetric_resnik_bma, which takes no keyword args
+            kwargs = {'is_symmetric': True}
+
+    # Get the subset of keyword args that are available for this fx
+    args = inspect.getfullargspec(search_fx)[0]
+    new_kwargs = {k: v for k, v in kwargs.items() if k in args}
+    return search_fx, new_kwargs
 
-        for profile_id, profile_b in dataset.items():
-            score = graph_sim.jaccard_sim(profile, profile_b)
-            result = SimMatch(id=profile_id, rank=0, score=score)
-            search_result.results.append(result)
+
+def search_many(
+    profiles: Iterable[Iterable[str]],
+    dataset: Union[Dict[str, Iterable[str]], CompiledDataset],
+    graph: Union[ICGraph, Graph],
+    method: Union[ICMethod, SetMethod, str] = ICMethod.phenodigm,
+    rank_method: Union[RankMethod, str] = RankMethod.AVG,
+    columnar: bool = False,
+    **kwargs,
+) -> Iterator[Union[SearchResult, ColumnarResult]]:
+    """
+    Search many profiles against one dataset
+
+    Work that does not depend on the query profile is done once: matrix based
+    methods (phenodigm, resnik) integer encode the dataset and cache entity
+    optimal matrices, scoring each query with query term score vectors
+    (see VectorSemSim); set based methods (jaccard, cosine, sim_gic, ic_cosine)
+    build the closure matrix of the dataset once (see ClosureMatrix)
+
+    :param profiles: An iterable of profiles, each an iterable of ontology identifiers
+    :param dataset: A dictionary where the key is the entity and the value is an iterable of ontology
+                    ids (see output from builder.annotation_builder.flat_to_annotations),
+                    or a CompiledDataset compiled against graph
+    :param graph: A graph object that supports the semantic sim calculation, either an ICGraph or Graph
+    :param method: Semantic sim method, see output from get_methods()
+    :param rank_method: Method for ranking, either avg, min, max
+    :param columnar: Yield ColumnarResults rather than SearchResults
+    :param kwargs: Optional arguments specific to each algorithm, see search()
+    :return: Iterator of SearchResult, one per profile in input order
+    """
+    score_fx = _get_batch_score_fx(dataset, graph, method, **kwargs)
+
+    for profile in profiles:
+        search_result = rank_columns(_collect_scores(score_fx(profile)), rank_method)
+        yield search_result if columnar else search_result.to_search_result()
+
+
+def _get_batch_score_fx(
+    dataset: Union[Dict[str, Iterable[str]], CompiledDataset],
+    graph: Union[ICGraph, Graph],
+    method: Union[ICMethod, SetMethod, str],
+    **kwargs,
+) -> Callable[[Iterable[str]], Iterator[Tuple[str, float]]]:
+    """
+    Do the query independent work for a search and return a function
+    that scores a profile against every entity in the dataset
+    """
+    if isinstance(dataset, CompiledDataset):
+        dataset.check_graph(graph)
+
+    if method in VECTOR_METHODS:
+        vector_sim = _get_vector_sim(dataset, graph)
+        encoded_dataset = vector_sim.encode_dataset(dataset)
+        search_fx, new_kwargs = _get_vector_search_fx(vector_sim, method, **kwargs)
+
+        def score_fx(profile: Iterable[str]) -> Iterator[Tuple[str, float]]:
+            return search_fx(profile, encoded_dataset, **new_kwargs)
+
+    elif _is_closure_search(method, **kwargs):
+        score_fx = _get_closure_score_fx(dataset, graph, method, **kwargs)
 
     elif method == 'cosine':
-        graph_sim = GraphSemSim(graph)
-        # Get the subset of keyword args that are available for this fx
-        args = inspect.getfullargspec(graph_sim.cosine_sim)[0]
+        # Cosine with a custom score_lambda is scored pair by pair
+        sim_fx = GraphSemSim(graph).cosine_sim
+        args = inspect.getfullargspec(sim_fx)[0]
         new_kwargs = {k: v for k, v in kwargs.items() if k in args}
-        for profile_id, profile_b in dataset.items():
-            score = graph_sim.cosine_sim(profile, profile_b, **new_kwargs)
-            result = SimMatch(id=profile_id, rank=0, score=score)
-            search_result.results.append(result)
+
+        def score_fx(profile: Iterable[str]) -> Iterator[Tuple[str, float]]:
+            for profile_id, profile_b in dataset.items():
+                yield profile_id, sim_fx(profile, profile_b, **new_kwargs)
 
     else:
         raise ValueError(f'{method} not supported')
 
-    return rank_results(search_result, rank_method)
+    return score_fx
+
+
+def _is_closure_search(method: Union[ICMethod, SetMethod, str], **kwargs) -> bool:
+    """
+    Whether a method can be scored with a closure matrix, see ClosureMatrix
+    """
+    return method in CLOSURE_METHODS and 'score_lambda' not in kwargs
+
+
+def _get_closure_score_fx(
+    dataset: Union[Dict[str, Iterable[str]], CompiledDataset],
+    graph: Union[ICGraph, Graph],
+    method: Union[ICMethod, SetMethod, str],
+    **kwargs,
+) -> Callable[[Iterable[str]], Iterator[Tuple[str, float]]]:
+    """
+    Score function for jaccard, cosine, sim_gic and ic_cosine that scores
+    every entity at once with the closure matrix of a compiled dataset,
+    dictionaries are compiled first
+    """
+    if not isinstance(dataset, CompiledDataset):
+        with stage('compile'):
+            dataset = CompiledDataset.compile(dataset, graph)
+    closure_matrix = ClosureMatrix(dataset, graph)
+    if method == 'jaccard':
+        search_fx = closure_matrix.jaccard
+    elif method == 'cosine':
+        search_fx = closure_matrix.cosine
+    elif method == 'sim_gic':
+        search_fx = closure_matrix.sim_gic
+    else:
+        search_fx = closure_matrix.ic_cosine
+
+    # Get the subset of keyword args that are available for this fx
+    args = inspect.getfullargspec(search_fx)[0]
+    new_kwargs = {k: v for k, v in kwargs.items() if k in args}
+
+    def score_fx(profile: Iterable[str]) -> Iterator[Tuple[str, float]]:
+        with stage('closure_matrix'):
+            scores = search_fx(profile, **new_kwargs).tolist()
+        return zip(closure_matrix.entities, scores)
+
+    return score_fx
+
+
+def search_metrics(
+    profile: Iterable[str],
+    dataset: Union[Dict[str, Iterable[str]], CompiledDataset],
+    graph: ICGraph,
+    metrics: Iterable[Union[MatrixScore, str]],
+    ns_filter: Optional[Union[str, Namespace]] = None,
+    sim_measure: Union[PairwiseSim, str] = PairwiseSim.GEOMETRIC,
+) -> MetricResult:
+    """
+    Score every entity in a dataset with several matrix based scores,
+    the score matrices of the profile are computed once and shared by
+    every entity and metric, see VectorSemSim.metric_search
+
+    :param profile: An iterable of ontology identifiers
+    :param dataset: A dictionary where the key is the entity and the value is an iterable of ontology
+                    ids (see output from builder.annotation_builder.flat_to_annotations),
+                    or a CompiledDataset compiled against graph
+    :param graph: ICGraph
+    :param metrics: Scores to compute, see MatrixScore
+    :param ns_filter: Namespace filter of the phenodigm optimal matrices
+    :param sim_measure: Pairwise similarity of phenodigm scores, GEOMETRIC or IC
+    :return: MetricResult with a score vector per entity in dataset order, unranked,
+             searches run in an instrument() block record stage timings and
+             counters in MetricResult.stats
+    """
+    if isinstance(dataset, CompiledDataset):
+        dataset.check_graph(graph)
+    metrics = [MatrixScore(metric) for metric in metrics]
+
+    def score_dataset() -> MetricResult:
+        with stage('score'):
+            vector_sim = _get_vector_sim(dataset, graph)
+            ids, scores = [], []
+            for entity, entity_scores in vector_sim.metric_search(
+                profile, vector_sim.encode_dataset(dataset), metrics, ns_filter, sim_measure
+            ):
+                ids.append(entity)
+                scores.append(entity_scores)
+        count('entities_scored', len(ids))
+        return MetricResult(ids, metrics, scores)
+
+    if not is_instrumented():
+        return score_dataset()
+
+    with instrument() as stats:
+        with stage('search'):
+            metric_result = score_dataset()
+
+    metric_result.stats = stats
+    return metric_result
 
 
 def get_methods() -> List[str]:
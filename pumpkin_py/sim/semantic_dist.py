@@ -39,22 +39,11 @@ class SemanticDist:
         a_closure = self.graph.get_profile_closure(profile_a)
         b_closure = self.graph.get_profile_closure(profile_b)
 
-        all_phenotypes = a_closure.union(b_closure)
+        # Terms in both closures contribute 0 to the distance,
+        # so only the symmetric difference is gathered
+        ic_vector = self.graph.ic_store.get_ic_vector(a_closure.symmetric_difference(b_closure))
 
-        a_vector = np.array(
-            [
-                self.graph.ic_store.ic_map[item] if item in a_closure else 0
-                for item in all_phenotypes
-            ]
-        )
-        b_vector = np.array(
-            [
-                self.graph.ic_store.ic_map[item] if item in b_closure else 0
-                for item in all_phenotypes
-            ]
-        )
-
-        return np.linalg.norm(a_vector - b_vector)
+        return float(np.linalg.norm(ic_vector.astype(np.float64)))
 
     def euclidean_matrix(
         self,
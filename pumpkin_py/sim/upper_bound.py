@@ -0,0 +1,402 @@
+import math
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+from pyroaring import BitMap
+
+from ..graph.ic_graph import ICGraph
+from ..models.namespace import Namespace
+from ..store.annotation_store import CompiledDataset
+from . import matrix
+from .closure_matrix import _row_maxes, _row_sums
+from .ic_semsim import ICSemSim, MatrixMetric, PairwiseSim
+
+
+class ScoreBound:
+    """
+    Upper bounds on IC based similarity scores between a query profile
+    and another profile, computed without building score matrices
+
+    Bounds are used to skip profiles that cannot rank in the top k
+    of a search, see search(top_k=)
+
+    Matrix based scores are bounded row by row: for a query term a with
+    ancestors A and the closure C of profile b, the MICA of a and any term
+    in profile b is at most max(A ∩ C), and their jaccard index is
+    at most |A ∩ C| / |A|
+
+    Each bound has a dataset counterpart (eg phenodigm_bounds) that bounds
+    every entity of a CompiledDataset at once from its CSR closure matrix
+
+    The symmetric phenodigm score also divides by the optimal matrix of
+    profile b, which is bounded from below by the score of each term of
+    profile b against itself
+    """
+
+    def __init__(self, graph: ICGraph, profile: Iterable[str]):
+        """
+        :param graph: ICGraph
+        :param profile: Query profile, negated phenotypes are ignored
+        """
+        self.graph = graph
+        self.profile = {pheno for pheno in profile if not pheno[0] == "-"}
+        self.closure = graph.get_profile_closure(self.profile)
+        self.closure_ic = graph.ic_store.get_ic_sum(self.closure)
+        self._ancestors = [graph.get_ancestors(pheno) for pheno in self.profile]
+        self._ancestor_ids = [
+            np.frombuffer(ancestors.to_array(), dtype=np.uint32) for ancestors in self._ancestors
+        ]
+        self._ic = np.asarray(graph.ic_store.ic, dtype=np.float64)
+        self._ic_sim = ICSemSim(graph)
+        self._optimal_scores: Dict[Tuple, Any] = {}
+
+    def get_row_bounds(
+        self,
+        profile_b: Iterable[str],
+        sim_measure: Optional[PairwiseSim] = PairwiseSim.IC,
+        closure_b: Optional[BitMap] = None,
+    ) -> np.ndarray:
+        """
+        Upper bound on the best pairwise score of each query term
+        against any term in profile b
+
+        For the IC measure these are exactly the row maxes of the score matrix
+
+        :param profile_b: Iterable of curies
+        :param sim_measure: Pairwise similarity measure, GEOMETRIC or IC
+        :param closure_b: Optional precomputed closure of profile b,
+                          eg from a CompiledDataset
+        :return: numpy array, one bound per query term
+        """
+        if closure_b is None:
+            closure_b = self.graph.get_profile_closure(profile_b)
+        ic_store = self.graph.ic_store
+        # Pairs without a common ancestor fall back to the integer encoded id 0
+        fallback_ic = ic_store.ic_map[0]
+
+        bounds = np.zeros(len(self._ancestors), dtype=np.float64)
+        for index, ancestors in enumerate(self._ancestors):
+            common_ancestors = ancestors.intersection(closure_b)
+            if sim_measure == PairwiseSim.GEOMETRIC:
+                if common_ancestors:
+                    mica_ic = ic_store.ic_map[ic_store.get_mica(common_ancestors)]
+                    jaccard = len(common_ancestors) / len(ancestors)
+                    bounds[index] = math.sqrt(jaccard * mica_ic)
+            elif sim_measure == PairwiseSim.IC:
+                if common_ancestors:
+                    bounds[index] = ic_store.ic_map[ic_store.get_mica(common_ancestors)]
+                else:
+                    bounds[index] = fallback_ic
+            else:
+                raise NotImplementedError
+
+        return bounds
+
+    def phenodigm(
+        self,
+        profile_b: Iterable[str],
+        ns_filter: Optional[Union[str, Namespace]] = None,
+        is_symmetric: Optional[bool] = False,
+        sim_measure: Optional[PairwiseSim] = PairwiseSim.GEOMETRIC,
+        closure_b: Optional[BitMap] = None,
+    ) -> float:
+        """
+        Upper bound on ICSemSim.phenodigm_compare
+
+        Every value in the score matrix is at most the largest row bound,
+        which bounds the max and the column maxes used in the symmetric
+        best match average
+        """
+        if not self.profile:
+            return math.inf
+
+        profile_b = {pheno for pheno in profile_b if not pheno[0] == "-"}
+        row_bounds = self.get_row_bounds(profile_b, sim_measure, closure_b)
+        max_bound = row_bounds.max()
+        sym_bma_bound = (row_bounds.sum() + len(profile_b) * max_bound) / (
+            len(row_bounds) + len(profile_b)
+        )
+
+        optimal_max, optimal_sym_bma = self._get_phenodigm_optimal(ns_filter, sim_measure)
+        if optimal_max == 0 or optimal_sym_bma == 0:
+            return math.inf
+        bound = 100 * (max_bound / optimal_max + sym_bma_bound / optimal_sym_bma) / 2
+
+        if is_symmetric:
+            # The matrix of b against a is the transpose, with the same max and
+            # symmetric best match average, only the optimal matrix differs
+            self_scores = np.array(
+                [self._get_self_score(pheno, ns_filter, sim_measure) for pheno in profile_b]
+            )
+            b_max, b_sym_bma = _optimal_lower_bounds(
+                self_scores, np.array([0, len(self_scores)]), ns_filter
+            )
+            if b_max[0] == 0 or b_sym_bma[0] == 0:
+                return math.inf
+            flipped_bound = 100 * (max_bound / b_max[0] + sym_bma_bound / b_sym_bma[0]) / 2
+            bound = (bound + flipped_bound) / 2
+
+        return bound
+
+    def resnik(
+        self,
+        profile_b: Iterable[str],
+        matrix_metric: Union[MatrixMetric, str, None] = MatrixMetric.BMA,
+        is_symmetric: Optional[bool] = False,
+        is_normalized: Optional[bool] = False,
+        closure_b: Optional[BitMap] = None,
+    ) -> float:
+        """
+        Upper bound on ICSemSim.resnik_sim
+
+        The row bounds are the row maxes of the IC score matrix, so the BMA
+        and max are exact and bound the average. Normalized scores
+        are at most 1 as the MICA of two terms is no more informative
+        than either term
+        """
+        if not self.profile:
+            return math.inf
+
+        profile_b = {pheno for pheno in profile_b if not pheno[0] == "-"}
+        row_bounds = self.get_row_bounds(profile_b, PairwiseSim.IC, closure_b)
+        if matrix_metric == MatrixMetric.MAX:
+            bound = row_bounds.max()
+        else:
+            bound = row_bounds.mean()
+
+        if is_normalized:
+            optimal_score = self._get_resnik_optimal(matrix_metric)
+            bound = min(1.0, bound / optimal_score) if optimal_score else 1.0
+
+        if is_symmetric:
+            # b vs a is always normalized, see ICSemSim.resnik_sim
+            bound = (bound + 1.0) / 2
+
+        return bound
+
+    def sim_gic(self, profile_b: Iterable[str], closure_b: Optional[BitMap] = None) -> float:
+        """
+        Upper bound on ICSemSim.sim_gic
+
+        The union of both closures includes the query closure, so the summed
+        IC of the query closure bounds the denominator from below
+        """
+        if self.closure_ic == 0:
+            return math.inf
+        if closure_b is None:
+            profile_b = {pheno for pheno in profile_b if not pheno[0] == "-"}
+            closure_b = self.graph.get_profile_closure(profile_b)
+        common_ancestors = self.closure.intersection(closure_b)
+        numerator = self.graph.ic_store.get_ic_sum(common_ancestors)
+        return numerator / self.closure_ic
+
+    def get_dataset_row_bounds(
+        self, dataset: CompiledDataset, sim_measure: Optional[PairwiseSim] = PairwiseSim.IC
+    ) -> np.ndarray:
+        """
+        get_row_bounds for every entity in a compiled dataset
+
+        Each query term masks the CSR closure matrix with its ancestors, the
+        MICA bound is the row max of the masked information content and
+        the jaccard bound counts the masked entries of each row
+
+        :param dataset: CompiledDataset
+        :param sim_measure: Pairwise similarity measure, GEOMETRIC or IC
+        :return: numpy array with one row per entity and one column per query term
+        """
+        if sim_measure not in (PairwiseSim.GEOMETRIC, PairwiseSim.IC):
+            raise NotImplementedError
+        indptr, indices = dataset.closure_csr
+        closure_ic = self._ic[indices]
+        bounds = np.zeros((len(dataset), len(self._ancestors)), dtype=np.float64)
+        for index, ancestors in enumerate(self._ancestor_ids):
+            is_common = np.zeros(len(self._ic), dtype=bool)
+            is_common[ancestors] = True
+            is_common = is_common[indices]
+            # Information content is non negative, -1 marks rows without common ancestors
+            mica_ic = _row_maxes(indptr, np.where(is_common, closure_ic, -1.0), -1.0)
+            has_common = mica_ic >= 0
+            if sim_measure == PairwiseSim.GEOMETRIC:
+                jaccard = _row_sums(indptr, is_common.astype(np.float64)) / max(len(ancestors), 1)
+                bounds[:, index] = np.sqrt(jaccard * np.where(has_common, mica_ic, 0.0))
+            else:
+                bounds[:, index] = np.where(has_common, mica_ic, self._ic[0])
+
+        return bounds
+
+    def phenodigm_bounds(
+        self,
+        dataset: CompiledDataset,
+        ns_filter: Optional[Union[str, Namespace]] = None,
+        is_symmetric: Optional[bool] = False,
+        sim_measure: Optional[PairwiseSim] = PairwiseSim.GEOMETRIC,
+    ) -> np.ndarray:
+        """
+        phenodigm for every entity in a compiled dataset
+
+        :return: numpy array, one bound per entity in dataset order
+        """
+        if not self.profile:
+            return np.full(len(dataset), math.inf)
+
+        row_bounds = self.get_dataset_row_bounds(dataset, sim_measure)
+        sizes = np.diff(dataset.indptr)
+        max_bound = row_bounds.max(axis=1)
+        sym_bma_bound = (row_bounds.sum(axis=1) + sizes * max_bound) / (
+            len(self._ancestors) + sizes
+        )
+
+        optimal_max, optimal_sym_bma = self._get_phenodigm_optimal(ns_filter, sim_measure)
+        if optimal_max == 0 or optimal_sym_bma == 0:
+            return np.full(len(dataset), math.inf)
+        bounds = 100 * (max_bound / optimal_max + sym_bma_bound / optimal_sym_bma) / 2
+
+        if is_symmetric:
+            self_scores = dataset.get_derived(
+                f'self_scores:{sim_measure}:{ns_filter}',
+                self.graph,
+                lambda: np.array(
+                    [self._get_self_score(pheno, ns_filter, sim_measure) for pheno in dataset.terms]
+                ),
+            )
+            b_max, b_sym_bma = _optimal_lower_bounds(
+                self_scores[dataset.indices], dataset.indptr, ns_filter
+            )
+            # Profiles without a nonzero optimal score are not bounded
+            is_bounded = (b_max > 0) & (b_sym_bma > 0)
+            flipped_bounds = np.full(len(dataset), math.inf)
+            np.divide(max_bound, b_max, out=flipped_bounds, where=is_bounded)
+            flipped_bounds[is_bounded] += sym_bma_bound[is_bounded] / b_sym_bma[is_bounded]
+            flipped_bounds[is_bounded] *= 100 / 2
+            bounds = (bounds + flipped_bounds) / 2
+
+        return bounds
+
+    def resnik_bounds(
+        self,
+        dataset: CompiledDataset,
+        matrix_metric: Union[MatrixMetric, str, None] = MatrixMetric.BMA,
+        is_symmetric: Optional[bool] = False,
+        is_normalized: Optional[bool] = False,
+    ) -> np.ndarray:
+        """
+        resnik for every entity in a compiled dataset
+
+        :return: numpy array, one bound per entity in dataset order
+        """
+        if not self.profile:
+            return np.full(len(dataset), math.inf)
+
+        row_bounds = self.get_dataset_row_bounds(dataset, PairwiseSim.IC)
+        if matrix_metric == MatrixMetric.MAX:
+            bounds = row_bounds.max(axis=1)
+        else:
+            bounds = row_bounds.mean(axis=1)
+
+        if is_normalized:
+            optimal_score = self._get_resnik_optimal(matrix_metric)
+            bounds = (
+                np.minimum(1.0, bounds / optimal_score) if optimal_score else np.ones_like(bounds)
+            )
+
+        if is_symmetric:
+            bounds = (bounds + 1.0) / 2
+
+        return bounds
+
+    def sim_gic_bounds(self, dataset: CompiledDataset) -> np.ndarray:
+        """
+        sim_gic for every entity in a compiled dataset
+
+        :return: numpy array, one bound per entity in dataset order
+        """
+        if self.closure_ic == 0:
+            return np.full(len(dataset), math.inf)
+        indptr, indices = dataset.closure_csr
+        weights = np.zeros(len(self._ic), dtype=np.float64)
+        ids = np.frombuffer(self.closure.to_array(), dtype=np.uint32)
+        weights[ids] = self._ic[ids]
+        return _row_sums(indptr, weights[indices]) / self.closure_ic
+
+    def _get_self_score(
+        self,
+        pheno: str,
+        ns_filter: Optional[Union[str, Namespace]] = None,
+        sim_measure: Optional[PairwiseSim] = PairwiseSim.GEOMETRIC,
+    ) -> float:
+        """
+        Score of a term against itself, the diagonal of its optimal matrix,
+        0 for terms that are not in the graph
+        """
+        if pheno not in self.graph.id_map:
+            return 0.0
+        if ns_filter:
+            return self._ic_sim._make_row(pheno, [pheno], sim_measure, ns_filter)[0]
+        ic = self.graph.get_ic(pheno)
+        if sim_measure == PairwiseSim.GEOMETRIC:
+            return math.sqrt(ic)
+        elif sim_measure == PairwiseSim.IC:
+            return ic
+        else:
+            raise NotImplementedError
+
+    def _get_phenodigm_optimal(
+        self,
+        ns_filter: Optional[Union[str, Namespace]] = None,
+        sim_measure: Optional[PairwiseSim] = PairwiseSim.GEOMETRIC,
+    ) -> Tuple[float, float]:
+        """
+        Max and symmetric best match average of the query optimal matrix,
+        computed as in ICSemSim.phenodigm_compare
+        """
+        key = ('phenodigm', ns_filter, sim_measure)
+        if key not in self._optimal_scores:
+            if ns_filter:
+                optimal_matrix = self._ic_sim._get_score_matrix(
+                    self.profile, self.profile, sim_measure, ns_filter
+                )
+            else:
+                optimal_matrix = self._ic_sim._get_self_vs_self(self.profile, sim_measure)
+            self._optimal_scores[key] = (
+                matrix.max_score(optimal_matrix),
+                matrix.sym_bma_score(optimal_matrix),
+            )
+        return self._optimal_scores[key]
+
+    def _get_resnik_optimal(
+        self, matrix_metric: Union[MatrixMetric, str, None] = MatrixMetric.BMA
+    ) -> float:
+        key = ('resnik', matrix_metric)
+        if key not in self._optimal_scores:
+            optimal_matrix = self._ic_sim._get_self_vs_self(self.profile, PairwiseSim.IC)
+            self._optimal_scores[key] = self._ic_sim._compute_resnik_score(
+                optimal_matrix, None, matrix_metric
+            )
+        return self._optimal_scores[key]
+
+
+def _optimal_lower_bounds(
+    self_scores: np.ndarray, indptr: np.ndarray, ns_filter: Optional[Union[str, Namespace]]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lower bounds on the max and symmetric best match average of the
+    optimal matrix of each profile in a CSR layout, see ScoreBound
+
+    Without a namespace filter the optimal matrix is the column of self
+    scores, so both are exact.  With a filter the optimal matrix is the
+    profile against itself and the self scores are its diagonal, which is
+    at most the max and the best match of each row and column
+
+    :param self_scores: score of each term against itself
+    :param indptr: row offsets into self_scores
+    :return: max and symmetric best match average bounds, one per profile
+    """
+    sizes = np.diff(indptr)
+    max_scores = _row_maxes(indptr, self_scores, 0.0)
+    sums = _row_sums(indptr, self_scores)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if ns_filter:
+            sym_bma_scores = np.where(sizes > 0, sums / sizes, 0.0)
+        else:
+            sym_bma_scores = np.where(sizes > 0, (sums + max_scores) / (sizes + 1), 0.0)
+    return max_scores, sym_bma_scores
@@ -1,7 +1,280 @@
+from array import array
+from collections.abc import Mapping
 from dataclasses import dataclass
-from typing import Dict, Set
+from functools import cached_property
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
+import numpy as np
+from pyroaring import BitMap, FrozenBitMap
+
+from ..graph.graph import Graph
+from ..graph.ic_graph import ICGraph
 from ..models.dataset import Dataset
+from .ic_store import ICStore
+
+T = TypeVar('T')
+
+
+@dataclass(eq=False)
+class CompiledDataset(Mapping):
+    """
+    Integer encoded dataset compiled against a graph, see CompiledDataset.compile
+
+    Positive phenotypes are stored CSR style, the phenotypes of the entity at
+    position i are terms[indices[indptr[i]:indptr[i + 1]]].  The union closure
+    of the positive phenotypes of each entity, and its summed information
+    content (ICGraph only), are computed once at compile time
+
+    A compiled dataset is a read only mapping of entity to a frozenset of curies
+    (negated phenotypes prefixed with a '-'), so it can be used anywhere a
+    dataset dictionary is accepted; search() uses the compiled arrays directly,
+    and caches objects built from the term table (eg a VectorSemSim), see get_derived
+    """
+
+    graph: Graph
+    entities: List[str]
+    terms: List[str]
+    indptr: np.ndarray  # int64, len(entities) + 1
+    indices: np.ndarray  # int32 positions in terms
+    negated: Dict[str, FrozenSet[str]]
+    closures: List[FrozenBitMap]
+    ic_sums: Optional[np.ndarray] = None  # float64, one per entity
+
+    def __post_init__(self):
+        self.entity_index: Dict[str, int] = {
+            entity: index for index, entity in enumerate(self.entities)
+        }
+        # Ids and information content the dataset was compiled with, the
+        # graph may be updated in place afterwards, see ICModel
+        self.id_map = self.graph.id_map
+        self.ic_store: Optional[ICStore] = getattr(self.graph, 'ic_store', None)
+        # Objects built from the term table and a graph, shared with subsets
+        self._derived: Dict[Tuple[str, int], Tuple[Tuple, Any]] = {}
+        # Summed information content of each closure per ICStore, see get_ic_sums
+        self._ic_sums: Dict[int, Tuple[ICStore, np.ndarray]] = {}
+
+    @classmethod
+    def compile(
+        cls, annotations: Dict[str, Iterable[str]], graph: Union[ICGraph, Graph]
+    ) -> 'CompiledDataset':
+        """
+        :param annotations: A dictionary where the key is the entity and the value is
+                            an iterable of curies, eg output from
+                            builder.annotation_builder.flat_to_annotations
+        :param graph: Graph used to compute closures, and information content
+                      if it is an ICGraph
+        :return: CompiledDataset
+        """
+        term_index: Dict[str, int] = {}
+        indptr = [0]
+        indices = []
+        negated = {}
+        closures = []
+        for entity, profile in annotations.items():
+            positive_profile = {pheno for pheno in profile if not pheno[0] == "-"}
+            for pheno in positive_profile:
+                indices.append(term_index.setdefault(pheno, len(term_index)))
+            indptr.append(len(indices))
+            negated[entity] = frozenset(pheno for pheno in profile if pheno[0] == "-")
+            closures.append(FrozenBitMap(graph.get_profile_closure(positive_profile)))
+
+        ic_sums = None
+        if isinstance(graph, ICGraph):
+            ic_sums = np.array(
+                [graph.ic_store.get_ic_sum(closure) for closure in closures], dtype=np.float64
+            )
+
+        return cls(
+            graph=graph,
+            entities=list(annotations.keys()),
+            terms=list(term_index.keys()),
+            indptr=np.array(indptr, dtype=np.int64),
+            indices=np.array(indices, dtype=np.int32),
+            negated=negated,
+            closures=closures,
+            ic_sums=ic_sums,
+        )
+
+    def get_indices(self, entity: str) -> np.ndarray:
+        """
+        :param entity: entity id
+        :return: positions in terms of the positive phenotypes of the entity
+        """
+        index = self.entity_index[entity]
+        return self.indices[self.indptr[index] : self.indptr[index + 1]]
+
+    def get_closure(self, entity: str) -> FrozenBitMap:
+        """
+        :param entity: entity id
+        :return: Union closure of the positive phenotypes of the entity
+        """
+        return self.closures[self.entity_index[entity]]
+
+    def subset(self, entities: Iterable[str]) -> 'CompiledDataset':
+        """
+        Select entities, in the given order, without recompiling them
+
+        :param entities: Iterable of entity ids in this dataset
+        :return: CompiledDataset sharing the term table of this dataset
+        """
+        entities = list(entities)
+        positions = [self.entity_index[entity] for entity in entities]
+        slices = [self.indices[self.indptr[pos] : self.indptr[pos + 1]] for pos in positions]
+        indptr = np.zeros(len(entities) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(indices) for indices in slices])
+
+        subset = CompiledDataset(
+            graph=self.graph,
+            entities=entities,
+            terms=self.terms,
+            indptr=indptr,
+            indices=np.concatenate(slices) if slices else np.array([], dtype=np.int32),
+            negated={entity: self.negated[entity] for entity in entities},
+            closures=[self.closures[pos] for pos in positions],
+            ic_sums=self.ic_sums[positions] if self.ic_sums is not None else None,
+        )
+        subset.id_map = self.id_map
+        subset.ic_store = self.ic_store
+        subset._derived = self._derived
+        return subset
+
+    def check_graph(self, graph: Graph) -> None:
+        """
+        Raise a ValueError unless the dataset was compiled against the
+        integer encoded ids of graph, eg it was compiled before an ICModel
+        update re-sorted the graph.  Graphs that share ids, such as the
+        corpus graphs of ICGraph.with_corpus, can search the dataset
+
+        :param graph: Graph used to search the dataset
+        """
+        if self.id_map is not graph.id_map:
+            raise ValueError(
+                "CompiledDataset was compiled against other integer encoded ids, "
+                "compile it against the search graph"
+            )
+
+    def get_ic_sums(self, ic_store: ICStore) -> np.ndarray:
+        """
+        Summed information content of each entity closure, computed at compile
+        time for the information content of the graph and on first use for
+        other stores, eg a corpus (see ICGraph.with_corpus)
+
+        :param ic_store: ICStore of the search graph
+        :return: numpy array, one sum per entity
+        """
+        if ic_store is self.ic_store and self.ic_sums is not None:
+            return self.ic_sums
+        cached = self._ic_sums.get(id(ic_store))
+        if cached is None or cached[0] is not ic_store:
+            ic_sums = np.array(
+                [ic_store.get_ic_sum(closure) for closure in self.closures], dtype=np.float64
+            )
+            cached = (ic_store, ic_sums)
+            self._ic_sums[id(ic_store)] = cached
+        return cached[1]
+
+    def get_derived(self, name: str, graph: Graph, build: Callable[[], T]) -> T:
+        """
+        Object built from the term table of the dataset and a graph, eg the
+        VectorSemSim of a vectorized search, built on first use and shared
+        with subsets of the dataset.  It is rebuilt when the ids or information
+        content of the graph have changed, eg after an ICModel update
+
+        :param name: Name of the object
+        :param graph: Graph the object is built with
+        :param build: Function that builds the object
+        :return: The cached object
+        """
+        key = (name, id(graph))
+        state = (graph, graph.id_map, getattr(graph, 'ic_store', None))
+        cached = self._derived.get(key)
+        if cached is None or any(old is not new for old, new in zip(cached[0], state)):
+            cached = (state, build())
+            self._derived[key] = cached
+        return cached[1]
+
+    @cached_property
+    def closure_csr(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Closures as a sparse (entity, integer encoded id) matrix in CSR
+        layout, computed on first use, see closures_to_csr
+
+        :return: Tuple of indptr and indices
+        """
+        return closures_to_csr(self.closures)
+
+    @cached_property
+    def inverted_index(self) -> Dict[int, FrozenBitMap]:
+        """
+        Inverted index of integer encoded id (key) to the positions in entities
+        of the entities annotated at or below it, computed on first use
+
+        :return: Dictionary of integer encoded id and bitmap of entity positions
+        """
+        indptr, indices = self.closure_csr
+        positions = np.repeat(np.arange(len(self.entities), dtype=np.uint32), np.diff(indptr))
+        order = np.argsort(indices, kind='stable')
+        sorted_ids = indices[order]
+        positions = positions[order]
+        starts = np.flatnonzero(np.diff(sorted_ids)) + 1
+
+        return {
+            int(node): FrozenBitMap(array('I', group.tobytes()))
+            for node, group in zip(
+                sorted_ids[np.concatenate(([0], starts))] if len(sorted_ids) else [],
+                np.split(positions, starts),
+            )
+        }
+
+    def __getitem__(self, entity: str) -> FrozenSet[str]:
+        terms = [self.terms[index] for index in self.get_indices(entity)]
+        return frozenset(terms).union(self.negated[entity])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entities)
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def __getstate__(self):
+        # Derived objects hold graphs, eg when passing a dataset to a process pool,
+        # and IC sums are keyed by the ids of objects in this process
+        state = dict(self.__dict__)
+        state['_derived'] = {}
+        state['_ic_sums'] = {}
+        return state
+
+
+def closures_to_csr(closures: Sequence[BitMap]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stack closures into the index arrays of a sparse 0/1 matrix in CSR layout,
+    the ids in closure i are indices[indptr[i]:indptr[i + 1]], in ascending order
+
+    :param closures: Sequence of bitmaps of integer encoded ids
+    :return: Tuple of indptr (int64, len(closures) + 1) and indices (uint32)
+    """
+    indptr = np.zeros(len(closures) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(closure) for closure in closures])
+    indices = np.empty(indptr[-1], dtype=np.uint32)
+    for index, closure in enumerate(closures):
+        indices[indptr[index] : indptr[index + 1]] = np.frombuffer(
+            closure.to_array(), dtype=np.uint32
+        )
+    return indptr, indices
 
 
 @dataclass
@@ -13,3 +286,15 @@ class AnnotationStore:
 
     store: Dict[Dataset, Dict[str, Set[str]]]
     id_label: Dict[str, str]
+
+    def compile(self, graph: Union[ICGraph, Graph]) -> Dict[Dataset, CompiledDataset]:
+        """
+        Compile each dataset in the store against a graph, see CompiledDataset
+
+        :param graph: Graph used to compute closures and information content
+        :return: Dictionary of dataset (key) and CompiledDataset
+        """
+        return {
+            dataset: CompiledDataset.compile(annotations, graph)
+            for dataset, annotations in self.store.items()
+        }
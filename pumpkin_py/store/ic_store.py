@@ -1,13 +1,177 @@
-from typing import Dict, NamedTuple
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
 
+import numpy as np
 from bidict import bidict
+from pyroaring import BitMap
 
+from ..models.namespace import Namespace
+from .mica_table import MicaTable
 
-class ICStore(NamedTuple):
+
+class ICStore:
+    """
+    Information content per class, stored as a contiguous numpy array
+    indexed by integer encoded id
+
+    ic_map is a read only dictionary like view of the array for
+    scalar lookups, measures that sum or gather the information content
+    of many classes should use get_ic_vector and get_ic_sum
+
+    Optionally holds precomputed MICAs between classes, one MicaTable
+    per namespace filter (None for unfiltered MICAs), see add_mica_table
+
+    Graphs encode ids in ascending order of information content, so the most
+    informative class of a bitmap is its maximum.  A store for another annotation
+    corpus of the same graph (see ICGraph.add_corpus) holds its own order, the ids
+    in ascending order of its information content, and get_mica and
+    get_ascending_ids rank ids by that order instead
+    """
+
+    def __init__(
+        self,
+        ic_map: Union[Dict[int, float], Sequence[float], np.ndarray],
+        id_map: bidict,  # bidict[Dict[str, int]]
+        dtype: Optional[np.dtype] = np.float64,
+        order: Optional[np.ndarray] = None,
+    ):
+        """
+        :param ic_map: information content per integer encoded id, either
+                       a dictionary with keys 0 to n-1 or an array like
+        :param id_map: dictionary of curie id (key) to integer encoded id (value)
+        :param dtype: numpy float type of the array, float32 halves memory use
+        :param order: integer encoded ids in ascending order of information content,
+                      None if ids are already in ascending order
+        """
+        if isinstance(ic_map, dict):
+            ic = np.zeros(len(ic_map), dtype=dtype)
+            for node, node_ic in ic_map.items():
+                if not 0 <= node < len(ic_map):
+                    raise ValueError("ic_map keys must be integer encoded ids 0 to n-1")
+                ic[node] = node_ic
+        else:
+            ic = np.asarray(ic_map, dtype=dtype)
+
+        self.ic: np.ndarray = ic
+        self.id_map = id_map
+        self.ic_map = ICMapView(ic)
+        self.mica_tables: Dict[Optional[Union[str, Namespace]], MicaTable] = {}
+        self._ic_list: Optional[List[float]] = None
+
+        self.order: Optional[np.ndarray] = None
+        # Position of each id in order
+        self.rank: Optional[np.ndarray] = None
+        if order is not None:
+            if len(order) != len(ic):
+                raise ValueError("order must contain every integer encoded id")
+            self.order = np.asarray(order, dtype=np.uint32)
+            self.rank = np.empty(len(self.order), dtype=np.uint32)
+            self.rank[self.order] = np.arange(len(self.order), dtype=np.uint32)
+
+    def get_ic_list(self) -> List[float]:
+        """
+        Information content as a list of floats, built on first use, for
+        looking up a few ids at a time (eg a row of a score matrix) without
+        converting them to an array
+
+        :return: information content per integer encoded id
+        """
+        if self._ic_list is None:
+            self._ic_list = self.ic.tolist()
+        return self._ic_list
+
+    def get_ic_vector(self, nodes: BitMap) -> np.ndarray:
+        """
+        :param nodes: bitmap of integer encoded ids
+        :return: numpy array of the information content of each id, in ascending id order
+        """
+        return self.ic[np.frombuffer(nodes.to_array(), dtype=np.uint32)]
+
+    def get_ic_sum(self, nodes: BitMap) -> float:
+        """
+        :param nodes: bitmap of integer encoded ids
+        :return: summed information content, as a float64
+        """
+        return float(self.get_ic_vector(nodes).sum(dtype=np.float64))
+
+    def get_mica(self, nodes: BitMap) -> int:
+        """
+        :param nodes: non empty bitmap of integer encoded ids, eg common ancestors
+        :return: the most informative id, the maximum id when ids are in ascending order
+        """
+        if self.rank is None:
+            return nodes.max()
+        ids = np.frombuffer(nodes.to_array(), dtype=np.uint32)
+        return int(ids[np.argmax(self.rank[ids])])
+
+    def get_ascending_ids(self, nodes: BitMap) -> Iterable[int]:
+        """
+        :param nodes: bitmap of integer encoded ids
+        :return: ids in ascending order of information content
+        """
+        if self.rank is None:
+            return nodes
+        ids = np.frombuffer(nodes.to_array(), dtype=np.uint32)
+        return ids[np.argsort(self.rank[ids])].tolist()
+
+    def add_mica_table(self, mica_table: MicaTable) -> None:
+        """
+        Use a precomputed MICA table for MICAs in the namespace it was built
+        with, see builder.mica_builder.build_mica_table
+
+        :param mica_table: MicaTable built from the graph that owns this store
+        :return: None
+        """
+        if len(mica_table.positions) != len(self.ic):
+            raise ValueError("mica_table was built from a graph with a different id_map")
+        self.mica_tables[mica_table.namespace] = mica_table
+
+    def get_mica_table(
+        self, ns_filter: Optional[Union[str, Namespace]] = None
+    ) -> Optional[MicaTable]:
+        """
+        :param ns_filter: Namespace filter, None for unfiltered MICAs
+        :return: MicaTable for the namespace filter, or None
+        """
+        return self.mica_tables.get(ns_filter or None)
+
+    def astype(self, dtype: np.dtype) -> 'ICStore':
+        """
+        :param dtype: numpy float type, eg np.float32
+        :return: ICStore sharing the id_map and MICA tables of this store
+        """
+        ic_store = ICStore(self.ic, self.id_map, dtype, self.order)
+        ic_store.mica_tables = dict(self.mica_tables)
+        return ic_store
+
+
+class ICMapView(Mapping):
     """
-    Tuple for storing information content per class and optionally
-    a cached array of micas between all classes
+    Read only Dict[int, float] view of an information content array
     """
 
-    ic_map: Dict[int, float]
-    id_map: bidict  # bidict[Dict[str, int]]
+    def __init__(self, ic: np.ndarray):
+        self._ic = ic
+
+    def __getitem__(self, node: int) -> float:
+        # Negative indices are valid in numpy but are not ids
+        if not isinstance(node, (int, np.integer)) or node < 0:
+            raise KeyError(node)
+        try:
+            return float(self._ic[node])
+        except IndexError:
+            raise KeyError(node)
+
+    def __contains__(self, node) -> bool:
+        return isinstance(node, (int, np.integer)) and 0 <= node < len(self._ic)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self._ic)))
+
+    def __len__(self) -> int:
+        return len(self._ic)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ICMapView):
+            return np.array_equal(self._ic, other._ic)
+        return super().__eq__(other)
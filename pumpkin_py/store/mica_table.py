@@ -0,0 +1,117 @@
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+from ..models.namespace import Namespace
+
+
+class MicaTable:
+    """
+    Precomputed MICAs between every pair of a set of classes, typically
+    every class used to annotate a dataset, see builder.mica_builder
+
+    MICAs are integer encoded ids stored as a packed upper triangular int32
+    array (diagonal included), the MICA of the classes at table positions
+    i <= j is micas[offsets[i] + j - i], so a lookup is two array reads.
+    The information content of a MICA is read from the ICStore
+
+    Saved tables are a single int32 .npy file, [class count, ids, micas],
+    that is memory mapped on load
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        micas: np.ndarray,
+        node_count: int,
+        namespace: Optional[Union[str, Namespace]] = None,
+    ):
+        """
+        :param ids: integer encoded ids of the classes in the table, ascending
+        :param micas: packed upper triangular array of integer encoded MICAs
+        :param node_count: number of classes in the graph
+        :param namespace: Namespace the MICAs are restricted to, None for all classes
+        """
+        if len(micas) != len(ids) * (len(ids) + 1) // 2:
+            raise ValueError("micas must hold one value per pair of ids")
+
+        self.ids = ids
+        # A plain ndarray view, indexing a np.memmap is several times slower
+        self.micas = np.asarray(micas)
+        self.namespace = namespace
+        # graph id (index) to table position, -1 for classes outside the table
+        self.positions = np.full(node_count, -1, dtype=np.int64)
+        self.positions[ids] = np.arange(len(ids))
+        size = len(ids)
+        rows = np.arange(size, dtype=np.int64)
+        self.offsets = rows * size - rows * (rows - 1) // 2
+        # Lists for scalar lookups, which are faster than numpy scalar indexing
+        self._positions: List[int] = self.positions.tolist()
+        self._offsets: List[int] = self.offsets.tolist()
+
+    def get_mica(self, node_a: int, node_b: int) -> int:
+        """
+        :param node_a: integer encoded id
+        :param node_b: integer encoded id
+        :return: integer encoded MICA, or -1 if either class is not in the table
+        """
+        pos_a = self._positions[node_a]
+        pos_b = self._positions[node_b]
+        if pos_a < 0 or pos_b < 0:
+            return -1
+        if pos_a > pos_b:
+            pos_a, pos_b = pos_b, pos_a
+        return self.micas.item(self._offsets[pos_a] + pos_b - pos_a)
+
+    def get_mica_vector(self, node: int, positions: np.ndarray) -> np.ndarray:
+        """
+        MICAs between a class and many classes in the table
+
+        :param node: integer encoded id of a class in the table
+        :param positions: table positions, see MicaTable.positions
+        :return: numpy array of integer encoded MICAs, one per position
+        """
+        pos = self.positions[node]
+        rows = np.minimum(positions, pos)
+        cols = np.maximum(positions, pos)
+        return self.micas[self.offsets[rows] + cols - rows]
+
+    def __contains__(self, node: int) -> bool:
+        return 0 <= node < len(self._positions) and self._positions[node] >= 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        :param path: .npy file path to write
+        :return: None
+        """
+        data = np.lib.format.open_memmap(
+            path, mode='w+', dtype=np.int32, shape=(1 + len(self.ids) + len(self.micas),)
+        )
+        data[0] = len(self.ids)
+        data[1 : 1 + len(self.ids)] = self.ids
+        data[1 + len(self.ids) :] = self.micas
+        data.flush()
+        del data
+
+    @classmethod
+    def load(
+        cls,
+        path: Union[str, Path],
+        node_count: int,
+        namespace: Optional[Union[str, Namespace]] = None,
+        mmap: bool = True,
+    ) -> 'MicaTable':
+        """
+        :param path: .npy file written by MicaTable.save
+        :param node_count: number of classes in the graph the table was built from
+        :param namespace: Namespace the table was built with
+        :param mmap: Memory map the file (read only) rather than reading it into memory
+        :return: MicaTable
+        """
+        data = np.load(path, mmap_mode='r' if mmap else None)
+        size = int(data[0])
+        return cls(data[1 : 1 + size], data[1 + size :], node_count, namespace)
@@ -0,0 +1,200 @@
+import sys
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Sequence
+
+# Default memory budget of a ScoreCache, in bytes
+DEFAULT_CACHE_BYTES = 128 * 1024 * 1024
+
+# Integer encoded ids are packed into one int key, ids must be below 2**ID_BITS
+ID_BITS = 32
+
+
+class CacheStats(NamedTuple):
+    """
+    Snapshot of ScoreCache statistics
+
+    memory is the size of the cached keys and scores plus the
+    size of the tables that hold them, see sys.getsizeof
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    memory: int
+    max_bytes: int
+
+
+class PairCache:
+    """
+    Least recently used scores of one pairwise measure, see ScoreCache
+    """
+
+    __slots__ = ('scores', 'entry_bytes', 'hits', 'misses', 'evictions')
+
+    def __init__(self):
+        self.scores: OrderedDict = OrderedDict()
+        # Summed size of the keys and scores, the table is sized on demand
+        self.entry_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def memory(self) -> int:
+        return self.entry_bytes + sys.getsizeof(self.scores)
+
+
+class ScoreCache:
+    """
+    Per graph cache of pairwise scores capped by its memory use
+    rather than a number of entries
+
+    Each ICGraph owns a cache, so cached scores are released with the graph
+    and are never shared between graphs.  Each pairwise measure (eg mica,
+    jac_ic_geomean) gets its own least recently used cache keyed by the
+    integer encoded ids of a pair, ordered (min, max) when the measure is
+    symmetric so both orders share one entry.  All measures share one
+    memory budget; an insert evicts from its own measure first, and adding
+    a measure leaves the scores of other measures in place
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        """
+        :param max_bytes: Memory budget in bytes, 0 disables caching
+        """
+        self.max_bytes = max_bytes
+        self._caches: Dict[Hashable, PairCache] = {}
+        self._functions: Dict[Hashable, Callable] = {}
+        self._lock = threading.Lock()
+
+    def get_cached_fx(
+        self, measure: Hashable, score_fx: Callable[[int, int], Any], is_symmetric: bool = True
+    ) -> Callable[[int, Sequence[int]], List]:
+        """
+        Get the cached version of a pairwise score function,
+        creating it the first time a measure is requested
+
+        The cached function scores one id against a sequence of ids, as in
+        a row of a score matrix, so a hit costs a dictionary lookup rather
+        than a function call.  Callers on a hot path should get the cached
+        function once and call it for each row
+
+        :param measure: Hashable name of the pairwise measure, eg ('mica', ns_filter)
+        :param score_fx: Function of two integer encoded ids that computes
+                         the score, scores must not be None
+        :param is_symmetric: Score of (a, b) equals the score of (b, a)
+        :return: cached function of (id_a, ids_b) that returns a list of scores
+        """
+        try:
+            return self._functions[measure]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if measure not in self._functions:
+                if self.max_bytes > 0:
+                    self._caches[measure] = PairCache()
+                    self._functions[measure] = self._make_cached_fx(
+                        self._caches[measure], score_fx, is_symmetric
+                    )
+                else:
+                    self._functions[measure] = lambda id_a, ids_b: [
+                        score_fx(id_a, id_b) for id_b in ids_b
+                    ]
+        return self._functions[measure]
+
+    def clear(self) -> None:
+        """
+        Drop all cached scores, cached functions and statistics, eg after
+        swapping the ontology of a long running service.  Score functions
+        may be bound to the old graph state, so functions returned by
+        get_cached_fx before the call should not be used after it
+        """
+        with self._lock:
+            self._caches = {}
+            self._functions = {}
+
+    def stats(self) -> CacheStats:
+        caches = list(self._caches.values())
+        return CacheStats(
+            hits=sum(pair_cache.hits for pair_cache in caches),
+            misses=sum(pair_cache.misses for pair_cache in caches),
+            evictions=sum(pair_cache.evictions for pair_cache in caches),
+            entries=sum(len(pair_cache.scores) for pair_cache in caches),
+            memory=self._get_memory(),
+            max_bytes=self.max_bytes,
+        )
+
+    def __len__(self) -> int:
+        return sum(len(pair_cache.scores) for pair_cache in self._caches.values())
+
+    def _make_cached_fx(
+        self, pair_cache: PairCache, score_fx: Callable[[int, int], Any], is_symmetric: bool
+    ) -> Callable[[int, Sequence[int]], List]:
+        scores = pair_cache.scores
+        get_score = scores.get
+        move_to_end = scores.move_to_end
+
+        def cached_fx(id_a: int, ids_b: Sequence[int]) -> List:
+            if is_symmetric:
+                keys = [
+                    id_b << ID_BITS | id_a if id_b < id_a else id_a << ID_BITS | id_b
+                    for id_b in ids_b
+                ]
+            else:
+                keys = [id_a << ID_BITS | id_b for id_b in ids_b]
+            # Scores are never None, so None marks a miss
+            row = list(map(get_score, keys))
+            misses = [index for index, score in enumerate(row) if score is None]
+            hit_keys = keys
+            if misses:
+                hit_keys = [key for key, score in zip(keys, row) if score is not None]
+            try:
+                deque(map(move_to_end, hit_keys), maxlen=0)
+            except KeyError:
+                # Evicted by another thread since the lookup
+                pass
+            pair_cache.hits += len(hit_keys)
+
+            for index in misses:
+                row[index] = score_fx(id_a, ids_b[index])
+                self._insert(pair_cache, keys[index], row[index])
+            return row
+
+        return cached_fx
+
+    def _insert(self, pair_cache: PairCache, key: int, score) -> None:
+        """
+        Add a score, then evict least recently used scores until the cache
+        is within budget: from the same measure while it has any, otherwise
+        from the measure with the most scores
+        """
+        with self._lock:
+            pair_cache.misses += 1
+            if key in pair_cache.scores:
+                return
+            pair_cache.scores[key] = score
+            pair_cache.entry_bytes += sys.getsizeof(key) + sys.getsizeof(score)
+
+            while self._get_memory() > self.max_bytes:
+                victim = pair_cache
+                if not victim.scores:
+                    victim = max(self._caches.values(), key=lambda cache: len(cache.scores))
+                    if not victim.scores:
+                        break
+                old_key, old_score = victim.scores.popitem(last=False)
+                victim.entry_bytes -= sys.getsizeof(old_key) + sys.getsizeof(old_score)
+                victim.evictions += 1
+
+    def _get_memory(self) -> int:
+        return sum(pair_cache.memory for pair_cache in self._caches.values())
+
+    def __getstate__(self):
+        # Locks and cached functions cannot be pickled, eg when passing
+        # a graph to a process pool, caches are rebuilt on first use
+        return {'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
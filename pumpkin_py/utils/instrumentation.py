@@ -0,0 +1,128 @@
+"""
+Opt-in timing and counters for searches
+
+Code paths record stages and counters with stage() and count(), which only
+do work inside an instrument() block, so searches that are not instrumented
+pay for a context variable lookup per stage:
+
+with instrument(sink=print) as stats:
+    search(profile, dataset, graph, 'phenodigm')
+
+Stages nest, eg the score stage of a search includes the score_matrix stage
+of vectorized methods, and a stage recorded more than once is summed.
+Instrumentation is per thread and per asyncio task, stages run in other
+processes (eg search with workers) are only timed as a whole
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+from ..models.result import SearchStats
+
+_active: ContextVar[Optional[SearchStats]] = ContextVar('search_stats', default=None)
+
+
+class _Stage:
+    """
+    Context manager that adds its wall time to a stage
+    """
+
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats: SearchStats, name: str):
+        self.stats = stats
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        self.stats.timings[self.name] = self.stats.timings.get(self.name, 0.0) + elapsed
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+@contextmanager
+def instrument(sink: Optional[Callable[[SearchStats], None]] = None) -> Iterator[SearchStats]:
+    """
+    Record stage timings and counters of the searches run in the block
+
+    An instrument() block inside another records its own stats and
+    adds them to the stats of the enclosing block when it exits
+
+    :param sink: Optional function called with the stats when the block exits
+    :return: SearchStats, filled in as the block runs
+    """
+    stats = SearchStats()
+    parent = _active.get()
+    token = _active.set(stats)
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+        if parent is not None:
+            merge_stats(parent, stats)
+        if sink is not None:
+            sink(stats)
+
+
+def is_instrumented() -> bool:
+    """
+    :return: True inside an instrument() block
+    """
+    return _active.get() is not None
+
+
+def stage(name: str):
+    """
+    Context manager that times a stage, a no-op outside an instrument() block
+
+    :param name: Stage name, eg rank
+    :return: context manager
+    """
+    stats = _active.get()
+    if stats is None:
+        return _NULL_STAGE
+    return _Stage(stats, name)
+
+
+def count(name: str, value: int = 1) -> None:
+    """
+    Increment a counter, a no-op outside an instrument() block
+
+    :param name: Counter name, eg entities_scored
+    :param value: Amount to add
+    :return: None
+    """
+    stats = _active.get()
+    if stats is not None:
+        stats.counts[name] = stats.counts.get(name, 0) + value
+
+
+def merge_stats(stats: SearchStats, other: SearchStats) -> SearchStats:
+    """
+    Add the timings and counters of other to stats
+
+    :return: stats
+    """
+    for name, seconds in other.timings.items():
+        stats.timings[name] = stats.timings.get(name, 0.0) + seconds
+    for name, value in other.counts.items():
+        stats.counts[name] = stats.counts.get(name, 0) + value
+    return stats
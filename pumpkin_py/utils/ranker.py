@@ -1,7 +1,9 @@
 from enum import Enum
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 
-from ..models.result import SearchResult
+import numpy as np
+
+from ..models.result import ColumnarResult, SearchResult
 from ..utils.math_utils import binomial_coeff
 
 
@@ -12,7 +14,9 @@ class RankMethod(str, Enum):
 
 
 def rank_results(
-    search_result: SearchResult, method: Optional[RankMethod] = RankMethod.MIN
+    search_result: SearchResult,
+    method: Optional[RankMethod] = RankMethod.MIN,
+    top_k: Optional[int] = None,
 ) -> SearchResult:
     """
     Ranks results dealing with ties based on the RankMethod
@@ -35,30 +39,88 @@ def rank_results(
 
     :param search_result: SimResult
     :param method: method used to rank results, see above for examples
+    :param top_k: Only keep the top k results, see rank_scores
     :return: Sorted results list
     """
-    sorted_results = sorted(search_result.results, reverse=True, key=lambda k: k.score)
-
-    if len(sorted_results) > 0:
-        rank = 1
-        previous_score = sorted_results[0].score
-        for result in sorted_results:
-            if previous_score > result.score:
-                rank += 1
-            result.rank = rank
-            previous_score = result.score
-
-        if method != RankMethod.MIN:
-            ranks = [res.rank for res in sorted_results]
-            new_ranks = rerank_ties(ranks, method)
-            for index, result in enumerate(sorted_results):
-                result.rank = new_ranks[index]
+    results = search_result.results
+    scores = np.fromiter((result.score for result in results), dtype=np.float64, count=len(results))
+    order, ranks = rank_scores(scores, method, top_k)
+
+    sorted_results = [results[index] for index in order.tolist()]
+    for result, rank in zip(sorted_results, ranks.tolist()):
+        result.rank = rank
 
     search_result.results = sorted_results
 
     return search_result
 
 
+def rank_columns(
+    columnar_result: ColumnarResult,
+    method: Optional[RankMethod] = RankMethod.MIN,
+    top_k: Optional[int] = None,
+) -> ColumnarResult:
+    """
+    Ranks a ColumnarResult, see rank_results
+
+    :param columnar_result: ColumnarResult
+    :param method: method used to rank results
+    :param top_k: Only keep the top k results, see rank_scores
+    :return: ColumnarResult in rank order
+    """
+    order, ranks = rank_scores(columnar_result.scores, method, top_k)
+    return ColumnarResult(
+        columnar_result.ids[order],
+        columnar_result.scores[order],
+        ranks,
+        columnar_result.pruned,
+        columnar_result.stats,
+    )
+
+
+def rank_scores(
+    scores: np.ndarray, method: Optional[RankMethod] = RankMethod.MIN, top_k: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rank an array of scores, highest first, see rank_results for the methods
+
+    Tied scores keep their input order.  With top_k, the k-th best score
+    is found with argpartition and only scores at or above it are sorted,
+    so the top k have the same ranks as in a full ranking
+
+    :param scores: numpy array of scores
+    :param method: method used to rank ties
+    :param top_k: Only rank the top k scores
+    :return: indices of the ranked scores, best first, and their ranks
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    candidates = None
+    if top_k is not None and top_k < len(scores):
+        if top_k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.int64)
+        kth_score = scores[np.argpartition(-scores, top_k - 1)[top_k - 1]]
+        # Scores tied with the k-th best score are ranked so ties are complete
+        candidates = np.flatnonzero(scores >= kth_score)
+        scores = scores[candidates]
+
+    order = np.argsort(-scores, kind='stable')
+    sorted_scores = scores[order]
+
+    # Tie groups of the sorted scores and their sizes
+    is_start = np.empty(len(sorted_scores), dtype=bool)
+    is_start[:1] = True
+    np.not_equal(sorted_scores[1:], sorted_scores[:-1], out=is_start[1:])
+    group_sizes = np.diff(np.append(np.flatnonzero(is_start), len(sorted_scores)))
+    ranks = np.repeat(_get_group_ranks(group_sizes, method), group_sizes)
+
+    if candidates is not None:
+        order = candidates[order]
+    if top_k is not None:
+        order, ranks = order[:top_k], ranks[:top_k]
+
+    return order, ranks
+
+
 def average_ties(previous_rank: int, tie_count: int) -> int:
     deranked_summed = binomial_coeff(previous_rank + (tie_count)) - binomial_coeff(previous_rank)
     return round(deranked_summed / tie_count)
@@ -70,54 +132,55 @@ def rerank_ties(ranks: List[int], method: Optional[RankMethod] = RankMethod.AVG)
     by taking the average, for example, 4 classes
     tied for 1st will be given a rank of 2
 
+    :param ranks: ranks with ties given the same rank, ascending, eg [1, 1, 2, 3]
+    :param method: method used to rank ties, RankMethod.MIN returns the input ranks
     :return: List of ranks
     """
-    # list to store adjusted ranks
-    new_ranks = []
-    # Resolve ties, take the average rank
-    last_rank = 1
-    last_new_rank = 0
-    tie_count = 1
-    is_first = True
-    for rank in ranks[1:]:
-        if rank > last_rank:
-            if tie_count == 1:
-                last_new_rank += 1
-                if is_first:
-                    new_ranks.append(1)
-                    is_first = False
-                else:
-                    new_ranks.append(last_new_rank)
-            else:
-                new_rank = None
-                if method == RankMethod.AVG:
-                    new_rank = average_ties(last_new_rank, tie_count)
-                elif method == RankMethod.MAX:
-                    # could also take current index + 1
-                    new_rank = last_new_rank + tie_count
-
-                adj_ranks = [new_rank for n in range(tie_count)]
-                new_ranks.extend(adj_ranks)
-                # reset tie count
-                last_new_rank = new_rank
-                tie_count = 1
-        else:
-            tie_count += 1
-            is_first = False
-
-        last_rank = rank
-
-    if tie_count > 0:
-        new_rank = None
-        if method == RankMethod.AVG:
-            new_rank = average_ties(last_new_rank, tie_count)
-        elif method == RankMethod.MAX:
-            new_rank = last_new_rank + tie_count
-
-        adj_ranks = [new_rank for n in range(tie_count)]
-        new_ranks.extend(adj_ranks)
-    else:
-        last_new_rank += 1
-        new_ranks.append(last_new_rank)
-
-    return new_ranks
+    ranks = np.asarray(ranks)
+    if len(ranks) == 0:
+        return []
+    group_sizes = np.unique(ranks, return_counts=True)[1]
+    return np.repeat(_get_group_ranks(group_sizes, method), group_sizes).tolist()
+
+
+def _get_group_ranks(group_sizes: Sequence[int], method: Optional[RankMethod]) -> np.ndarray:
+    """
+    Rank of each group of tied scores
+
+    For RankMethod.AVG a group ranked after a previous rank r is given
+    average_ties(r, size), r + (size + 1) / 2 rounded half to even, and the
+    next group continues from that rank.  Groups of odd size add an integer,
+    groups of even size land on x.5 and round to the even neighbour, so
+    the rounding only depends on the parity of the previous rank, which is
+    tracked with a cumulative sum rather than a loop over groups
+
+    :param group_sizes: sizes of consecutive groups of tied scores
+    :param method: method used to rank ties
+    :return: numpy array of ranks, one per group
+    """
+    group_sizes = np.asarray(group_sizes, dtype=np.int64)
+    if method == RankMethod.MAX:
+        return np.cumsum(group_sizes)
+    if method != RankMethod.AVG:
+        return np.arange(1, len(group_sizes) + 1, dtype=np.int64)
+
+    if len(group_sizes) == 0:
+        return group_sizes
+
+    is_even = group_sizes % 2 == 0
+    # Exact increments of odd groups, and the rounded down increments of even groups
+    increments = np.where(is_even, group_sizes // 2, (group_sizes + 1) // 2)
+
+    # Parity of the rank before each group: an even group always ends on an
+    # even rank, after which the parity flips with each odd increment
+    odd_steps = np.where(is_even, 0, increments % 2)
+    total_steps = np.cumsum(odd_steps)
+    # Last even group before each group, -1 if there is none
+    last_even = np.maximum.accumulate(np.where(is_even, np.arange(len(group_sizes)), -1))
+    previous_even = np.concatenate(([-1], last_even[:-1]))
+    steps_at_reset = np.where(previous_even >= 0, total_steps[previous_even], 0)
+    parity = (total_steps - odd_steps - steps_at_reset) % 2
+
+    # previous rank + size / 2 + 0.5 rounds up when previous rank + size / 2 is odd
+    corrections = np.where(is_even, (parity + group_sizes // 2) % 2, 0)
+    return np.cumsum(increments + corrections)
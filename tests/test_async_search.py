@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from pumpkin_py import (
+    AsyncSearcher,
+    async_search,
+    build_ic_graph_from_closures,
+    flat_to_annotations,
+    search,
+)
+
+closures = Path(__file__).parent / 'resources' / 'mock-hpo' / 'closures.tsv'
+annotations = Path(__file__).parent / 'resources' / 'mock-hpo' / 'annotations.tsv'
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    """
+    Thread pool that counts submitted tasks and holds them until released
+    """
+
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.submitted = 0
+        self.release = threading.Event()
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+
+        def wait_and_run():
+            self.release.wait(5)
+            return fn(*args, **kwargs)
+
+        return super().submit(wait_and_run)
+
+
+@pytest.fixture
+def mock_graph():
+    with open(annotations, 'r') as annot_file:
+        annot_map = flat_to_annotations(annot_file)
+
+    with open(closures, 'r') as closure_file:
+        graph = build_ic_graph_from_closures(closure_file, "HP:0000118", annot_map)
+
+    return graph, annot_map
+
+
+def test_async_search(mock_graph):
+    graph, annot_map = mock_graph
+    profile = ['HP:I', 'HP:F', 'HP:L']
+
+    results = asyncio.run(async_search(profile, annot_map, graph, 'sim_gic'))
+
+    assert results == search(profile, annot_map, graph, 'sim_gic')
+
+
+def test_coalesced_search(mock_graph):
+    graph, annot_map = mock_graph
+    executor = CountingExecutor()
+    searcher = AsyncSearcher(graph, executor)
+
+    async def run():
+        tasks = [
+            asyncio.ensure_future(searcher.search(['HP:I', 'HP:F'], annot_map, 'phenodigm')),
+            asyncio.ensure_future(
+                searcher.search(['HP:F', 'HP:I', 'HP:F'], annot_map, 'phenodigm')
+            ),
+            asyncio.ensure_future(searcher.search(['HP:I', 'HP:F'], annot_map, 'resnik')),
+        ]
+        await asyncio.sleep(0)
+        assert len(searcher) == 2
+        executor.release.set()
+        return await asyncio.gather(*tasks)
+
+    phenodigm_a, phenodigm_b, resnik = asyncio.run(run())
+
+    assert executor.submitted == 2
+    assert len(searcher) == 0
+    assert phenodigm_a == phenodigm_b == search(['HP:I', 'HP:F'], annot_map, graph, 'phenodigm')
+    assert phenodigm_a.results is not phenodigm_b.results
+    assert resnik == search(['HP:I', 'HP:F'], annot_map, graph, 'resnik')
+
+
+def test_cancelled_search(mock_graph):
+    graph, annot_map = mock_graph
+    executor = CountingExecutor()
+    searcher = AsyncSearcher(graph, executor)
+
+    async def run():
+        # Cancelling every waiter cancels the search
+        only = asyncio.ensure_future(searcher.search(['HP:L'], annot_map, 'phenodigm'))
+        await asyncio.sleep(0)
+        only.cancel()
+        await asyncio.sleep(0)
+        assert len(searcher) == 0
+
+        first = asyncio.ensure_future(searcher.search(['HP:I'], annot_map, 'phenodigm'))
+        second = asyncio.ensure_future(searcher.search(['HP:I'], annot_map, 'phenodigm'))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        assert len(searcher) == 1
+
+        # The remaining waiter gets the result of the shared search
+        executor.release.set()
+        assert await second == search(['HP:I'], annot_map, graph, 'phenodigm')
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(run())
+    executor.shutdown()
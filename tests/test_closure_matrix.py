@@ -0,0 +1,89 @@
+from pathlib import Path
+
+import pytest
+from bidict import bidict
+
+from pumpkin_py import (
+    ClosureMatrix,
+    CompiledDataset,
+    GraphSemSim,
+    ICGraph,
+    ICSemSim,
+    build_ic_graph_from_closures,
+    flat_to_annotations,
+)
+from pumpkin_py.store.ic_store import ICStore
+
+closures = Path(__file__).parent / 'resources' / 'mock-hpo' / 'closures.tsv'
+annotations = Path(__file__).parent / 'resources' / 'mock-hpo' / 'annotations.tsv'
+
+epsilon = 1e-9
+
+
+@pytest.fixture
+def graph():
+    with open(annotations, 'r') as annot_file:
+        annot_map = flat_to_annotations(annot_file)
+
+    with open(closures, 'r') as closure_file:
+        return build_ic_graph_from_closures(closure_file, "HP:0000118", annot_map)
+
+
+@pytest.fixture
+def dataset():
+    return {
+        '1': ['HP:H', 'HP:I', 'HP:G'],
+        '2': ['HP:D', '-HP:F', 'HP:K'],
+        '3': ['HP:G', '-HP:I'],
+        '4': ['HP:L', '-HP:F', '-HP:D'],
+    }
+
+
+closure_matrix_tests = [
+    ('jaccard', GraphSemSim, 'jaccard_sim', {}),
+    ('cosine', GraphSemSim, 'cosine_sim', {'negative_weight': 0.2}),
+    ('sim_gic', ICSemSim, 'sim_gic', {}),
+    ('ic_cosine', ICSemSim, 'cosine_ic_sim', {}),
+]
+
+
+@pytest.mark.parametrize('method, semsim_class, sim_fx, kwargs', closure_matrix_tests)
+@pytest.mark.parametrize('profile', [['HP:I', 'HP:F', 'HP:L'], ['HP:D', '-HP:F'], ['HP:0000118']])
+def test_closure_matrix(graph, dataset, method, semsim_class, sim_fx, kwargs, profile):
+    closure_matrix = ClosureMatrix(CompiledDataset.compile(dataset, graph))
+    sim_fx = getattr(semsim_class(graph), sim_fx)
+
+    scores = getattr(closure_matrix, method)(profile, **kwargs)
+
+    assert len(scores) == len(dataset)
+    for score, profile_b in zip(scores, dataset.values()):
+        assert abs(score - sim_fx(profile, profile_b, **kwargs)) < epsilon
+
+
+@pytest.mark.parametrize('method, sim_fx', [('sim_gic', 'sim_gic'), ('ic_cosine', 'cosine_ic_sim')])
+def test_closure_matrix_search_graph(graph, dataset, method, sim_fx):
+    compiled = CompiledDataset.compile(dataset, graph)
+    profile = ['HP:I', 'HP:F', 'HP:L']
+
+    # Information content is taken from the search graph
+    ic_store = ICStore(graph.ic_store.ic * 2 + 1, graph.id_map)
+    other_graph = ICGraph(
+        graph.root, graph.id_map, graph.ancestors, graph.descendants, ic_store, graph.namespaces
+    )
+    scores = getattr(ClosureMatrix(compiled, other_graph), method)(profile)
+    sim_fx = getattr(ICSemSim(other_graph), sim_fx)
+    for score, profile_b in zip(scores, dataset.values()):
+        assert abs(score - sim_fx(profile, profile_b)) < epsilon
+
+    # Ids must match the dataset
+    id_map = bidict(graph.id_map)
+    other_graph = ICGraph(
+        graph.root,
+        id_map,
+        graph.ancestors,
+        graph.descendants,
+        ICStore(graph.ic_store.ic, id_map),
+        graph.namespaces,
+    )
+    with pytest.raises(ValueError):
+        ClosureMatrix(compiled, other_graph)
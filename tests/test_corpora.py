@@ -0,0 +1,178 @@
+from itertools import combinations_with_replacement
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pumpkin_py import (
+    CompiledDataset,
+    ICGraph,
+    ICModel,
+    ICSemSim,
+    build_corpus,
+    build_ic_graph_from_closures,
+    build_mica_table,
+    flat_to_annotations,
+    search,
+)
+
+resources = Path(__file__).parent / 'resources' / 'mock-hpo'
+root = "HP:0000118"
+
+with open(resources / 'annotations.tsv', 'r') as annot_file:
+    annotation_map = flat_to_annotations(annot_file)
+
+diseases = {entity: annotation_map[entity] for entity in ('1', '2')}
+genes = {'3': annotation_map['3']}
+
+
+def build_graph(annotations, corpora=None):
+    with open(resources / 'closures.tsv', 'r') as closure_file:
+        return build_ic_graph_from_closures(closure_file, root, annotations, corpora)
+
+
+@pytest.fixture
+def graph():
+    return build_graph(diseases, {'genes': genes})
+
+
+@pytest.fixture(scope='module')
+def expected():
+    return build_graph(genes)
+
+
+def assert_same_scores(graph, expected):
+    for node in expected.id_map.keys():
+        assert graph.get_ic(node) == expected.get_ic(node)
+    for pheno_a, pheno_b in combinations_with_replacement(expected.id_map.keys(), 2):
+        assert graph.get_mica_id(pheno_a, pheno_b) == expected.get_mica_id(pheno_a, pheno_b)
+        assert graph.get_mica_ic(pheno_a, pheno_b) == expected.get_mica_ic(pheno_a, pheno_b)
+
+
+def test_corpus_matches_build(graph, expected):
+    corpus_graph = graph.with_corpus('genes')
+
+    # Ids are in ascending order of disease information content
+    assert corpus_graph.ic_store.order is not None
+    assert corpus_graph.ancestors is graph.ancestors
+    assert_same_scores(corpus_graph, expected)
+
+    profile_a, profile_b = annotation_map['1'], annotation_map['2']
+    assert ICSemSim(corpus_graph).phenodigm_compare(profile_a, profile_b) == pytest.approx(
+        ICSemSim(expected).phenodigm_compare(profile_a, profile_b)
+    )
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_corpus_search(graph, expected, vectorized):
+    corpus_graph = graph.with_corpus('genes')
+    profile = annotation_map['1']
+    results = search(profile, annotation_map, corpus_graph, 'phenodigm', vectorized=vectorized)
+    expected_results = search(profile, annotation_map, expected, 'phenodigm')
+
+    for result, expected_result in zip(results.results, expected_results.results):
+        assert result.id == expected_result.id
+        assert result.score == pytest.approx(expected_result.score)
+
+
+@pytest.mark.parametrize(
+    'method, kwargs',
+    [
+        ('sim_gic', {}),
+        ('ic_cosine', {}),
+        ('phenodigm', {}),
+        ('phenodigm', {'vectorized': True}),
+        ('phenodigm', {'top_k': 2}),
+        ('symmetric_resnik', {'top_k': 2}),
+    ],
+)
+def test_corpus_search_compiled(graph, expected, method, kwargs):
+    # Compiled against the graph, searched with the information content of the corpus
+    dataset = CompiledDataset.compile(annotation_map, graph)
+    corpus_graph = graph.with_corpus('genes')
+    profile = annotation_map['1']
+    results = search(profile, dataset, corpus_graph, method, **kwargs)
+    expected_results = search(profile, annotation_map, expected, method, **kwargs)
+
+    assert len(results.results) == len(expected_results.results)
+    for result, expected_result in zip(results.results, expected_results.results):
+        assert result.score == pytest.approx(expected_result.score)
+
+    # Scores with the graph information content are unchanged
+    graph_results = search(profile, dataset, graph, method, **kwargs)
+    dict_results = search(profile, annotation_map, graph, method, **kwargs)
+    for result, expected_result in zip(graph_results.results, dict_results.results):
+        assert result.score == pytest.approx(expected_result.score)
+
+
+def test_corpus_mica_table(graph, expected):
+    corpus_graph = graph.with_corpus('genes')
+    terms = list(expected.id_map.keys())
+    mica_table = build_mica_table(corpus_graph, terms)
+    expected_table = build_mica_table(expected, terms)
+
+    for pheno_a, pheno_b in combinations_with_replacement(terms, 2):
+        mica = mica_table.get_mica(graph.id_map[pheno_a], graph.id_map[pheno_b])
+        expected_mica = expected_table.get_mica(expected.id_map[pheno_a], expected.id_map[pheno_b])
+        assert graph.id_map.inverse[mica] == expected.id_map.inverse[expected_mica]
+
+
+def test_build_corpus(graph):
+    ic_store = build_corpus(graph, genes, 'other')
+    assert graph.corpora['other'] is ic_store
+    corpus_graph = graph.with_corpus('other')
+
+    # MICAs are the most informative common ancestors of the corpus
+    for pheno_a, pheno_b in combinations_with_replacement(graph.id_map.keys(), 2):
+        common = graph.get_ancestors(pheno_a).intersection(graph.get_ancestors(pheno_b))
+        assert corpus_graph.get_mica_ic(pheno_a, pheno_b) == max(
+            ic_store.ic_map[node] for node in common
+        )
+
+
+def test_unknown_corpus(graph):
+    with pytest.raises(ValueError):
+        graph.with_corpus('mice')
+
+
+def test_corpus_snapshot(graph, expected, tmp_path):
+    graph.save(tmp_path / 'graph.pumpkin')
+    loaded = ICGraph.load(tmp_path / 'graph.pumpkin')
+
+    assert list(loaded.corpora) == ['genes']
+    assert np.array_equal(loaded.corpora['genes'].order, graph.corpora['genes'].order)
+    assert_same_scores(loaded.with_corpus('genes'), expected)
+
+    with pytest.raises(ValueError):
+        loaded.with_corpus('genes').save(tmp_path / 'corpus.pumpkin')
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_snapshot_version(graph, tmp_path, mmap):
+    graph.save(tmp_path / 'graph.pumpkin')
+    snapshot = (tmp_path / 'graph.pumpkin').read_bytes()
+    assert b'"version": 2' in snapshot
+
+    # Version 1 snapshots have no corpora, the header keeps its length
+    (tmp_path / 'v1.pumpkin').write_bytes(snapshot.replace(b'"version": 2', b'"version": 1', 1))
+    loaded = ICGraph.load(tmp_path / 'v1.pumpkin', mmap=mmap)
+    assert loaded.corpora == {}
+    assert np.array_equal(loaded.ic_store.ic, graph.ic_store.ic)
+
+    (tmp_path / 'v9.pumpkin').write_bytes(snapshot.replace(b'"version": 2', b'"version": 9', 1))
+    with pytest.raises(ValueError):
+        ICGraph.load(tmp_path / 'v9.pumpkin', mmap=mmap)
+
+
+def test_model_resort_keeps_corpora(expected):
+    annotations = {entity: annotation_map[entity] for entity in ('2', '3')}
+    graph = build_graph(annotations, {'genes': genes})
+    model = ICModel(graph, annotations)
+    corpus_graph = graph.with_corpus('genes')
+    assert model.add_annotations({'1': annotation_map['1']}) is True
+    assert_same_scores(graph.with_corpus('genes'), expected)
+
+    # Graphs from before the re-sort keep their ids and corpora
+    assert corpus_graph.id_map is not graph.id_map
+    assert corpus_graph.corpora is not graph.corpora
+    assert_same_scores(corpus_graph, expected)
@@ -0,0 +1,146 @@
+from pathlib import Path
+
+import pytest
+
+from pumpkin_py import (
+    ICSemSim,
+    build_graph_from_closure_file,
+    build_graph_from_edge_file,
+    build_graph_from_obo,
+    build_graph_from_rdflib,
+    build_ic_graph_from_closures,
+    build_ic_graph_from_edge_file,
+    build_ic_graph_from_obo,
+    flat_to_annotations,
+)
+from pumpkin_py.builder.graph_builder import get_family_from_rdflib
+
+resources = Path(__file__).parent / 'resources'
+
+equivalence_ontology = '''
+@prefix obo: <http://purl.obolibrary.org/obo/> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+obo:X_1 rdfs:subClassOf obo:X_0 .
+obo:X_2 rdfs:subClassOf obo:X_1 .
+obo:Y_2 owl:equivalentClass obo:X_2 .
+obo:Y_3 rdfs:subClassOf obo:Y_2 .
+obo:X_4 rdfs:subClassOf obo:X_0 .
+obo:Z_9 rdfs:subClassOf obo:X_4 .
+obo:Z_9 rdfs:subClassOf obo:Q_1 .
+obo:X_4 rdfs:subClassOf [ a owl:Restriction ] .
+'''
+
+
+def get_curies(graph, bitmap):
+    return {graph.id_map.inverse[node] for node in bitmap}
+
+
+def assert_same_closures(graph, expected):
+    assert set(graph.id_map.keys()) == set(expected.id_map.keys())
+    for node in expected.id_map.keys():
+        assert get_curies(graph, graph.get_ancestors(node)) == get_curies(
+            expected, expected.get_ancestors(node)
+        )
+        assert get_curies(graph, graph.get_descendants(node)) == get_curies(
+            expected, expected.get_descendants(node)
+        )
+
+
+@pytest.mark.parametrize('ontology', ['mock-hpo', 'mock-upheno1', 'mock-upheno2'])
+def test_rdflib_matches_closure_file(ontology):
+    root = "HP:0000118"
+    graph = build_graph_from_rdflib((resources / ontology / 'ontology.ttl').as_uri(), root)
+    with open(resources / ontology / 'closures.tsv', 'r') as closure_file:
+        expected = build_graph_from_closure_file(closure_file, root)
+
+    assert_same_closures(graph, expected)
+
+
+def test_rdflib_equivalent_classes(tmp_path):
+    ontology = tmp_path / 'ontology.ttl'
+    ontology.write_text(equivalence_ontology)
+    family = get_family_from_rdflib(ontology.as_uri(), 'X:0')
+
+    # Classes outside the root and anonymous classes are not in the graph
+    assert set(family.id_map.keys()) == {'X:0', 'X:1', 'X:2', 'Y:2', 'Y:3', 'X:4', 'Z:9'}
+    # Equivalent classes share their closures
+    assert family.ancestors['X:2'] == family.ancestors['Y:2'] == {'X:0', 'X:1', 'X:2', 'Y:2'}
+    assert family.descendants['X:2'] == family.descendants['Y:2'] == {'X:2', 'Y:2', 'Y:3'}
+    # Mixed subClassOf - equivalentClass - subClassOf paths
+    assert family.ancestors['Y:3'] == {'X:0', 'X:1', 'X:2', 'Y:2', 'Y:3'}
+    assert family.ancestors['Z:9'] == {'X:0', 'X:4', 'Z:9'}
+    assert family.descendants['X:0'] == set(family.id_map.keys())
+
+
+@pytest.mark.parametrize(
+    'file_name, build_fx',
+    [('edges.tsv', build_graph_from_edge_file), ('ontology.obo', build_graph_from_obo)],
+)
+def test_graph_from_edges(file_name, build_fx):
+    root = "HP:0000118"
+    with open(resources / 'mock-hpo' / file_name, 'r') as edge_file:
+        graph = build_fx(edge_file, root)
+    with open(resources / 'mock-hpo' / 'closures.tsv', 'r') as closure_file:
+        expected = build_graph_from_closure_file(closure_file, root)
+
+    assert_same_closures(graph, expected)
+
+
+@pytest.mark.parametrize(
+    'file_name, build_fx',
+    [('edges.tsv', build_ic_graph_from_edge_file), ('ontology.obo', build_ic_graph_from_obo)],
+)
+def test_ic_graph_from_edges(file_name, build_fx):
+    root = "HP:0000118"
+    with open(resources / 'mock-hpo' / 'annotations.tsv', 'r') as annot_file:
+        annot_map = flat_to_annotations(annot_file)
+    with open(resources / 'mock-hpo' / file_name, 'r') as edge_file:
+        graph = build_fx(edge_file, root, annot_map)
+    with open(resources / 'mock-hpo' / 'closures.tsv', 'r') as closure_file:
+        expected = build_ic_graph_from_closures(closure_file, root, annot_map)
+
+    assert_same_closures(graph, expected)
+    for node in expected.id_map.keys():
+        assert graph.get_ic(node) == pytest.approx(expected.get_ic(node))
+    # ids are in ascending order of information content
+    assert list(graph.ic_store.ic) == sorted(graph.ic_store.ic)
+
+    profile_a, profile_b = annot_map['1'], annot_map['2']
+    assert ICSemSim(graph).phenodigm_compare(profile_a, profile_b) == pytest.approx(
+        ICSemSim(expected).phenodigm_compare(profile_a, profile_b)
+    )
+
+
+def test_obo_equivalent_and_obsolete_terms():
+    obo = [
+        '[Term]',
+        'id: X:0',
+        '',
+        '[Term]',
+        'id: X:1',
+        'is_a: X:0 {source="mock"} ! root',
+        '',
+        '[Term]',
+        'id: Y:1',
+        'equivalent_to: X:1',
+        '',
+        '[Term]',
+        'id: Y:2',
+        'is_a: Y:1',
+        'relationship: part_of X:1',
+        '',
+        '[Term]',
+        'id: X:9',
+        'is_obsolete: true',
+        'is_a: X:1',
+        '',
+        '[Typedef]',
+        'id: part_of',
+        'is_a: X:0',
+    ]
+    graph = build_graph_from_obo(iter(line + '\n' for line in obo), 'X:0')
+
+    assert set(graph.id_map.keys()) == {'X:0', 'X:1', 'Y:1', 'Y:2'}
+    assert get_curies(graph, graph.get_ancestors('Y:2')) == {'X:0', 'X:1', 'Y:1', 'Y:2'}
+    assert get_curies(graph, graph.get_descendants('X:1')) == {'X:1', 'Y:1', 'Y:2'}
@@ -0,0 +1,151 @@
+import itertools
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pumpkin_py import (
+    ICModel,
+    ICSemSim,
+    build_ic_graph_from_closures,
+    build_ic_model_from_closures,
+    flat_to_annotations,
+)
+
+resources = Path(__file__).parent / 'resources' / 'mock-hpo'
+root = "HP:0000118"
+
+
+@pytest.fixture(scope='module')
+def annot_map():
+    with open(resources / 'annotations.tsv', 'r') as annot_file:
+        return flat_to_annotations(annot_file)
+
+
+def build_model(annotations, tolerance=0.0):
+    with open(resources / 'closures.tsv', 'r') as closure_file:
+        return build_ic_model_from_closures(closure_file, root, annotations, tolerance)
+
+
+def build_graph(annotations):
+    with open(resources / 'closures.tsv', 'r') as closure_file:
+        return build_ic_graph_from_closures(closure_file, root, annotations)
+
+
+def assert_same_graph(graph, expected):
+    assert dict(graph.id_map) == dict(expected.id_map)
+    assert np.array_equal(graph.ic_store.ic, expected.ic_store.ic)
+    for node in expected.id_map.keys():
+        assert graph.get_ancestors(node) == expected.get_ancestors(node)
+        assert graph.get_descendants(node) == expected.get_descendants(node)
+
+
+def split(annot_map, held_out):
+    kept = {entity: profile for entity, profile in annot_map.items() if entity not in held_out}
+    delta = {entity: annot_map[entity] for entity in held_out}
+    return kept, delta
+
+
+def test_model_matches_build(annot_map):
+    model = build_model(annot_map)
+    assert_same_graph(model.graph, build_graph(annot_map))
+
+
+def test_add_annotations(annot_map):
+    kept, delta = split(annot_map, list(annot_map.keys())[:2])
+    model = build_model(kept)
+    model.add_annotations(delta)
+    expected = build_graph(annot_map)
+
+    for node in expected.id_map.keys():
+        assert model.graph.get_ic(node) == expected.get_ic(node)
+    # ids are in ascending order of information content
+    assert list(model.graph.ic_store.ic) == sorted(model.graph.ic_store.ic)
+
+    profile_a, profile_b = annot_map['1'], annot_map['2']
+    assert ICSemSim(model.graph).phenodigm_compare(profile_a, profile_b) == pytest.approx(
+        ICSemSim(expected).phenodigm_compare(profile_a, profile_b)
+    )
+
+
+def test_remove_annotations(annot_map):
+    kept, delta = split(annot_map, list(annot_map.keys())[-2:])
+    model = build_model(annot_map)
+    model.remove_annotations(delta)
+    expected = build_graph(kept)
+
+    for node in expected.id_map.keys():
+        assert model.graph.get_ic(node) == expected.get_ic(node)
+    assert list(model.graph.ic_store.ic) == sorted(model.graph.ic_store.ic)
+    assert model.annotations == kept
+
+
+def test_resort_matches_build(annot_map):
+    kept, delta = split(annot_map, list(annot_map.keys())[:2])
+    model = build_model(kept)
+    assert model.add_annotations(delta) is True
+    assert_same_graph(model.graph, build_graph(annot_map))
+
+
+def test_resort_after_cached_scores(annot_map):
+    kept, delta = split(annot_map, list(annot_map.keys())[:2])
+    model = build_model(kept)
+    graph = model.graph
+    nodes = list(graph.id_map.keys())
+    semsim = ICSemSim(graph)
+    # Prime the score cache with the ids from before the re-sort
+    for pheno_a, pheno_b in itertools.product(nodes, nodes):
+        graph.get_mica_id(pheno_a, pheno_b)
+    for profile_a, profile_b in itertools.product(annot_map.values(), annot_map.values()):
+        semsim.phenodigm_compare(profile_a, profile_b)
+
+    assert model.add_annotations(delta) is True
+    expected = build_graph(annot_map)
+    expected_semsim = ICSemSim(expected)
+
+    for pheno_a, pheno_b in itertools.product(nodes, nodes):
+        assert graph.get_mica_id(pheno_a, pheno_b) == expected.get_mica_id(pheno_a, pheno_b)
+    for profile_a, profile_b in itertools.product(annot_map.values(), annot_map.values()):
+        assert semsim.phenodigm_compare(profile_a, profile_b) == pytest.approx(
+            expected_semsim.phenodigm_compare(profile_a, profile_b)
+        )
+
+
+def test_round_trip(annot_map):
+    kept, delta = split(annot_map, list(annot_map.keys())[:2])
+    model = build_model(annot_map)
+    model.remove_annotations(delta)
+    model.add_annotations(delta)
+    expected = build_graph(annot_map)
+
+    for node in expected.id_map.keys():
+        assert model.graph.get_ic(node) == expected.get_ic(node)
+
+
+def test_tolerance_skips_resort(annot_map):
+    kept, delta = split(annot_map, list(annot_map.keys())[:2])
+    model = build_model(kept, tolerance=np.inf)
+    id_map = dict(model.graph.id_map)
+
+    assert model.add_annotations(delta) is False
+    assert dict(model.graph.id_map) == id_map
+    expected = build_graph(annot_map)
+    for node in expected.id_map.keys():
+        assert model.graph.get_ic(node) == expected.get_ic(node)
+
+
+def test_duplicate_annotations_ignored(annot_map):
+    model = build_model(annot_map)
+    ic = model.graph.ic_store.ic.copy()
+    entity = next(iter(annot_map))
+    model.add_annotations({entity: annot_map[entity]})
+    assert np.array_equal(model.graph.ic_store.ic, ic)
+    model.remove_annotations({'unknown': {'HP:0000118'}})
+    assert np.array_equal(model.graph.ic_store.ic, ic)
+
+
+def test_default_smoothing_order(annot_map):
+    graph = build_graph(annot_map)
+    model = ICModel(graph, annot_map)
+    assert model.graph is graph
+    assert len(model.counts) == len(graph.id_map)
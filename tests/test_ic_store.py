@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pumpkin_py import GraphSemSim, ICSemSim, build_ic_graph_from_closures, flat_to_annotations
+from pumpkin_py.store.ic_store import ICStore
+
+closures = Path(__file__).parent / 'resources' / 'mock-hpo' / 'closures.tsv'
+annotations = Path(__file__).parent / 'resources' / 'mock-hpo' / 'annotations.tsv'
+
+epsilon = 1e-3
+
+
+@pytest.fixture
+def graph():
+    with open(annotations, 'r') as annot_file:
+        annot_map = flat_to_annotations(annot_file)
+
+    with open(closures, 'r') as closure_file:
+        return build_ic_graph_from_closures(closure_file, "HP:0000118", annot_map)
+
+
+def test_ic_map_view(graph):
+    ic_store = graph.ic_store
+    ic_map = dict(ic_store.ic_map)
+
+    assert list(ic_map.keys()) == list(range(len(graph.id_map)))
+    assert ic_map[3] == ic_store.ic[3]
+    assert ICStore(ic_map, graph.id_map).ic_map == ic_store.ic_map
+    assert -1 not in ic_store.ic_map
+    with pytest.raises(KeyError):
+        ic_store.ic_map[len(graph.id_map)]
+
+
+def test_ic_sum(graph):
+    closure = graph.get_profile_closure(['HP:I', 'HP:F'])
+    expected = sum([graph.ic_store.ic_map[node] for node in closure])
+
+    assert abs(graph.ic_store.get_ic_sum(closure) - expected) < 1e-9
+    assert abs(graph.ic_store.astype(np.float32).get_ic_sum(closure) - expected) < epsilon
+
+
+def test_float32_scores(graph):
+    profile_a, profile_b = ['HP:I', 'HP:F', 'HP:L'], ['HP:D', 'HP:K']
+    expected = ICSemSim(graph).sim_gic(profile_a, profile_b)
+
+    graph.ic_store = graph.ic_store.astype(np.float32)
+    assert graph.ic_store.ic.dtype == np.float32
+    assert abs(ICSemSim(graph).sim_gic(profile_a, profile_b) - expected) < epsilon
+
+
+def test_cosine_ic_with_negated_phenotypes(graph):
+    profile_a, profile_b = ['HP:I', '-HP:F'], ['HP:D', '-HP:F', 'HP:K']
+    expected = GraphSemSim(graph).cosine_sim(
+        profile_a, profile_b, 0.1, lambda term: graph.ic_store.ic_map[term]
+    )
+
+    assert abs(ICSemSim(graph).cosine_ic_sim(profile_a, profile_b) - expected) < 1e-9
+    assert ICSemSim(graph).cosine_ic_sim(profile_a, profile_b) > ICSemSim(graph).cosine_ic_sim(
+        profile_a, ['HP:D', 'HP:K']
+    )
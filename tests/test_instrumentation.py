@@ -0,0 +1,84 @@
+from pathlib import Path
+
+import pytest
+
+from pumpkin_py import (
+    CompiledDataset,
+    build_ic_graph_from_closures,
+    flat_to_annotations,
+    instrument,
+    search,
+)
+
+closures = Path(__file__).parent / 'resources' / 'mock-hpo' / 'closures.tsv'
+annotations = Path(__file__).parent / 'resources' / 'mock-hpo' / 'annotations.tsv'
+
+
+@pytest.fixture(scope='module')
+def mock_graph():
+    with open(annotations, 'r') as annot_file:
+        annot_map = flat_to_annotations(annot_file)
+
+    with open(closures, 'r') as closure_file:
+        graph = build_ic_graph_from_closures(closure_file, "HP:0000118", annot_map)
+
+    return graph, annot_map
+
+
+def test_search_not_instrumented(mock_graph):
+    graph, annot_map = mock_graph
+    search_result = search(['HP:I', 'HP:F'], annot_map, graph, 'phenodigm')
+
+    assert search_result.stats is None
+
+
+@pytest.mark.parametrize(
+    'method, kwargs, stages',
+    [
+        ('phenodigm', {}, {'search', 'score', 'rank'}),
+        ('phenodigm', {'vectorized': True}, {'search', 'score', 'encode', 'score_matrix', 'rank'}),
+        ('phenodigm', {'top_k': 2}, {'search', 'bounds', 'score', 'rank'}),
+        ('phenodigm', {'min_ic': 0}, {'search', 'candidates', 'score', 'rank'}),
+        ('jaccard', {}, {'search', 'score', 'rank'}),
+        ('jaccard', {'compiled': True}, {'search', 'closure_matrix', 'score', 'rank'}),
+    ],
+)
+def test_search_stats(mock_graph, method, kwargs, stages):
+    graph, annot_map = mock_graph
+    graph.score_cache.clear()
+    kwargs = dict(kwargs)
+    if kwargs.pop('compiled', False):
+        annot_map = CompiledDataset.compile(annot_map, graph)
+    with instrument() as stats:
+        search_result = search(['HP:I', 'HP:F'], annot_map, graph, method, **kwargs)
+
+    assert search_result.stats == stats
+    assert set(stats.timings) == stages
+    assert all(seconds >= 0 for seconds in stats.timings.values())
+    assert stats.timings['search'] >= stats.timings['score']
+    assert stats.counts['entities_scored'] + stats.counts['entities_pruned'] <= len(annot_map)
+    if method == 'phenodigm':
+        assert stats.counts['pairwise_scores'] > 0
+    if method == 'phenodigm' and not kwargs:
+        # Every pairwise score goes through the score cache, geometric
+        # scores also look up their MICA
+        assert stats.counts['cache_misses'] > 0
+        assert stats.counts['cache_hits'] + stats.counts['cache_misses'] >= (
+            stats.counts['pairwise_scores']
+        )
+
+
+def test_instrument_sink(mock_graph):
+    graph, annot_map = mock_graph
+    sink = []
+    with instrument(sink=sink.append) as stats:
+        first = search(['HP:I'], annot_map, graph, 'jaccard')
+        second = search(['HP:F'], annot_map, graph, 'jaccard')
+
+    assert sink == [stats]
+    # Searches in a block add up
+    assert stats.counts['entities_scored'] == len(annot_map) * 2
+    assert first.stats.counts['entities_scored'] == len(annot_map)
+    assert stats.timings['search'] == pytest.approx(
+        first.stats.timings['search'] + second.stats.timings['search']
+    )
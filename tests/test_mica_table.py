@@ -0,0 +1,69 @@
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from pumpkin_py import (
+    MicaTable,
+    build_ic_graph_from_closures,
+    build_mica_table,
+    flat_to_annotations,
+    search,
+)
+
+closures = Path(__file__).parent / 'resources' / 'mock-hpo' / 'closures.tsv'
+annotations = Path(__file__).parent / 'resources' / 'mock-hpo' / 'annotations.tsv'
+
+
+@pytest.fixture
+def mock_graph():
+    with open(annotations, 'r') as annot_file:
+        annot_map = flat_to_annotations(annot_file)
+
+    with open(closures, 'r') as closure_file:
+        graph = build_ic_graph_from_closures(closure_file, "HP:0000118", annot_map)
+
+    return graph, annot_map
+
+
+@pytest.mark.parametrize('ns_filter', [None, 'HP'])
+def test_mica_table(mock_graph, ns_filter):
+    graph, _ = mock_graph
+    terms = list(graph.id_map.keys())
+    mica_table = build_mica_table(graph, terms, ns_filter)
+
+    assert len(mica_table) == len(terms)
+    for pheno_a in terms:
+        for pheno_b in terms:
+            expected = graph._compute_int_encoded_mica(pheno_a, pheno_b, ns_filter)
+            mica = mica_table.get_mica(graph.id_map[pheno_a], graph.id_map[pheno_b])
+            assert mica == expected
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_mica_table_round_trip(mock_graph, mmap):
+    graph, annot_map = mock_graph
+    terms = {pheno for profile in annot_map.values() for pheno in profile}
+    mica_table = build_mica_table(graph, terms)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / 'micas.npy'
+        mica_table.save(path)
+        loaded = MicaTable.load(path, len(graph.id_map), mmap=mmap)
+
+        assert loaded.ids.tolist() == mica_table.ids.tolist()
+        assert loaded.micas.tolist() == mica_table.micas.tolist()
+        del loaded
+
+
+@pytest.mark.parametrize('method, kwargs', [('phenodigm', {}), ('resnik', {'vectorized': True})])
+def test_search_with_mica_table(mock_graph, method, kwargs):
+    graph, annot_map = mock_graph
+    profile = ['HP:I', 'HP:F', 'HP:L']
+    expected = search(profile, annot_map, graph, method, **kwargs)
+
+    terms = {pheno for profile in annot_map.values() for pheno in profile}
+    graph.ic_store.add_mica_table(build_mica_table(graph, terms.union(profile)))
+    graph.score_cache.clear()
+
+    assert search(profile, annot_map, graph, method, **kwargs) == expected
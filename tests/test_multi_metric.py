@@ -0,0 +1,148 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pumpkin_py import (
+    CompiledDataset,
+    ICSemSim,
+    MatrixMetric,
+    MatrixScore,
+    PairwiseSim,
+    SemanticDist,
+    build_ic_graph_from_closures,
+    flat_to_annotations,
+    instrument,
+    search,
+    search_metrics,
+)
+from pumpkin_py.models.namespace import Namespace
+from pumpkin_py.sim.semantic_dist import PairwiseDist
+
+resources = Path(__file__).parent / 'resources' / 'mock-hpo'
+root = "HP:0000118"
+
+with open(resources / 'annotations.tsv', 'r') as annot_file:
+    annotation_map = flat_to_annotations(annot_file)
+
+profile = annotation_map['1']
+
+
+@pytest.fixture(scope='module')
+def graph():
+    with open(resources / 'closures.tsv', 'r') as closure_file:
+        return build_ic_graph_from_closures(closure_file, root, annotation_map)
+
+
+def get_expected(graph, profile_a, profile_b, ns_filter=None, sim_measure=PairwiseSim.GEOMETRIC):
+    semsim = ICSemSim(graph)
+    semantic_dist = SemanticDist(graph)
+    expected = {
+        MatrixScore.phenodigm: semsim.phenodigm_compare(
+            profile_a, profile_b, ns_filter, sim_measure=sim_measure
+        ),
+        MatrixScore.symmetric_phenodigm: semsim.phenodigm_compare(
+            profile_a, profile_b, ns_filter, is_symmetric=True, sim_measure=sim_measure
+        ),
+        MatrixScore.euclidean: semantic_dist.euclidean_matrix(profile_a, profile_b),
+        MatrixScore.jin_conrath: semantic_dist.euclidean_matrix(
+            profile_a, profile_b, PairwiseDist.JIN_CONRATH
+        ),
+    }
+    for matrix_metric, suffix in [
+        (MatrixMetric.BMA, ''),
+        (MatrixMetric.MAX, '_max'),
+        (MatrixMetric.AVG, '_avg'),
+    ]:
+        for prefix, is_symmetric, is_normalized in [
+            ('', False, False),
+            ('symmetric_', True, False),
+            ('normalized_', False, True),
+            ('symmetric_normalized_', True, True),
+        ]:
+            expected[MatrixScore(f'{prefix}resnik{suffix}')] = semsim.resnik_sim(
+                profile_a, profile_b, matrix_metric, is_symmetric, is_normalized
+            )
+    return expected
+
+
+@pytest.mark.parametrize(
+    'ns_filter, sim_measure',
+    [(None, PairwiseSim.GEOMETRIC), (None, PairwiseSim.IC), (Namespace.HP, PairwiseSim.GEOMETRIC)],
+)
+def test_score_metrics(graph, ns_filter, sim_measure):
+    metrics = list(MatrixScore)
+    for entity, profile_b in annotation_map.items():
+        expected = get_expected(graph, profile, profile_b, ns_filter, sim_measure)
+        scores = ICSemSim(graph).score_metrics(profile, profile_b, metrics, ns_filter, sim_measure)
+        np.testing.assert_allclose(scores, [expected[metric] for metric in metrics])
+
+
+def test_metrics_share_matrices(graph):
+    semsim = ICSemSim(graph)
+    query_size = len(profile) * len(annotation_map['2'])
+
+    # The score matrix of profile b against profile a is the transpose
+    # of the matrix of profile a against profile b
+    with instrument() as stats:
+        semsim.phenodigm_compare(profile, annotation_map['2'], is_symmetric=True)
+    assert stats.counts['pairwise_scores'] == query_size
+
+    # One geometric matrix for phenodigm, one IC matrix for resnik and distances
+    with instrument() as stats:
+        semsim.score_metrics(profile, annotation_map['2'], list(MatrixScore))
+    assert stats.counts['pairwise_scores'] == 2 * query_size
+
+
+@pytest.mark.parametrize('compiled', [False, True])
+def test_search_metrics(graph, compiled):
+    dataset = CompiledDataset.compile(annotation_map, graph) if compiled else annotation_map
+    metrics = [MatrixScore.phenodigm, 'symmetric_resnik', MatrixScore.jin_conrath]
+    metric_result = search_metrics(profile, dataset, graph, metrics)
+
+    assert len(metric_result) == len(annotation_map)
+    assert metric_result.ids == list(annotation_map.keys())
+    assert metric_result.scores.shape == (len(annotation_map), 3)
+
+    for method in ('phenodigm', 'symmetric_resnik'):
+        expected = {
+            match.id: match.score
+            for match in search(profile, annotation_map, graph, method).results
+        }
+        scores = metric_result.get_scores(method)
+        np.testing.assert_allclose(scores, [expected[entity] for entity in metric_result.ids])
+
+    columnar = metric_result.to_columnar(MatrixScore.jin_conrath)
+    assert list(columnar.ids) == metric_result.ids
+    assert columnar.scores.tolist() == metric_result.scores[:, 2].tolist()
+
+    dicts = metric_result.to_dicts()
+    assert set(dicts[0]) == {'id', 'phenodigm', 'symmetric_resnik', 'jin_conrath'}
+    assert dicts[0]['phenodigm'] == metric_result.scores[0, 0]
+
+    with pytest.raises(ValueError):
+        metric_result.get_scores(MatrixScore.euclidean)
+    with pytest.raises(ValueError):
+        search_metrics(profile, dataset, graph, ['sim_gic'])
+
+
+@pytest.mark.parametrize('compiled', [False, True])
+@pytest.mark.parametrize(
+    'ns_filter, sim_measure',
+    [(None, PairwiseSim.GEOMETRIC), (None, PairwiseSim.IC), (Namespace.HP, PairwiseSim.GEOMETRIC)],
+)
+def test_search_metrics_matches_pairwise(graph, compiled, ns_filter, sim_measure):
+    dataset = CompiledDataset.compile(annotation_map, graph) if compiled else annotation_map
+    metrics = list(MatrixScore)
+    metric_result = search_metrics(profile, dataset, graph, metrics, ns_filter, sim_measure)
+
+    for entity, scores in zip(metric_result.ids, metric_result.scores):
+        expected = get_expected(graph, profile, annotation_map[entity], ns_filter, sim_measure)
+        np.testing.assert_allclose(scores, [expected[metric] for metric in metrics])
+
+
+def test_search_metrics_stats(graph):
+    with instrument():
+        metric_result = search_metrics(profile, annotation_map, graph, [MatrixScore.resnik])
+    assert metric_result.stats.counts['entities_scored'] == len(annotation_map)
+    assert 'score' in metric_result.stats.timings
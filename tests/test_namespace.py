@@ -0,0 +1,119 @@
+from io import StringIO
+from itertools import product
+
+import pytest
+
+from pumpkin_py import ICGraph, VectorSemSim, build_ic_graph_from_edge_file
+from pumpkin_py.models.namespace import Namespace
+
+# Cross species classes under an UPHENO root, UPHENO classes are in every namespace
+edges = '''
+HP:1\tUPHENO:0
+MP:1\tUPHENO:0
+HP:2\tHP:1
+HP:2\tMP:1
+MP:2\tMP:1
+MP:3\tHP:1
+MP:3\tMP:2
+HP:4\tHP:2
+HP:4\tMP:3
+'''
+
+annotations = {
+    '1': {'HP:2', 'HP:4'},
+    '2': {'MP:2', 'MP:3'},
+    '3': {'HP:1', 'MP:3'},
+}
+
+
+@pytest.fixture
+def graph():
+    return build_ic_graph_from_edge_file(StringIO(edges.strip()), 'UPHENO:0', annotations)
+
+
+def get_expected_mica(graph, pheno_a, pheno_b, ns_filter):
+    common_ancestors = (
+        graph.get_ancestors(pheno_a)
+        .intersection(graph.get_ancestors(pheno_b))
+        .intersection(graph.namespaces[ns_filter])
+    )
+    return common_ancestors.max()
+
+
+@pytest.mark.parametrize('ns_filter', [Namespace.HP, Namespace.MP, 'MP'])
+def test_namespace_mica(graph, ns_filter):
+    for pheno_a, pheno_b in product(graph.id_map.keys(), repeat=2):
+        assert graph._compute_int_encoded_mica(pheno_a, pheno_b, ns_filter) == get_expected_mica(
+            graph, pheno_a, pheno_b, ns_filter
+        )
+
+
+def test_namespace_ancestors(graph):
+    for node in graph.id_map.keys():
+        assert graph.get_namespace_ancestors(node, Namespace.MP) == graph.get_ancestors(
+            node
+        ).intersection(graph.namespaces[Namespace.MP])
+    assert graph.get_namespace_ancestors('HP:4', 'MP') is graph.get_namespace_ancestors(
+        'HP:4', Namespace.MP
+    )
+    assert {graph.id_map.inverse[node] for node in graph.get_namespace_ancestors('HP:2', 'MP')} == {
+        'UPHENO:0',
+        'MP:1',
+    }
+
+    # Unknown classes have no ancestors and are not cached
+    assert len(graph.get_namespace_ancestors('HP:9', 'MP')) == 0
+    assert 'HP:9' not in graph._namespace_ancestors['MP']
+    assert graph._compute_int_encoded_mica('HP:9', 'HP:2', 'MP') == 0
+
+
+def test_project_namespace(graph):
+    graph.project_namespace(Namespace.HP)
+    assert set(graph._namespace_ancestors[Namespace.HP]) == set(graph.ancestors)
+    for node in graph.id_map.keys():
+        assert graph.get_namespace_ancestors(node, 'HP') == graph.get_ancestors(node).intersection(
+            graph.namespaces[Namespace.HP]
+        )
+
+
+def test_namespace_mica_vector(graph):
+    terms = list(graph.id_map.keys())
+    vector_semsim = VectorSemSim(graph, terms)
+    for pheno in terms:
+        mica = vector_semsim.get_mica_vector(pheno, 'MP')
+        assert mica.tolist() == [
+            get_expected_mica(graph, pheno, term, 'MP') for term in vector_semsim.terms
+        ]
+
+
+def test_prefix_namespaces(graph):
+    hp = {node for curie, node in graph.id_map.items() if curie.startswith('HP:')}
+    upheno = {graph.id_map['UPHENO:0']}
+
+    # Every prefix is a namespace, Namespace members include UPHENO classes
+    assert set(graph.namespaces['UPHENO']) == upheno
+    assert set(graph.namespaces[Namespace.HP]) == hp | upheno
+    assert set(graph.namespaces['ZP']) == upheno
+    assert isinstance(next(key for key in graph.namespaces if key == 'HP'), Namespace)
+
+
+def test_custom_namespace_prefixes(tmp_path):
+    namespace_prefixes = {'human': ['HP'], 'MP': ['MP'], 'MONDO': []}
+    graph = build_ic_graph_from_edge_file(
+        StringIO(edges.strip()), 'UPHENO:0', annotations, namespace_prefixes=namespace_prefixes
+    )
+
+    assert set(graph.namespaces) == {'human', 'MP', 'HP', 'UPHENO', 'MONDO'}
+    assert graph.namespaces['human'] == graph.namespaces['HP']
+    assert {graph.id_map.inverse[node] for node in graph.namespaces['MP']} == {
+        'MP:1',
+        'MP:2',
+        'MP:3',
+    }
+    assert len(graph.namespaces['MONDO']) == 0
+    assert graph.get_mica_id('HP:4', 'MP:3', 'MP') == 'MP:3'
+    assert graph.get_mica_id('HP:4', 'HP:2', 'human') == 'HP:2'
+
+    graph.save(tmp_path / 'graph.pumpkin')
+    loaded = ICGraph.load(tmp_path / 'graph.pumpkin')
+    assert dict(loaded.namespaces) == dict(graph.namespaces)
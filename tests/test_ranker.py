@@ -1,6 +1,9 @@
+import numpy as np
 import pytest
 
-from pumpkin_py import RankMethod, rerank_ties
+from pumpkin_py import RankMethod, rank_scores, rerank_ties
+from pumpkin_py.models.result import SearchResult, SimMatch
+from pumpkin_py.utils.ranker import rank_results
 
 avg_rank_data = [
     (
@@ -53,3 +56,64 @@ def test_reranking_by_max(input_ranks, expected_ranks):
     """
     rankings = rerank_ties(input_ranks, RankMethod.MAX)
     assert expected_ranks == rankings
+
+
+def test_reranking_by_min():
+    input_ranks = [1, 1, 1, 1, 1, 2, 3, 4, 5, 6, 6, 6, 7, 8]
+    assert rerank_ties(input_ranks, RankMethod.MIN) == input_ranks
+
+
+# Scores, expected order and ranks for each method
+rank_score_data = [
+    (
+        [0.5, 0.9, 0.5, 0.1, 0.9, 0.9, 0.5, 0.5],
+        [1, 4, 5, 0, 2, 6, 7, 3],
+        {
+            RankMethod.MIN: [1, 1, 1, 2, 2, 2, 2, 3],
+            RankMethod.AVG: [2, 2, 2, 4, 4, 4, 4, 5],
+            RankMethod.MAX: [3, 3, 3, 7, 7, 7, 7, 8],
+        },
+    ),
+    (
+        [3, 1, 2, 2],
+        [0, 2, 3, 1],
+        {
+            RankMethod.MIN: [1, 2, 2, 3],
+            RankMethod.AVG: [1, 2, 2, 3],
+            RankMethod.MAX: [1, 3, 3, 4],
+        },
+    ),
+    ([], [], {RankMethod.MIN: [], RankMethod.AVG: [], RankMethod.MAX: []}),
+]
+
+
+@pytest.mark.parametrize("scores, expected_order, expected_ranks", rank_score_data)
+@pytest.mark.parametrize("method", list(RankMethod))
+def test_rank_scores(scores, expected_order, expected_ranks, method):
+    order, ranks = rank_scores(np.array(scores, dtype=np.float64), method)
+    assert order.tolist() == expected_order
+    assert ranks.tolist() == expected_ranks[method]
+
+
+@pytest.mark.parametrize("method", list(RankMethod))
+@pytest.mark.parametrize("top_k", [0, 1, 2, 5, 10, 20])
+def test_rank_scores_top_k(method, top_k):
+    scores = np.round(np.random.default_rng(7).random(15), 1)
+    order, ranks = rank_scores(scores, method)
+    top_order, top_ranks = rank_scores(scores, method, top_k=top_k)
+
+    assert top_order.tolist() == order[:top_k].tolist()
+    assert top_ranks.tolist() == ranks[:top_k].tolist()
+
+
+@pytest.mark.parametrize("method", list(RankMethod))
+def test_rank_results(method):
+    scores = [0.5, 0.9, 0.5, 0.1, 0.9, 0.9, 0.5, 0.5]
+    search_result = SearchResult(
+        results=[SimMatch(id=str(index), rank=0, score=score) for index, score in enumerate(scores)]
+    )
+    ranked = rank_results(search_result, method)
+    order, ranks = rank_scores(np.array(scores), method)
+
+    assert [match.id for match in ranked.results] == [str(index) for index in order]
+    assert [match.rank for match in ranked.results] == ranks.tolist()
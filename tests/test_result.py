@@ -0,0 +1,111 @@
+import io
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pumpkin_py import (
+    ColumnarResult,
+    build_ic_graph_from_closures,
+    flat_to_annotations,
+    search,
+    search_many,
+)
+from pumpkin_py.models.result import SearchResult, SimMatch
+
+closures = Path(__file__).parent / 'resources' / 'mock-hpo' / 'closures.tsv'
+annotations = Path(__file__).parent / 'resources' / 'mock-hpo' / 'annotations.tsv'
+
+
+@pytest.fixture(scope='module')
+def mock_graph():
+    with open(annotations, 'r') as annot_file:
+        annot_map = flat_to_annotations(annot_file)
+
+    with open(closures, 'r') as closure_file:
+        graph = build_ic_graph_from_closures(closure_file, "HP:0000118", annot_map)
+
+    return graph, annot_map
+
+
+@pytest.fixture
+def columnar_result():
+    return ColumnarResult(['a', 'b', 'c', 'd', 'e'], [0.9, 0.7, 0.7, 0.2, 0.1], [1, 3, 3, 4, 5])
+
+
+def test_columnar_result(columnar_result):
+    assert len(columnar_result) == 5
+    assert columnar_result[0] == SimMatch(id='a', rank=1, score=0.9)
+    assert columnar_result[-1] == SimMatch(id='e', rank=5, score=0.1)
+    assert list(columnar_result) == columnar_result.results
+    assert [match.id for match in columnar_result] == ['a', 'b', 'c', 'd', 'e']
+
+    sliced = columnar_result[1:3]
+    assert isinstance(sliced, ColumnarResult)
+    assert sliced.results == [SimMatch('b', 3, 0.7), SimMatch('c', 3, 0.7)]
+
+    assert [match.id for match in columnar_result.page(0, 2)] == ['a', 'b']
+    assert [match.id for match in columnar_result.page(2, 2)] == ['e']
+    assert len(columnar_result.page(3, 2)) == 0
+
+
+def test_columnar_result_conversion(columnar_result):
+    search_result = columnar_result.to_search_result()
+    assert isinstance(search_result, SearchResult)
+    assert search_result.results == columnar_result.results
+
+    round_trip = ColumnarResult.from_search_result(search_result)
+    assert round_trip.results == columnar_result.results
+
+    with pytest.raises(ValueError):
+        ColumnarResult(['a', 'b'], [0.1])
+
+
+def test_columnar_result_export(columnar_result, tmp_path):
+    output = io.StringIO()
+    columnar_result.to_jsonl(output)
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert lines == columnar_result.to_dicts()
+    assert lines[1] == {'id': 'b', 'rank': 3, 'score': 0.7}
+
+    path = tmp_path / 'results.npz'
+    columnar_result.save(path)
+    loaded = ColumnarResult.load(path)
+    assert loaded.results == columnar_result.results
+    assert loaded.pruned == columnar_result.pruned
+
+    with np.load(path) as data:
+        assert data['ids'].dtype.kind == 'U'
+
+
+@pytest.mark.parametrize(
+    'method, kwargs',
+    [
+        ('phenodigm', {}),
+        ('phenodigm', {'top_k': 3}),
+        ('phenodigm', {'min_ic': 0}),
+        ('jaccard', {}),
+        ('sim_gic', {'workers': 2}),
+    ],
+)
+def test_columnar_search(mock_graph, method, kwargs):
+    graph, annot_map = mock_graph
+    profile = ['HP:I', 'HP:F', 'HP:L']
+
+    expected = search(profile, annot_map, graph, method, **kwargs)
+    columnar = search(profile, annot_map, graph, method, columnar=True, **kwargs)
+
+    assert isinstance(columnar, ColumnarResult)
+    assert columnar.results == expected.results
+    assert columnar.pruned == expected.pruned
+
+
+def test_columnar_search_many(mock_graph):
+    graph, annot_map = mock_graph
+    profiles = [['HP:I', 'HP:F'], ['HP:L']]
+
+    expected = list(search_many(profiles, annot_map, graph, 'jaccard'))
+    columnar = list(search_many(profiles, annot_map, graph, 'jaccard', columnar=True))
+
+    assert [result.results for result in columnar] == [result.results for result in expected]
@@ -0,0 +1,104 @@
+from pathlib import Path
+
+import pytest
+
+from pumpkin_py import ICSemSim, build_ic_graph_from_closures, flat_to_annotations
+from pumpkin_py.store.score_cache import ScoreCache
+
+closures = Path(__file__).parent / 'resources' / 'mock-hpo' / 'closures.tsv'
+annotations = Path(__file__).parent / 'resources' / 'mock-hpo' / 'annotations.tsv'
+
+
+@pytest.fixture
+def graph():
+    with open(annotations, 'r') as annot_file:
+        annot_map = flat_to_annotations(annot_file)
+
+    with open(closures, 'r') as closure_file:
+        return build_ic_graph_from_closures(closure_file, "HP:0000118", annot_map)
+
+
+def test_score_cache_stats(graph):
+    graph.get_mica_ic('HP:I', 'HP:F')
+    graph.get_mica_ic('HP:I', 'HP:F')
+
+    # Symmetric measures share one entry for both orders
+    graph.get_mica_ic('HP:F', 'HP:I')
+
+    stats = graph.score_cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (2, 1, 1)
+    assert 0 < stats.memory <= stats.max_bytes
+
+    # Unknown curies are scored without the cache
+    graph.get_mica_ic('HP:I', 'HP:9999999')
+    assert graph.score_cache.stats()[:4] == stats[:4]
+
+
+def test_score_cache_per_graph(graph):
+    with open(annotations, 'r') as annot_file:
+        annot_map = flat_to_annotations(annot_file)
+    with open(closures, 'r') as closure_file:
+        other_graph = build_ic_graph_from_closures(closure_file, "HP:0000118", annot_map)
+
+    ICSemSim(graph).phenodigm_compare(['HP:I', 'HP:F'], ['HP:L'])
+
+    assert len(graph.score_cache) > 0
+    assert len(other_graph.score_cache) == 0
+
+
+def test_score_cache_budget():
+    score_cache = ScoreCache(max_bytes=2048)
+    cached_fx = score_cache.get_cached_fx('product', lambda id_a, id_b: float(id_a * id_b))
+    for num in range(200):
+        assert cached_fx(num, [num + 1]) == [num * (num + 1)]
+
+    stats = score_cache.stats()
+    assert 0 < stats.entries < 200
+    assert stats.evictions == 200 - stats.entries
+    assert stats.memory <= stats.max_bytes
+
+    # The oldest pairs were evicted, the latest is cached
+    assert cached_fx(199, [200]) == [199 * 200]
+    assert score_cache.stats().hits == 1
+
+    score_cache.clear()
+    assert score_cache.stats()[:4] == (0, 0, 0, 0)
+    cached_fx = score_cache.get_cached_fx('product', lambda id_a, id_b: float(id_a * id_b))
+    assert cached_fx(3, [4, 5]) == [12, 15]
+    assert len(score_cache) == 2
+
+
+def test_score_cache_clear_functions():
+    score_cache = ScoreCache()
+    sum_fx = score_cache.get_cached_fx('score', lambda id_a, id_b: id_a + id_b)
+    assert sum_fx(2, [3]) == [5]
+
+    # Functions bound to the old state are dropped with the scores
+    score_cache.clear()
+    product_fx = score_cache.get_cached_fx('score', lambda id_a, id_b: id_a * id_b)
+    assert product_fx is not sum_fx
+    assert product_fx(2, [3]) == [6]
+    assert score_cache.stats()[:4] == (0, 1, 0, 1)
+
+
+def test_score_cache_measures():
+    score_cache = ScoreCache()
+    difference_fx = score_cache.get_cached_fx(
+        'difference', lambda id_a, id_b: id_a - id_b, is_symmetric=False
+    )
+    assert difference_fx(5, [2]) + difference_fx(2, [5]) == [3, -3]
+    assert len(score_cache) == 2
+
+    # Adding a measure keeps the scores, and functions, of existing measures
+    sum_fx = score_cache.get_cached_fx('sum', lambda id_a, id_b: id_a + id_b)
+    assert sum_fx(5, [2, 5]) + sum_fx(2, [5]) == [7, 10, 7]
+    assert score_cache.get_cached_fx('difference', None) is difference_fx
+    assert len(score_cache) == 4
+    assert score_cache.stats()[:3] == (1, 4, 0)
+
+
+def test_score_cache_disabled():
+    score_cache = ScoreCache(max_bytes=0)
+    cached_fx = score_cache.get_cached_fx('sum', lambda id_a, id_b: id_a + id_b)
+    assert cached_fx(1, [2, 3]) == [3, 4]
+    assert len(score_cache) == 0
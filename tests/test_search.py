@@ -1,11 +1,29 @@
 import gzip
+import pickle
 from pathlib import Path
 
-from pumpkin_py import build_ic_graph_from_closures, flat_to_annotations, search
+import numpy as np
+import pytest
+
+from pumpkin_py import (
+    CompiledDataset,
+    ICSemSim,
+    MatrixMetric,
+    PairwiseSim,
+    SearchPool,
+    build_ic_graph_from_closures,
+    flat_to_annotations,
+    search,
+    search_many,
+)
+from pumpkin_py.sim.search import _get_candidates, _get_vector_sim
+from pumpkin_py.sim.upper_bound import ScoreBound
 
 closures = Path(__file__).parents[1] / 'data' / 'hpo' / 'hp-closures.tsv.gz'
 annotations = Path(__file__).parents[1] / 'data' / 'hpo' / 'phenotype-annotations.tsv.gz'
 
+epsilon = 1e-9
+
 
 def test_search():
     root = "HP:0000118"
@@ -27,3 +45,302 @@ def test_search():
     assert search_results.results[0].id == 'ORPHA:94125'
     assert search_results.results[0].score > 50
     assert search_results.results[0].rank == 1
+
+
+mock_closures = Path(__file__).parent / 'resources' / 'mock-hpo' / 'closures.tsv'
+mock_annotations = Path(__file__).parent / 'resources' / 'mock-hpo' / 'annotations.tsv'
+
+vector_search_tests = [
+    ('phenodigm', {}),
+    ('phenodigm', {'sim_measure': PairwiseSim.IC}),
+    ('phenodigm', {'ns_filter': 'HP'}),
+    ('symmetric_phenodigm', {}),
+    ('symmetric_phenodigm', {'ns_filter': 'HP'}),
+    ('resnik', {}),
+    ('resnik', {'matrix_metric': MatrixMetric.MAX, 'is_normalized': True}),
+    ('resnik', {'matrix_metric': MatrixMetric.AVG, 'is_symmetric': True}),
+    ('symmetric_resnik', {}),
+]
+
+
+@pytest.fixture(scope='module')
+def mock_graph():
+    with open(mock_annotations, 'r') as annot_file:
+        annot_map = flat_to_annotations(annot_file)
+
+    with open(mock_closures, 'r') as closure_file:
+        graph = build_ic_graph_from_closures(closure_file, "HP:0000118", annot_map)
+
+    return graph, annot_map
+
+
+@pytest.mark.parametrize('method, kwargs', vector_search_tests)
+def test_vectorized_search(mock_graph, method, kwargs):
+    graph, annot_map = mock_graph
+    profile = ['HP:I', 'HP:F', 'HP:L']
+
+    expected = search(profile, annot_map, graph, method, **kwargs)
+    results = search(profile, annot_map, graph, method, vectorized=True, **kwargs)
+
+    assert [match.id for match in results.results] == [match.id for match in expected.results]
+    for match, expected_match in zip(results.results, expected.results):
+        assert match.rank == expected_match.rank
+        assert abs(match.score - expected_match.score) < epsilon
+
+
+@pytest.mark.parametrize('method', ['phenodigm', 'resnik', 'sim_gic', 'jaccard'])
+def test_parallel_search(mock_graph, method):
+    graph, annot_map = mock_graph
+    profile = ['HP:I', 'HP:F', 'HP:L']
+
+    expected = search(profile, annot_map, graph, method)
+    results = search(profile, annot_map, graph, method, workers=2)
+
+    assert results == expected
+
+
+def test_search_pool(mock_graph):
+    graph, annot_map = mock_graph
+    dataset = CompiledDataset.compile(annot_map, graph)
+    profiles = [['HP:I', 'HP:F', 'HP:L'], ['HP:D', 'HP:K']]
+
+    with SearchPool(graph, workers=2) as pool:
+        for profile, method in zip(profiles, ['phenodigm', 'jaccard']):
+            expected = search(profile, annot_map, graph, method)
+            assert search(profile, annot_map, graph, method, executor=pool) == expected
+            assert search(profile, dataset, graph, method, executor=pool) == expected
+
+        # The workers hold the graph the pool was created with
+        with pytest.raises(ValueError):
+            search(
+                profiles[0],
+                annot_map,
+                pickle.loads(pickle.dumps(graph)),
+                'phenodigm',
+                executor=pool,
+            )
+
+
+top_k_search_tests = [
+    ('phenodigm', {}),
+    ('phenodigm', {'sim_measure': PairwiseSim.IC, 'ns_filter': 'HP'}),
+    ('phenodigm', {'vectorized': True}),
+    ('resnik', {}),
+    ('resnik', {'matrix_metric': MatrixMetric.AVG, 'is_normalized': True}),
+    ('resnik', {'is_symmetric': True}),
+    ('symmetric_resnik', {}),
+    ('symmetric_phenodigm', {}),
+    ('symmetric_phenodigm', {'sim_measure': PairwiseSim.IC, 'ns_filter': 'HP'}),
+    ('phenodigm', {'is_symmetric': True, 'vectorized': True}),
+    ('sim_gic', {}),
+]
+
+
+@pytest.mark.parametrize('method, kwargs', top_k_search_tests)
+@pytest.mark.parametrize('top_k', [1, 2])
+@pytest.mark.parametrize('compiled', [False, True])
+def test_top_k_search(mock_graph, method, kwargs, top_k, compiled):
+    graph, annot_map = mock_graph
+    profile = ['HP:I', 'HP:F']
+    dataset = CompiledDataset.compile(annot_map, graph) if compiled else annot_map
+
+    expected = search(profile, annot_map, graph, method, **kwargs)
+    results = search(profile, dataset, graph, method, top_k=top_k, **kwargs)
+
+    assert [match.id for match in results.results] == [
+        match.id for match in expected.results[:top_k]
+    ]
+    for match, expected_match in zip(results.results, expected.results):
+        assert match.rank == expected_match.rank
+        assert abs(match.score - expected_match.score) < epsilon
+    assert 0 <= results.pruned < len(annot_map)
+
+
+@pytest.mark.parametrize(
+    'bound_method, kwargs',
+    [
+        ('phenodigm', {}),
+        ('phenodigm', {'is_symmetric': True}),
+        ('phenodigm', {'is_symmetric': True, 'sim_measure': PairwiseSim.IC, 'ns_filter': 'HP'}),
+        ('resnik', {'matrix_metric': MatrixMetric.MAX, 'is_normalized': True}),
+        ('sim_gic', {}),
+    ],
+)
+def test_dataset_bounds(mock_graph, bound_method, kwargs):
+    graph, annot_map = mock_graph
+    profile = ['HP:I', 'HP:F']
+    dataset = CompiledDataset.compile(annot_map, graph)
+    score_bound = ScoreBound(graph, profile)
+    sim_fx = {
+        'phenodigm': ICSemSim(graph).phenodigm_compare,
+        'resnik': ICSemSim(graph).resnik_sim,
+        'sim_gic': ICSemSim(graph).sim_gic,
+    }[bound_method]
+
+    bounds = getattr(score_bound, f'{bound_method}_bounds')(dataset, **kwargs)
+    expected = [
+        getattr(score_bound, bound_method)(profile_b, **kwargs) for profile_b in annot_map.values()
+    ]
+    scores = [sim_fx(profile, profile_b, **kwargs) for profile_b in annot_map.values()]
+
+    np.testing.assert_allclose(bounds, expected)
+    assert np.isfinite(bounds).all()
+    assert (bounds * (1 + epsilon) >= scores).all()
+
+
+search_many_tests = [
+    ('phenodigm', {}),
+    ('symmetric_phenodigm', {'ns_filter': 'HP'}),
+    ('resnik', {'is_normalized': True}),
+    ('symmetric_resnik', {}),
+    ('sim_gic', {}),
+    ('ic_cosine', {}),
+    ('jaccard', {}),
+    ('cosine', {'negative_weight': 0.2}),
+]
+
+
+@pytest.mark.parametrize('method, kwargs', search_many_tests)
+def test_search_many(mock_graph, method, kwargs):
+    graph, annot_map = mock_graph
+    profiles = [['HP:I', 'HP:F', 'HP:L'], ['HP:D', 'HP:K'], ['HP:H']]
+
+    results = list(search_many(profiles, annot_map, graph, method, **kwargs))
+
+    assert len(results) == len(profiles)
+    for profile, search_result in zip(profiles, results):
+        expected = search(profile, annot_map, graph, method, **kwargs)
+        assert [match.id for match in search_result.results] == [
+            match.id for match in expected.results
+        ]
+        for match, expected_match in zip(search_result.results, expected.results):
+            assert match.rank == expected_match.rank
+            assert abs(match.score - expected_match.score) < epsilon
+
+
+compiled_search_tests = [
+    ('phenodigm', {}),
+    ('phenodigm', {'vectorized': True}),
+    ('symmetric_resnik', {'vectorized': True}),
+    ('resnik', {'top_k': 2}),
+    ('sim_gic', {}),
+    ('sim_gic', {'top_k': 2}),
+    ('jaccard', {'workers': 2}),
+    ('cosine', {}),
+]
+
+
+@pytest.mark.parametrize('method, kwargs', compiled_search_tests)
+def test_compiled_dataset_search(mock_graph, method, kwargs):
+    graph, annot_map = mock_graph
+    profile = ['HP:I', 'HP:F', 'HP:L']
+    dataset = CompiledDataset.compile(annot_map, graph)
+
+    expected = search(profile, annot_map, graph, method, **kwargs)
+    results = search(profile, dataset, graph, method, **kwargs)
+
+    assert [match.id for match in results.results] == [match.id for match in expected.results]
+    for match, expected_match in zip(results.results, expected.results):
+        assert match.rank == expected_match.rank
+        assert abs(match.score - expected_match.score) < epsilon
+
+
+def test_compiled_dataset(mock_graph):
+    graph, annot_map = mock_graph
+    dataset = CompiledDataset.compile(annot_map, graph)
+
+    assert dict(dataset) == {entity: frozenset(profile) for entity, profile in annot_map.items()}
+    for entity, profile in annot_map.items():
+        positive_profile = {pheno for pheno in profile if not pheno[0] == "-"}
+        assert dataset.get_closure(entity) == graph.get_profile_closure(positive_profile)
+
+    subset = dataset.subset(['2', '1'])
+    assert list(subset.items()) == [('2', dataset['2']), ('1', dataset['1'])]
+
+
+@pytest.mark.parametrize('method', ['phenodigm', 'sim_gic', 'jaccard'])
+def test_compiled_dataset_other_ids(mock_graph, method):
+    graph, annot_map = mock_graph
+    dataset = CompiledDataset.compile(annot_map, graph).subset(['2', '1'])
+    # Same ontology, with another id_map
+    other_graph = pickle.loads(pickle.dumps(graph))
+
+    with pytest.raises(ValueError):
+        search(['HP:I', 'HP:F'], dataset, other_graph, method)
+    with pytest.raises(ValueError):
+        list(search_many([['HP:I', 'HP:F']], dataset, other_graph, method))
+
+
+candidate_search_tests = [
+    ('phenodigm', {}),
+    ('phenodigm', {'vectorized': True, 'top_k': 2}),
+    ('symmetric_phenodigm', {'sim_measure': PairwiseSim.IC}),
+    ('resnik', {'is_normalized': True}),
+    ('symmetric_resnik', {}),
+]
+
+
+@pytest.mark.parametrize('method, kwargs', candidate_search_tests)
+@pytest.mark.parametrize('compiled', [True, False])
+def test_candidate_search(mock_graph, method, kwargs, compiled):
+    graph, annot_map = mock_graph
+    # Entity 2 shares only the root with the profile
+    profile = ['HP:L']
+    dataset = CompiledDataset.compile(annot_map, graph) if compiled else annot_map
+
+    expected = search(profile, annot_map, graph, method, **kwargs)
+    results = search(profile, dataset, graph, method, min_ic=0, **kwargs)
+
+    assert results.results == expected.results
+
+
+def test_inverted_index(mock_graph):
+    graph, annot_map = mock_graph
+    dataset = CompiledDataset.compile(annot_map, graph)
+
+    for node, positions in dataset.inverted_index.items():
+        entities = [dataset.entities[position] for position in positions]
+        assert entities == [
+            entity for entity in dataset.entities if node in dataset.get_closure(entity)
+        ]
+    assert set(dataset.inverted_index) == set().union(*dataset.closures)
+
+
+def test_dict_candidates(mock_graph):
+    graph, annot_map = mock_graph
+    dataset = CompiledDataset.compile(annot_map, graph)
+    profile = ['HP:L', '-HP:F']
+
+    for min_ic in sorted({0.0, *graph.ic_store.ic.tolist()}):
+        expected = _get_candidates(profile, dataset, graph, min_ic)
+        assert _get_candidates(profile, annot_map, graph, min_ic) == expected
+    assert expected == set()
+
+
+def test_vector_sim_cache(mock_graph):
+    graph, annot_map = mock_graph
+    dataset = CompiledDataset.compile(annot_map, graph)
+
+    vector_sim = _get_vector_sim(dataset, graph)
+    assert _get_vector_sim(dataset, graph) is vector_sim
+    assert _get_vector_sim(dataset.subset(['2', '1']), graph) is vector_sim
+    assert _get_vector_sim(annot_map, graph) is not vector_sim
+
+    # Rebuilt when the information content of the graph changes
+    ic_store = graph.ic_store
+    graph.ic_store = ic_store.astype(np.float32)
+    try:
+        assert _get_vector_sim(dataset, graph) is not vector_sim
+    finally:
+        graph.ic_store = ic_store
+    assert pickle.loads(pickle.dumps(dataset))._derived == {}
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_unknown_term_search(mock_graph, vectorized):
+    graph, annot_map = mock_graph
+    dataset = {**annot_map, 'unknown': {'HP:I', 'HP:9999999'}}
+
+    # Optimal matrices need the information content of every term
+    with pytest.raises(KeyError):
+        search(['HP:I', 'HP:F'], dataset, graph, 'symmetric_phenodigm', vectorized=vectorized)
@@ -0,0 +1,119 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from pumpkin_py import ICSemSim, build_ic_graph_from_closures, flat_to_annotations, search
+from pumpkin_py.service import SearchService, make_server
+
+closures = Path(__file__).parent / 'resources' / 'mock-hpo' / 'closures.tsv'
+annotations = Path(__file__).parent / 'resources' / 'mock-hpo' / 'annotations.tsv'
+
+
+@pytest.fixture(scope='module', params=[0, 1], ids=['in_thread', 'worker_pool'])
+def service_url(request):
+    with open(annotations, 'r') as annot_file:
+        annot_map = flat_to_annotations(annot_file)
+
+    with open(closures, 'r') as closure_file:
+        graph = build_ic_graph_from_closures(closure_file, "HP:0000118", annot_map)
+
+    service = SearchService(graph, {'mock': annot_map}, workers=request.param)
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield 'http://{}:{}'.format(*server.server_address[:2]), graph, annot_map
+
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+
+def _request(url, body=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    try:
+        with urllib.request.urlopen(url, data=data) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_search_endpoint(service_url):
+    url, graph, annot_map = service_url
+    profile = ['HP:I', 'HP:F', 'HP:L']
+
+    status, body = _request(
+        f'{url}/search', {'profile': profile, 'dataset': 'mock', 'method': 'resnik', 'top_k': 2}
+    )
+
+    expected = search(profile, annot_map, graph, 'resnik', top_k=2)
+    assert status == 200
+    assert body['results'] == [
+        {'id': match.id, 'rank': match.rank, 'score': match.score} for match in expected.results
+    ]
+
+
+def test_search_endpoint_kwargs(service_url):
+    url, graph, annot_map = service_url
+    profile = ['HP:I', 'HP:F', 'HP:L']
+    request = {
+        'profile': profile,
+        'dataset': 'mock',
+        'method': 'resnik',
+        'kwargs': {'is_symmetric': True},
+    }
+
+    status, body = _request(f'{url}/search', request)
+
+    expected = search(profile, annot_map, graph, 'resnik', is_symmetric=True)
+    assert status == 200
+    assert [match['score'] for match in body['results']] == [
+        match.score for match in expected.results
+    ]
+
+
+def test_compare_endpoint(service_url):
+    url, graph, _ = service_url
+    request = {'profile_a': ['HP:I', 'HP:F'], 'profile_b': ['HP:L'], 'method': 'sim_gic'}
+
+    status, body = _request(f'{url}/compare', request)
+
+    assert status == 200
+    assert body['score'] == ICSemSim(graph).sim_gic(['HP:I', 'HP:F'], ['HP:L'])
+
+
+def test_methods_and_stats(service_url):
+    url, _, _ = service_url
+
+    status, body = _request(f'{url}/methods')
+    assert status == 200
+    assert 'phenodigm' in body['methods']
+
+    _, stats = _request(f'{url}/stats')
+    assert stats['/methods']['count'] >= 1
+    assert stats['/methods']['max_ms'] >= stats['/methods']['p50_ms'] >= 0
+
+
+@pytest.mark.parametrize(
+    'path, body',
+    [
+        ('/search', {'profile': ['HP:I'], 'dataset': 'unknown'}),
+        ('/search', {'profile': ['HP:I'], 'dataset': 'mock', 'method': 'unknown'}),
+        ('/search', {'profile': ['HP:unknown'], 'dataset': 'mock'}),
+        ('/compare', {'profile_a': [], 'profile_b': ['HP:I']}),
+        ('/search', {'profile': ['HP:I'], 'dataset': 'mock', 'kwargs': {'workers': 64}}),
+        ('/search', {'profile': ['HP:I'], 'dataset': 'mock', 'kwargs': ['ns_filter']}),
+        ('/compare', {'profile_a': ['HP:I'], 'profile_b': ['HP:I'], 'kwargs': {'executor': 1}}),
+    ],
+)
+def test_bad_requests(service_url, path, body):
+    url, _, _ = service_url
+
+    status, response = _request(f'{url}{path}', body)
+
+    assert status == 400
+    assert 'error' in response
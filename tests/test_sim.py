@@ -3,6 +3,8 @@ TODO , a lot of DRY violation in here, parameterize these tests
 https://docs.pytest.org/en/6.2.x/parametrize.html
 """
 
+import pickle
+import tempfile
 from pathlib import Path
 
 import pytest
@@ -11,6 +13,7 @@ from pumpkin_py import MatrixMetric  # noqa
 from pumpkin_py import PairwiseSim  # noqa
 from pumpkin_py import (
     GraphSemSim,
+    ICGraph,
     ICSemSim,
     SemanticDist,
     build_graph_from_closure_file,
@@ -19,6 +22,7 @@ from pumpkin_py import (
     build_ic_graph_from_iri,
     flat_to_annotations,
 )
+from pumpkin_py.builder.graph_builder import _get_closures, build_graph_from_closures
 
 ontology = Path(__file__).parent / 'resources' / 'mock-hpo' / 'ontology.ttl'
 closures = Path(__file__).parent / 'resources' / 'mock-hpo' / 'closures.tsv'
@@ -119,6 +123,46 @@ class TestICSimWithClosureFile:
         assert abs(sim_score - expected) < epsilon
 
 
+class TestICSimWithSnapshot:
+    @classmethod
+    def setup_class(self):
+        root = "HP:0000118"
+
+        with open(closures, 'r') as closure_file:
+            self.source_graph = build_ic_graph_from_closures(closure_file, root, annotation_map)
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.snapshot = Path(self.tmp_dir.name) / 'graph.bin'
+        self.source_graph.save(self.snapshot)
+        self.graph = ICGraph.load(self.snapshot, mmap=True)
+
+        self.semantic_sim = ICSemSim(self.graph)
+
+    @classmethod
+    def teardown_class(self):
+        self.graph = None
+        self.tmp_dir.cleanup()
+
+    @pytest.mark.parametrize('mmap', [True, False])
+    def test_round_trip(self, mmap):
+        graph = ICGraph.load(self.snapshot, mmap=mmap)
+        assert graph.root == self.source_graph.root
+        assert dict(graph.id_map) == dict(self.source_graph.id_map)
+        assert graph.ic_store.ic_map == self.source_graph.ic_store.ic_map
+        assert dict(graph.ancestors) == self.source_graph.ancestors
+        assert dict(graph.descendants) == self.source_graph.descendants
+        assert dict(graph.namespaces) == self.source_graph.namespaces
+
+    def test_pickle(self):
+        graph = pickle.loads(pickle.dumps(self.graph))
+        assert graph.ancestors == self.source_graph.ancestors
+
+    @pytest.mark.parametrize('test_fx,expected', ic_sim_tests)
+    def test_ic_sim(self, test_fx, expected):
+        sim_score = eval(test_fx)
+        assert abs(sim_score - expected) < epsilon
+
+
 class TestGraphSimWithClosureFile:
     """
     TODO parameterize these tests
@@ -142,3 +186,20 @@ class TestGraphSimWithClosureFile:
     def test_graph_sim(self, test_fx, expected):
         sim_score = eval(test_fx)
         assert abs(sim_score - expected) < epsilon
+
+
+def test_closure_file_matches_closure_dicts():
+    root = "HP:0000118"
+
+    with open(closures, 'r') as closure_file:
+        graph = build_graph_from_closure_file(closure_file, root)
+    with open(closures, 'r') as closure_file:
+        expected = build_graph_from_closures(*_get_closures(closure_file, root), root)
+
+    def to_curies(graph, closure):
+        return {node: {graph.id_map.inverse[id] for id in ids} for node, ids in closure.items()}
+
+    assert set(graph.id_map.keys()) == set(expected.id_map.keys())
+    assert to_curies(graph, graph.ancestors) == to_curies(expected, expected.ancestors)
+    assert to_curies(graph, graph.descendants) == to_curies(expected, expected.descendants)
+    assert to_curies(graph, graph.namespaces) == to_curies(expected, expected.namespaces)